@@ -1,34 +1,52 @@
+import time
+
+# отметка до тяжёлых импортов (aiogram и т.д.) — для профиля запуска
+_T0 = time.perf_counter()
+
 import asyncio
-import os
+from typing import TYPE_CHECKING
+from zoneinfo import ZoneInfo
+
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.enums import ParseMode
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
 
 from src.config import load_config
 from src.storage import Storage
-from src.handlers import start as start_handlers
-from src.handlers import news as news_handlers
-from src.handlers import admin as admin_handlers
-from src.handlers import filters as filters_handlers
-from src.handlers import schedule as schedule_handlers   # NEW
-from src.handlers import profile as profile_handlers     # NEW
-from src.services.telegram_fetcher import TelegramFetcher
-from src.utils.text import md_to_html, clip_for_caption
-
-
-async def main():
-    config = load_config()
+from src.services.fsm_storage import SQLiteFSMStorage
+from src.services.activity import ActivityTracker
+from src.middlewares.activity import ActivityMiddleware
+from src.middlewares.throttling import ThrottlingMiddleware
+from src.middlewares.startup import FirstUpdateMiddleware
+from src.middlewares.metrics import MetricsMiddleware
+from src.middlewares.tracing import TraceHandlerMiddleware, TraceSessionMiddleware, TraceUpdateMiddleware
+from src.services.metrics import FanoutMetrics, MetricsRegistry, instrument_storage, start_metrics_server
+from src.services.update_executor import KeyedUpdateExecutor, OrderedDispatcher
+from src.services.loop_watchdog import LoopWatchdog
+from src.services.tracing import Tracer, trace_storage
+from src.services.query_profiler import QueryProfiler
+from src.services.notifier import Notifier
+from src.services.burst import BurstCoalescer
+from src.services.timetable import Timetable, TimetableFormatError
+from src.services.reminders import ReminderScheduler
+from src.services.digest import DigestFlusher
+from src.services.near_dup import NearDuplicateDetector
+from src.utils.startup import StartupProfile
 
-    bot = Bot(token=config.bot_token, parse_mode=ParseMode.HTML)
-    dp = Dispatcher(storage=MemoryStorage())
+if TYPE_CHECKING:
+    from src.services.telegram_fetcher import TelegramFetcher
 
-    storage = Storage(config.db_path)
-    await storage.init()
 
-    dp["storage"] = storage
-    dp["admin_ids"] = config.admin_ids
-    dp["tg_channels"] = config.tg_channels
+def setup_routers(dp: Dispatcher):
+    # хендлеры импортируются здесь, а не на уровне модуля: конфиг проверяется раньше, фаза видна в профиле
+    from src.handlers import start as start_handlers
+    from src.handlers import news as news_handlers
+    from src.handlers import admin as admin_handlers
+    from src.handlers import filters as filters_handlers
+    from src.handlers import schedule as schedule_handlers
+    from src.handlers import profile as profile_handlers
 
     dp.include_router(start_handlers.router)
     dp.include_router(news_handlers.router)
@@ -37,58 +55,235 @@ async def main():
     dp.include_router(schedule_handlers.router)
     dp.include_router(profile_handlers.router)
 
-    async def user_allows(user_id: int, source: str, title: str, text: str) -> bool:
-        if user_id in config.admin_ids:
-            return True
-        muted = set(await storage.list_muted_sources(user_id))
-        if source.lower() in muted:
-            return False
-        kws = await storage.list_keywords(user_id)
-        if not kws:
-            return True
-        lc = f"{title}\n{text}".lower()
-        return any(kw in lc for kw in kws)
-
-    async def notify_new_item(title: str, text: str, source: str, post_url: str | None, external_url: str | None, media_path: str | None):
-        user_ids = await storage.get_all_user_ids(only_subscribed=True)
-        url = post_url or external_url
-        kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="🔗 Read more", url=url)]]) if url else None
-        preview_tail = f"\n\n{url}" if (url and not (media_path and os.path.exists(media_path))) else ""
-        body = f'🆕 <a href="https://t.me/{source}">{source}</a>\n\n{md_to_html(text or "")}{preview_tail}'
-
-        for uid in user_ids:
+
+async def main():
+    startup = StartupProfile(t0=_T0)
+    startup.phases.append(("imports", time.perf_counter() - _T0))
+
+    with startup.phase("config"):
+        config = load_config()
+        startup.log_path = config.startup_log
+
+    session = None
+    if config.bot_api_url:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.bot_api_url))
+        print(f"Bot API: {config.bot_api_url}")
+    bot = Bot(token=config.bot_token, parse_mode=ParseMode.HTML, session=session)
+
+    metrics = MetricsRegistry(enabled=config.metrics_enabled)
+    tracer = Tracer(config.trace_log, sample_rate=config.trace_sample_rate, slow_ms=config.trace_slow_ms)
+
+    with startup.phase("storage"):
+        profiler = QueryProfiler(slow_ms=config.query_slow_ms) if config.query_profile else None
+        storage = Storage(config.db_path, user_cache_size=config.user_cache_size, user_cache_ttl=config.user_cache_ttl,
+                          release=config.release, profiler=profiler)
+        await storage.init()
+        if profiler:
+            profiler.instrument(storage)
+        if metrics.enabled:
+            instrument_storage(storage, metrics)
+        if tracer.enabled:
+            trace_storage(storage)
+
+        if config.fsm_storage == "memory":
+            fsm_storage = MemoryStorage()
+        else:
+            fsm_storage = SQLiteFSMStorage(
+                config.db_path, ttl=config.fsm_ttl_sec, flush_interval=config.fsm_flush_interval
+            )
+            await fsm_storage.init()
+
+    with startup.phase("timetable"):
+        timetable = Timetable(storage)
+        await timetable.load()
+        if config.timetable_paths:
             try:
-                if not await user_allows(uid, source, title, text):
-                    continue
-                if media_path and os.path.exists(media_path):
-                    await bot.send_photo(uid, FSInputFile(media_path), caption=clip_for_caption(body), reply_markup=kb)
-                else:
-                    await bot.send_message(uid, body, reply_markup=kb, disable_web_page_preview=False)
-                await asyncio.sleep(0.03)
-            except Exception:
-                pass
-
-    telegram_fetcher: TelegramFetcher | None = None
-    if config.telegram_api_id and config.telegram_api_hash and config.tg_channels:
+                # инкрементально: неизменённые группы не перезаписываются
+                result = await timetable.import_files(config.timetable_paths)
+                if result["files"]:
+                    print(f"[Timetable] imported {result}")
+            except (OSError, TimetableFormatError) as e:
+                print(f"[Timetable] import failed: {e}")
+
+    # параллельная обработка апдейтов с сохранением порядка внутри чата
+    executor = KeyedUpdateExecutor(workers=config.update_workers)
+    dp = OrderedDispatcher(storage=fsm_storage, executor=executor)
+    dp["update_executor"] = executor
+
+    dp["storage"] = storage
+    dp["query_profiler"] = profiler
+    dp["timetable"] = timetable
+    dp["timetable_paths"] = config.timetable_paths or []
+    dp["admin_ids"] = config.admin_ids
+    # реестр каналов в БД: TG_CHANNELS только досеивает его, дальше — /addsource и /rmsource
+    channels = await storage.sync_channels(config.tg_channels)
+    dp["tg_channels"] = channels
+
+    activity = ActivityTracker(storage, flush_interval=config.activity_flush_interval)
+    await activity.start()
+    dp["activity"] = activity
+    dp.update.outer_middleware(ActivityMiddleware(activity))
+
+    throttling = ThrottlingMiddleware(config.throttle_limits)
+    dp.message.middleware(throttling)
+    dp.callback_query.middleware(throttling)
+
+    dp.update.outer_middleware(FirstUpdateMiddleware(startup))
+
+    dp["metrics"] = metrics
+    fanout_metrics = FanoutMetrics(metrics)
+    dp["fanout_metrics"] = fanout_metrics
+    metrics_runner = None
+    if metrics.enabled:
+        handler_metrics = MetricsMiddleware(metrics)
+        dp.message.middleware(handler_metrics)
+        dp.callback_query.middleware(handler_metrics)
+        metrics.gauge("update_queue_depth", "Updates waiting for a worker", fn=lambda: executor.waiting)
+        metrics.gauge("update_workers_busy", "Updates being processed", fn=lambda: executor.running)
+        metrics.gauge("user_cache_hits", "User row cache hits", fn=lambda: storage.user_cache.hits)
+        metrics.gauge("user_cache_misses", "User row cache misses", fn=lambda: storage.user_cache.misses)
+        metrics.gauge("activity_pending", "Buffered last_seen touches", fn=lambda: activity.pending)
+        metrics_runner = await start_metrics_server(metrics, config.metrics_host, config.metrics_port)
+
+    if tracer.enabled:
+        await tracer.start()
+        dp.update.outer_middleware(TraceUpdateMiddleware(tracer))
+        dp.message.middleware(TraceHandlerMiddleware())
+        dp.callback_query.middleware(TraceHandlerMiddleware())
+        bot.session.middleware(TraceSessionMiddleware())
+
+    # синхронный код в хендлерах/fetcher: лог + агрегат по месту для /stalls
+    watchdog = None
+    if config.loop_stall_ms > 0:
+        watchdog = LoopWatchdog(threshold=config.loop_stall_ms / 1000, metrics=metrics)
+        await watchdog.start()
+    dp["loop_watchdog"] = watchdog
+
+    with startup.phase("routers"):
+        setup_routers(dp)
+
+    notifier = Notifier(bot, storage, config.admin_ids, fanout_metrics)
+    dp["notifier"] = notifier
+    on_new_item = notifier.notify_new_item
+    burst = None
+    if config.burst_window_s > 0:
+        # серии постов одного канала — одним уведомлением; строки news остаются отдельными
+        burst = BurstCoalescer(notifier, config.burst_window_s, max_delay=config.burst_max_delay_s,
+                               max_items=config.burst_max_items)
+        on_new_item = burst.on_new_item
+    dp["burst"] = burst
+    # рассылки новых постов, прерванные прошлым рестартом, — с последней сохранённой порции
+    resume_task = asyncio.create_task(notifier.resume(), name="notifier.resume")
+
+    tz = ZoneInfo(config.timezone) if config.timezone else None
+    digest = DigestFlusher(bot, storage, tz=tz, daily_hour=config.digest_daily_hour,
+                           daily_spread_min=config.digest_spread_min, fanout_metrics=fanout_metrics)
+    await digest.start()
+    dp["digest"] = digest
+
+    reminders = None
+    if config.reminder_lead_min > 0:
+        reminders = ReminderScheduler(bot, storage, timetable, lead_minutes=config.reminder_lead_min, tz=tz,
+                                      fanout_metrics=fanout_metrics)
+        # изменения расписания/списка студентов пересобирают только затронутые группы
+        timetable.on_change = reminders.on_timetable_change
+        await reminders.start()
+    dp["reminders"] = reminders
+
+    near_dup = None
+    if config.near_dup_distance >= 0:
+        near_dup = NearDuplicateDetector(max_distance=config.near_dup_distance, bands=config.near_dup_bands,
+                                         window=config.near_dup_window_h * 3600)
+        await near_dup.load(storage)
+    dp["near_dup"] = near_dup
+
+    telegram_fetcher: "TelegramFetcher | None" = None
+    fetcher_task: asyncio.Task | None = None
+    if config.telegram_api_id and config.telegram_api_hash:
+        # Telethon импортируется только если он настроен
+        with startup.phase("telethon import"):
+            from src.services.telegram_fetcher import TelegramFetcher
         telegram_fetcher = TelegramFetcher(
             api_id=config.telegram_api_id,
             api_hash=config.telegram_api_hash,
             session_name=config.telegram_session_name,
-            channels=config.tg_channels,
+            channels=channels,
             storage=storage,
+            tracer=tracer,
+            near_dup=near_dup,
         )
-        await telegram_fetcher.start(on_new_item=notify_new_item, backfill_per_channel=5)
         dp["telegram_fetcher"] = telegram_fetcher
-        print(f"Telegram parser started for channels: {', '.join(config.tg_channels)}")
+        dp["tg_channels"] = telegram_fetcher.channels
+
+        async def start_fetcher():
+            # подключение и backfill идут параллельно с приёмом апдейтов
+            try:
+                with startup.phase("telethon start"):
+                    await telegram_fetcher.start(on_new_item=on_new_item, backfill_per_channel=5)
+            except Exception as e:
+                print(f"Telegram parser failed to start: {e}")
+                return
+            print(f"Telegram parser started for channels: {', '.join(telegram_fetcher.channels) or '—'}")
+
+        fetcher_task = asyncio.create_task(start_fetcher(), name="telegram_fetcher.start")
     else:
+        dp["telegram_fetcher"] = None
         print("Telethon not configured; parsing disabled.")
 
-    print("Bot started. Press Ctrl+C to stop.")
+    demo_fetcher = None
+    if config.demo_rate_per_min > 0:
+        # синтетический трафик для soak-тестов (обычно вместе с BOT_API_URL на fake_bot_api)
+        from src.services.news_fetcher import DemoNewsFetcher, load_corpus
+        demo_fetcher = DemoNewsFetcher(
+            storage,
+            rate=config.demo_rate_per_min / 60,
+            corpus=load_corpus(config.demo_corpus) if config.demo_corpus else None,
+            sources=("demo", "demo_events", "demo_science"),
+            burst_prob=config.demo_burst_prob,
+            concurrency=config.demo_concurrency,
+        )
+        await demo_fetcher.start(on_new_item=on_new_item)
+        print(f"Demo news generator: {config.demo_rate_per_min:g} posts/min")
+    dp["demo_fetcher"] = demo_fetcher
+
+    startup.ready()
+    print(f"Bot started ({config.bot_mode}). Press Ctrl+C to stop.")
     try:
-        await dp.start_polling(bot)
+        if config.bot_mode == "webhook":
+            from src.services.webhook import run_webhook
+            await run_webhook(
+                dp, bot,
+                host=config.webhook_host,
+                port=config.webhook_port,
+                path=config.webhook_path,
+                secret=config.webhook_secret,
+                base_url=config.webhook_base_url,
+            )
+        else:
+            # webhook, оставшийся от прошлого запуска, блокирует getUpdates
+            await bot.delete_webhook(drop_pending_updates=False)
+            await dp.start_polling(bot)
     finally:
+        if fetcher_task and not fetcher_task.done():
+            fetcher_task.cancel()
+        if not resume_task.done():
+            resume_task.cancel()
         if telegram_fetcher:
             await telegram_fetcher.stop()
+        if demo_fetcher:
+            await demo_fetcher.stop()
+        if burst:
+            await burst.stop()
+        if reminders:
+            await reminders.stop()
+        await digest.stop()
+        await activity.stop()
+        if watchdog:
+            await watchdog.stop()
+        await tracer.stop()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await dp.storage.close()
         await bot.session.close()
 
 
@@ -11,6 +11,77 @@ class Config:
     telegram_api_hash: str | None
     telegram_session_name: str
     tg_channels: list[str]
+    fsm_storage: str = "sqlite"
+    fsm_ttl_sec: float = 24 * 3600
+    fsm_flush_interval: float = 2.0
+    user_cache_size: int = 10_000
+    user_cache_ttl: float = 300.0
+    activity_flush_interval: float = 30.0
+    throttle_limits: dict[str, tuple[float, float]] | None = None
+    bot_mode: str = "polling"
+    update_workers: int = 16
+    startup_log: str | None = "data/startup.jsonl"
+    metrics_enabled: bool = False
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 9100
+    release: str | None = None
+    loop_stall_ms: float = 250.0
+    trace_sample_rate: float = 0.0
+    trace_slow_ms: float = 0.0
+    trace_log: str | None = "data/traces.jsonl"
+    query_profile: bool = False
+    query_slow_ms: float = 50.0
+    bot_api_url: str | None = None
+    demo_rate_per_min: float = 0.0
+    demo_corpus: str | None = None
+    demo_burst_prob: float = 0.0
+    demo_concurrency: int = 1
+    timetable_paths: list[str] | None = None
+    reminder_lead_min: float = 15.0
+    timezone: str | None = None
+    digest_daily_hour: int = 8
+    digest_spread_min: float = 120.0
+    near_dup_distance: int = 7
+    near_dup_bands: int = 8
+    near_dup_window_h: float = 48.0
+    burst_window_s: float = 0.0
+    burst_max_delay_s: float = 60.0
+    burst_max_items: int = 10
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_path: str = "/webhook"
+    webhook_secret: str | None = None
+    webhook_base_url: str | None = None
+
+
+def _float_env(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
+def _parse_limits(raw: str) -> dict[str, tuple[float, float]] | None:
+    # "news=2/10,filters=6/10,default=12/10" -> {"news": (2, 10), ...}
+    limits: dict[str, tuple[float, float]] = {}
+    for part in raw.replace(" ", "").split(","):
+        if "=" not in part or "/" not in part:
+            continue
+        group, spec = part.split("=", 1)
+        burst, period = spec.split("/", 1)
+        try:
+            burst_f, period_f = float(burst), float(period)
+        except ValueError:
+            continue
+        # burst < 1 никогда не пропустит апдейт, period <= 0 даёт деление на ноль в TokenBuckets
+        if burst_f < 1 or period_f <= 0:
+            print(f"[Config] THROTTLE_LIMITS: ignoring invalid limit {part!r} (need burst >= 1, period > 0)")
+            continue
+        limits[group.lower()] = (burst_f, period_f)
+    return limits or None
 
 
 def load_config() -> Config:
@@ -41,6 +112,90 @@ def load_config() -> Config:
     channels_raw = os.getenv("TG_CHANNELS", "")
     tg_channels = [c.strip().lstrip("@") for c in channels_raw.split(",") if c.strip()]
 
+    # FSM storage: "sqlite" (persistent) or "memory"
+    fsm_storage = (os.getenv("FSM_STORAGE", "sqlite") or "sqlite").strip().lower()
+    fsm_ttl_sec = _float_env("FSM_TTL_SEC", 24 * 3600)
+    # 0 = write-through (use when several bot processes share the DB)
+    fsm_flush_interval = _float_env("FSM_FLUSH_INTERVAL", 2.0)
+
+    # Кэш строк users в Storage (0 = выключен)
+    user_cache_size = int(_float_env("USER_CACHE_SIZE", 10_000))
+    user_cache_ttl = _float_env("USER_CACHE_TTL", 300.0)
+
+    # Как часто сбрасывать буфер last_seen_at в БД
+    activity_flush_interval = _float_env("ACTIVITY_FLUSH_INTERVAL", 30.0)
+
+    # Анти-флуд: THROTTLE_LIMITS="news=2/10,filters=6/10,profile=6/10,default=12/10"
+    throttle_limits = _parse_limits(os.getenv("THROTTLE_LIMITS", ""))
+
+    # Режим получения апдейтов: "polling" (по умолчанию) или "webhook"
+    bot_mode = (os.getenv("BOT_MODE", "polling") or "polling").strip().lower()
+    webhook_host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    port_env = os.getenv("WEBHOOK_PORT") or os.getenv("PORT") or "8080"
+    webhook_port = int(port_env) if port_env.isdigit() else 8080
+    webhook_path = "/" + os.getenv("WEBHOOK_PATH", "/webhook").lstrip("/")
+    webhook_secret = os.getenv("WEBHOOK_SECRET") or None
+    # Публичный URL (https://...); без него сервер стартует, но webhook в Telegram не регистрируется
+    webhook_base_url = os.getenv("WEBHOOK_BASE_URL") or None
+    if bot_mode == "webhook" and webhook_base_url and not webhook_secret:
+        raise RuntimeError("WEBHOOK_SECRET is required when WEBHOOK_BASE_URL is set")
+
+    # Сколько апдейтов обрабатывается одновременно (порядок внутри чата сохраняется)
+    update_workers = max(1, int(_float_env("UPDATE_WORKERS", 16)))
+
+    # Тайминги запуска (фазы, time-to-first-update) по одной JSON-строке на запуск; пусто = не писать
+    startup_log = os.getenv("STARTUP_LOG", "data/startup.jsonl") or None
+
+    # Prometheus-метрики на локальном HTTP-эндпоинте (по умолчанию выключены)
+    metrics_enabled = os.getenv("METRICS_ENABLED", "0").strip().lower() in {"1", "true", "yes", "on"}
+    metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+    metrics_port_env = os.getenv("METRICS_PORT", "9100")
+    metrics_port = int(metrics_port_env) if metrics_port_env.isdigit() else 9100
+
+    # Метка релиза для сравнения метрик свежести (Render отдаёт RENDER_GIT_COMMIT)
+    release = os.getenv("RELEASE") or (os.getenv("RENDER_GIT_COMMIT") or "")[:12] or None
+
+    # Порог блокировки event loop для watchdog, мс (0 = выключен)
+    loop_stall_ms = max(0.0, _float_env("LOOP_STALL_MS", 250.0))
+
+    # Трассировка апдейтов: доля трасс в выборке (0..1) и порог «медленных», которые пишутся всегда
+    trace_sample_rate = min(1.0, max(0.0, _float_env("TRACE_SAMPLE_RATE", 0.0)))
+    trace_slow_ms = max(0.0, _float_env("TRACE_SLOW_MS", 0.0))
+    trace_log = os.getenv("TRACE_LOG", "data/traces.jsonl") or None
+
+    # Профилировщик Storage: время методов/SQL и slow-log с EXPLAIN QUERY PLAN (по умолчанию выключен)
+    query_profile = os.getenv("QUERY_PROFILE", "0").strip().lower() in {"1", "true", "yes", "on"}
+    query_slow_ms = max(0.0, _float_env("QUERY_SLOW_MS", 50.0))
+
+    # Свой Bot API сервер (локальный telegram-bot-api или python -m src.tools.fake_bot_api для нагрузочных тестов)
+    bot_api_url = (os.getenv("BOT_API_URL") or "").rstrip("/") or None
+
+    # Синтетический трафик каналов (DemoNewsFetcher) для soak-тестов: постов в минуту, 0 = выключен
+    demo_rate_per_min = max(0.0, _float_env("DEMO_NEWS_RATE", 0.0))
+    demo_corpus = os.getenv("DEMO_CORPUS") or None
+    demo_burst_prob = min(1.0, max(0.0, _float_env("DEMO_BURST_PROB", 0.0)))
+    demo_concurrency = max(1, int(_float_env("DEMO_CONCURRENCY", 1)))
+
+    # Файлы/каталоги расписания (CSV/ICS и списки студентов), импортируются при старте и по /timetable reload
+    timetable_paths = [p.strip() for p in os.getenv("TIMETABLE_PATH", "data/timetable").split(",") if p.strip()]
+    # Напоминание о паре за N минут (0 = выключено); время пар в расписании — в TIMEZONE (по умолчанию системная зона)
+    reminder_lead_min = max(0.0, _float_env("REMINDER_LEAD_MIN", 15.0))
+    timezone = os.getenv("TIMEZONE") or None
+
+    # Дайджесты: час ежедневной отправки (по TIMEZONE) и окно, по которому размазываются отправки, мин
+    digest_daily_hour = min(23, max(0, int(_float_env("DIGEST_DAILY_HOUR", 8))))
+    digest_spread_min = max(0.0, _float_env("DIGEST_SPREAD_MIN", 120.0))
+
+    # Почти-дубликаты между каналами: макс. расстояние Хэмминга SimHash (-1 = выключено), число LSH-полос, окно в часах
+    near_dup_distance = int(_float_env("NEAR_DUP_DISTANCE", 7))
+    near_dup_bands = min(16, max(1, int(_float_env("NEAR_DUP_BANDS", 8))))
+    near_dup_window_h = max(0.0, _float_env("NEAR_DUP_WINDOW_H", 48.0))
+    # Склейка серий постов канала в одно уведомление: окно тишины в секундах (0 = выключено),
+    # максимальная задержка первого отложенного поста и максимум постов в одном сообщении
+    burst_window_s = max(0.0, _float_env("BURST_WINDOW_S", 0.0))
+    burst_max_delay_s = max(0.0, _float_env("BURST_MAX_DELAY_S", 60.0))
+    burst_max_items = max(2, int(_float_env("BURST_MAX_ITEMS", 10)))
+
     return Config(
         bot_token=token,
         admin_ids=admin_ids,
@@ -49,4 +204,45 @@ def load_config() -> Config:
         telegram_api_hash=telegram_api_hash,
         telegram_session_name=telegram_session_name,
         tg_channels=tg_channels,
+        fsm_storage=fsm_storage,
+        fsm_ttl_sec=fsm_ttl_sec,
+        fsm_flush_interval=fsm_flush_interval,
+        user_cache_size=user_cache_size,
+        user_cache_ttl=user_cache_ttl,
+        activity_flush_interval=activity_flush_interval,
+        throttle_limits=throttle_limits,
+        bot_mode=bot_mode,
+        update_workers=update_workers,
+        startup_log=startup_log,
+        metrics_enabled=metrics_enabled,
+        metrics_host=metrics_host,
+        metrics_port=metrics_port,
+        release=release,
+        loop_stall_ms=loop_stall_ms,
+        trace_sample_rate=trace_sample_rate,
+        trace_slow_ms=trace_slow_ms,
+        trace_log=trace_log,
+        query_profile=query_profile,
+        query_slow_ms=query_slow_ms,
+        bot_api_url=bot_api_url,
+        demo_rate_per_min=demo_rate_per_min,
+        demo_corpus=demo_corpus,
+        demo_burst_prob=demo_burst_prob,
+        demo_concurrency=demo_concurrency,
+        timetable_paths=timetable_paths,
+        reminder_lead_min=reminder_lead_min,
+        timezone=timezone,
+        digest_daily_hour=digest_daily_hour,
+        digest_spread_min=digest_spread_min,
+        near_dup_distance=near_dup_distance,
+        near_dup_bands=near_dup_bands,
+        near_dup_window_h=near_dup_window_h,
+        burst_window_s=burst_window_s,
+        burst_max_delay_s=burst_max_delay_s,
+        burst_max_items=burst_max_items,
+        webhook_host=webhook_host,
+        webhook_port=webhook_port,
+        webhook_path=webhook_path,
+        webhook_secret=webhook_secret,
+        webhook_base_url=webhook_base_url,
     )
\ No newline at end of file
@@ -1,5 +1,12 @@
+from __future__ import annotations
+
 import asyncio
-from typing import List
+import html
+import json
+import os
+import tempfile
+import time
+from typing import TYPE_CHECKING, List
 
 from aiogram import Router, F
 from aiogram.types import Message, InputMediaPhoto, ReplyKeyboardMarkup, KeyboardButton
@@ -8,7 +15,21 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 
 from src.storage import Storage
-from src.services.telegram_fetcher import TelegramFetcher
+from src.services.activity import ActivityTracker
+from src.services.burst import BurstCoalescer
+from src.services.update_executor import KeyedUpdateExecutor
+from src.services.loop_watchdog import LoopWatchdog
+from src.services.near_dup import NearDuplicateDetector
+from src.services.query_profiler import QueryProfiler
+from src.services.metrics import FanoutMetrics, MetricsRegistry
+from src.services.reminders import ReminderScheduler
+from src.services.segments import SEGMENT_HELP, Segment, SegmentError
+from src.services.timetable import Timetable, TimetableFormatError
+from src.utils.stats import summarize
+
+if TYPE_CHECKING:
+    # Telethon тяжёлый и опциональный — только для аннотаций
+    from src.services.telegram_fetcher import TelegramFetcher
 
 router = Router(name="admin")
 
@@ -21,6 +42,8 @@ BTN_BACK = "⬅️ Back"
 # Broadcast submenu
 BTN_BC_TEXT = "📝 Text"
 BTN_BC_MEDIA = "🖼 Media"
+BTN_BC_AUDIENCE = "🎯 Audience"
+BTN_BC_CONFIRM = "🚀 Confirm"
 
 # Text broadcast actions
 BTN_TXT_EDIT = "🖊 Edit text"
@@ -68,7 +91,7 @@ def kb_text_actions(has_text: bool) -> ReplyKeyboardMarkup:
     rows = []
     if has_text:
         rows.append([KeyboardButton(text=BTN_TXT_SEND)])
-    rows.append([KeyboardButton(text=BTN_TXT_EDIT)])
+    rows.append([KeyboardButton(text=BTN_TXT_EDIT), KeyboardButton(text=BTN_BC_AUDIENCE)])
     rows.append([KeyboardButton(text=BTN_TXT_CANCEL), KeyboardButton(text=BTN_BACK)])
     return ReplyKeyboardMarkup(keyboard=rows, resize_keyboard=True)
 
@@ -77,7 +100,7 @@ def kb_media_actions() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
             [KeyboardButton(text=BTN_MEDIA_ADD), KeyboardButton(text=BTN_MEDIA_SET_CAPTION)],
-            [KeyboardButton(text=BTN_MEDIA_CLEAR)],
+            [KeyboardButton(text=BTN_MEDIA_CLEAR), KeyboardButton(text=BTN_BC_AUDIENCE)],
             [KeyboardButton(text=BTN_MEDIA_SEND)],
             [KeyboardButton(text=BTN_MEDIA_CANCEL), KeyboardButton(text=BTN_BACK)],
         ],
@@ -85,6 +108,16 @@ def kb_media_actions() -> ReplyKeyboardMarkup:
     )
 
 
+def kb_confirm() -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text=BTN_BC_CONFIRM)],
+            [KeyboardButton(text=BTN_TXT_CANCEL)],
+        ],
+        resize_keyboard=True
+    )
+
+
 def kb_refetch_choices() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -109,6 +142,12 @@ class BroadcastMedia(StatesGroup):
     waiting_caption = State()
 
 
+# Аудитория и подтверждение — общие для текста и медиа; `compose_state` в данных FSM — куда вернуться
+class BroadcastAudience(StatesGroup):
+    waiting_spec = State()
+    confirming = State()
+
+
 # Admin main (optional)
 @router.message(Command("admin"))
 async def open_admin_cmd(message: Message, admin_ids: set[int]):
@@ -120,12 +159,249 @@ async def open_admin_cmd(message: Message, admin_ids: set[int]):
 # Sources
 @router.message(F.text == BTN_SOURCES)
 @router.message(Command("sources"))
-async def cmd_sources(message: Message, admin_ids: set[int], telegram_fetcher: TelegramFetcher | None = None):
+async def cmd_sources(message: Message, storage: Storage, admin_ids: set[int], telegram_fetcher: TelegramFetcher | None = None,
+                      burst: BurstCoalescer | None = None):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    if not telegram_fetcher:
+        return await message.answer("Telethon is not configured or not running.")
+    stats = await storage.get_source_stats()
+    lines = ["📚 Connected channels:"]
+    for ch in telegram_fetcher.channels:
+        count, last = stats.get(ch.lower(), (0, None))
+        last_s = last[:16].replace("T", " ") if last else "—"
+        lines.append(f"• {ch} — {count} posts, last: {last_s}")
+    if len(lines) == 1:
+        lines.append("none")
+    if burst:
+        b = burst.stats()
+        lines.append(f"\nBursts: {b['coalesced']} posts merged into {b['bursts']} notifications, "
+                     f"{b['passed']} sent alone, {b['pending']} waiting")
+    lines.append("\n/addsource name — add, /rmsource name — remove")
+    await message.answer("\n".join(lines), reply_markup=kb_admin_main())
+
+
+@router.message(Command("addsource"))
+async def cmd_addsource(message: Message, storage: Storage, admin_ids: set[int], telegram_fetcher: TelegramFetcher | None = None):
     if not is_admin(message, admin_ids):
         return await message.answer("Admins only.")
+    parts = (message.text or "").split(maxsplit=1)
+    if len(parts) < 2:
+        return await message.answer("Provide a channel: /addsource tengrinews")
     if not telegram_fetcher:
         return await message.answer("Telethon is not configured or not running.")
-    await message.answer("Connected channels: " + ", ".join(telegram_fetcher.channels), reply_markup=kb_admin_main())
+    src = parts[1].strip().lstrip("@").lower()
+    await message.answer(f"Connecting {src}…")
+    try:
+        title = await telegram_fetcher.add_channel(src)
+    except Exception as e:
+        return await message.answer(f"Failed to add {src}: {e}")
+    await storage.set_channel_enabled(src, True, added_by=message.from_user.id)
+    await message.answer(f"Added source: {src} ({title}).", reply_markup=kb_admin_main())
+
+
+@router.message(Command("rmsource"))
+async def cmd_rmsource(message: Message, storage: Storage, admin_ids: set[int], telegram_fetcher: TelegramFetcher | None = None):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    parts = (message.text or "").split(maxsplit=1)
+    if len(parts) < 2:
+        return await message.answer("Provide a channel: /rmsource tengrinews")
+    src = parts[1].strip().lstrip("@").lower()
+    await storage.set_channel_enabled(src, False)
+    removed = telegram_fetcher.remove_channel(src) if telegram_fetcher else False
+    await message.answer(f"Removed source: {src}." if removed else f"{src} was not connected; disabled in registry.",
+                         reply_markup=kb_admin_main())
+
+
+# Active users: /active [days]
+@router.message(Command("active"))
+async def cmd_active(message: Message, storage: Storage, admin_ids: set[int], activity: ActivityTracker | None = None):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    parts = (message.text or "").split(maxsplit=1)
+    days = int(parts[1]) if len(parts) > 1 and parts[1].strip().isdigit() else 7
+    if activity:
+        await activity.flush()
+    lines = [f"Active users: {await storage.count_active_users(d)} in {d}d" for d in sorted({1, days})]
+    await message.answer("\n".join(lines), reply_markup=kb_admin_main())
+
+
+# Update executor stats: /queue
+@router.message(Command("queue"))
+async def cmd_queue(message: Message, admin_ids: set[int], update_executor: KeyedUpdateExecutor | None = None):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    if not update_executor:
+        return await message.answer("Update executor is not enabled.")
+    st = update_executor.stats()
+    await message.answer(
+        f"Workers: {st['running']}/{st['workers']} busy\n"
+        f"Queue depth: {st['queue_depth']} (max {st['max_queue_depth']}), active chats: {st['active_keys']}\n"
+        f"Wait p50/p95/max: {st['wait_p50_ms']}/{st['wait_p95_ms']}/{st['wait_max_ms']} ms\n"
+        f"Processed: {st['processed']}",
+        reply_markup=kb_admin_main()
+    )
+
+
+# Event loop stalls: /stalls [reset]
+@router.message(Command("stalls"))
+async def cmd_stalls(message: Message, admin_ids: set[int], loop_watchdog: LoopWatchdog | None = None):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    if not loop_watchdog:
+        return await message.answer("Loop watchdog is disabled (LOOP_STALL_MS=0).")
+    if (message.text or "").split()[1:2] == ["reset"]:
+        loop_watchdog.reset()
+        return await message.answer("Stall stats cleared.", reply_markup=kb_admin_main())
+    rows = loop_watchdog.report()
+    lines = [
+        f"Loop stalls ≥{loop_watchdog.threshold * 1000:.0f} ms: {loop_watchdog.stalls}, "
+        f"max lag {loop_watchdog.max_lag * 1000:.0f} ms"
+    ]
+    for r in rows:
+        lines.append(
+            f"• {html.escape(r['site'])}: {r['count']}× total {r['total_ms']:.0f} ms, max {r['max_ms']:.0f} ms\n"
+            f"  in {html.escape(r['blocker'])} [{html.escape(str(r['task']))}]"
+        )
+    await message.answer("\n".join(lines), reply_markup=kb_admin_main())
+
+
+# Storage profile: /dbprofile [reset]
+@router.message(Command("dbprofile"))
+async def cmd_dbprofile(message: Message, admin_ids: set[int], query_profiler: QueryProfiler | None = None):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    if not query_profiler:
+        return await message.answer("Query profiler is disabled (QUERY_PROFILE=1 to enable).")
+    if (message.text or "").split()[1:2] == ["reset"]:
+        query_profiler.reset()
+        return await message.answer("Query profile cleared.", reply_markup=kb_admin_main())
+    sm = query_profiler.summary(top=5)
+    lines = ["<b>Storage methods</b> (total / p50 / p95 / p99 ms):"]
+    for r in sm["methods"]:
+        lines.append(f"• {r['key']} ×{r['count']}: {r['total_ms']:.0f} / {r.get('p50', 0)} / {r.get('p95', 0)} / {r.get('p99', 0)}")
+    lines.append("\n<b>SQL</b> (total + fetch ms):")
+    for r in sm["statements"]:
+        lines.append(f"• ×{r['count']} {r['total_ms']:.0f}+{r['fetch_ms']:.0f}: <code>{html.escape(r['key'][:120])}</code>")
+    if sm["table_scans"]:
+        lines.append("\n<b>Table scans (no index)</b>:")
+        lines.extend(f"• <code>{html.escape(k[:120])}</code>" for k in sm["table_scans"][:5])
+    if sm["slow"]:
+        lines.append(f"\n<b>Slow (≥{query_profiler.slow_s * 1000:.0f} ms)</b>:")
+        for e in sm["slow"]:
+            plan = "; ".join(e["plan"]) or "-"
+            lines.append(f"• {e['ms']} ms <code>{html.escape(e['sql'][:100])}</code>\n  {html.escape(plan[:160])}")
+    await message.answer("\n".join(lines), reply_markup=kb_admin_main())
+
+
+def _fmt_ms(v) -> str:
+    if v is None:
+        return "-"
+    return f"{v / 1000:.1f}s" if v >= 1000 else f"{v}ms"
+
+
+# Post-to-delivery freshness: /freshness [days] [release]
+@router.message(Command("freshness"))
+async def cmd_freshness(message: Message, storage: Storage, admin_ids: set[int]):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    args = (message.text or "").split()[1:]
+    days = int(args[0]) if args and args[0].isdigit() else 7
+    release = args[1] if len(args) > 1 else None
+    rows = await storage.get_freshness_rows(days, release)
+    if not rows:
+        return await message.answer("No delivery data yet.", reply_markup=kb_admin_main())
+    by_source: dict[str, list] = {}
+    for row in rows:
+        by_source.setdefault(row[0], []).append(row)
+    header = f"Freshness for {days}d" + (f", release {release}" if release else "") + " (p50/p95/p99):"
+    lines = [header]
+    for source, items in sorted(by_source.items(), key=lambda kv: -len(kv[1])):
+        ingest = summarize(r[1] for r in items)
+        first = summarize(r[3] for r in items)
+        full = summarize(r[4] for r in items)
+        lines.append(
+            f"• @{source} ({len(items)} posts)\n"
+            f"  ingest {_fmt_ms(ingest['p50'])}/{_fmt_ms(ingest['p95'])}/{_fmt_ms(ingest['p99'])}\n"
+            f"  first send {_fmt_ms(first['p50'])}/{_fmt_ms(first['p95'])}/{_fmt_ms(first['p99'])}\n"
+            f"  full fanout {_fmt_ms(full['p50'])}/{_fmt_ms(full['p95'])}/{_fmt_ms(full['p99'])}"
+        )
+    await message.answer("\n".join(lines), reply_markup=kb_admin_main())
+
+
+# Near-duplicate reposts: /dups [days]
+@router.message(Command("dups"))
+async def cmd_dups(message: Message, storage: Storage, admin_ids: set[int], near_dup: NearDuplicateDetector | None = None):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    if not near_dup:
+        return await message.answer("Near-duplicate detection is disabled (NEAR_DUP_DISTANCE=-1).")
+    args = (message.text or "").split()[1:]
+    days = int(args[0]) if args and args[0].isdigit() else 7
+    st = near_dup.stats()
+    lines = [
+        f"Near-dup: distance ≤{st['max_distance']}, {st['bands']} bands, window {st['window']} posts "
+        f"({st['buckets']} buckets); since start {st['matches']}/{st['checked']} matched"
+    ]
+    by_source = await storage.count_duplicates(days)
+    if by_source:
+        lines.append(f"\nSuppressed reposts for {days}d:")
+        lines.extend(f"• @{src}: {n}" for src, n in sorted(by_source.items(), key=lambda kv: -kv[1]))
+    if near_dup.recent:
+        lines.append("\nRecent:")
+        for m in list(near_dup.recent)[-5:]:
+            lines.append(f"• @{m['source']} → #{m['original_id']} @{m['original_source']} (d={m['distance']})")
+    await message.answer("\n".join(lines), reply_markup=kb_admin_main())
+
+
+# Timetable: /timetable — статистика, /timetable reload — реимпорт TIMETABLE_PATH,
+# документ .csv/.ics с подписью "/timetable [group] [replace]" — импорт файла
+@router.message(Command("timetable"))
+async def cmd_timetable(message: Message, storage: Storage, admin_ids: set[int], timetable: Timetable | None = None,
+                        timetable_paths: list[str] | None = None, reminders: ReminderScheduler | None = None):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    if not timetable:
+        return await message.answer("Timetable is not enabled.")
+    args = (message.text or message.caption or "").split()[1:]
+    replace = "replace" in args
+    args = [a for a in args if a != "replace"]
+    try:
+        if message.document:
+            name = message.document.file_name or "timetable.csv"
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in (".csv", ".ics", ".ical"):
+                return await message.answer("Send a .csv or .ics file.", reply_markup=kb_admin_main())
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, name)
+                await message.bot.download(message.document, destination=path)
+                result = await timetable.import_files([path], group=args[0] if args else None, replace=replace)
+        elif args[:1] == ["reload"]:
+            # подхватывает и импорт из CLI (src.tools.timetable_import), сделанный в обход бота
+            await timetable.load()
+            result = await timetable.import_files(timetable_paths or [], replace=replace)
+        else:
+            groups, lessons, students = await storage.get_timetable_stats()
+            st = timetable.stats()
+            rm = reminders.stats() if reminders else None
+            reminder_line = (
+                f"Reminders: {rm['subscribers']} users in {rm['groups']} groups, {rm['queued']} slots queued, "
+                f"next {rm['next_at'] or '-'}; sent {rm['jobs_sent']} slots / {rm['messages_sent']} msgs, "
+                f"{rm['failed']} failed\n" if rm else "Reminders: off\n"
+            )
+            return await message.answer(
+                f"Timetable: {groups} groups, {lessons} lessons, {students} linked students\n"
+                f"Render cache: {st['rendered_groups']} groups, {st['cached_views']} views\n"
+                + reminder_line +
+                f"Sources: {', '.join(timetable_paths or []) or '-'}\n"
+                "Send a .csv/.ics file with caption /timetable [group] [replace] to import.",
+                reply_markup=kb_admin_main()
+            )
+    except (OSError, UnicodeDecodeError, TimetableFormatError) as e:
+        return await message.answer(f"❌ Import failed: {html.escape(str(e))}", reply_markup=kb_admin_main())
+    summary = ", ".join(f"{k}: {v}" for k, v in result.items())
+    await message.answer(f"✅ Timetable imported ({summary}).", reply_markup=kb_admin_main())
 
 
 # Refetch via buttons
@@ -191,37 +467,31 @@ async def bc_text_back(message: Message, state: FSMContext):
     await state.clear()
     await message.answer("Back.", reply_markup=kb_broadcast_menu())
 
+@router.message(BroadcastText.waiting_text, F.text == BTN_BC_AUDIENCE)
+@router.message(BroadcastMedia.collecting, F.text == BTN_BC_AUDIENCE)
+async def bc_audience_enter(message: Message, state: FSMContext, admin_ids: set[int]):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    data = await state.get_data()
+    await state.update_data(compose_state=await state.get_state())
+    await state.set_state(BroadcastAudience.waiting_spec)
+    await message.answer(f"Current audience: {data.get('segment') or 'all'}\n\n{SEGMENT_HELP}")
+
 # ВАЖНО: отправка должна стоять ДО общего обработчика текста
 @router.message(BroadcastText.waiting_text, F.text == BTN_TXT_SEND)
 async def bc_text_send(message: Message, state: FSMContext, storage: Storage, admin_ids: set[int]):
     if not is_admin(message, admin_ids):
         return await message.answer("Admins only.")
     data = await state.get_data()
-    text = data.get("text")
-    if not text:
+    if not data.get("text"):
         return await message.answer("No text yet. Send the message first.", reply_markup=kb_text_actions(has_text=False))
-
-    await state.clear()
-    user_ids = await storage.get_all_user_ids()
-    ok = 0
-    failed = 0
-    await message.answer(f"Starting broadcast to {len(user_ids)} users…")
-
-    for uid in user_ids:
-        try:
-            await message.bot.send_message(uid, text, disable_web_page_preview=False)
-            ok += 1
-            await asyncio.sleep(0.03)
-        except Exception:
-            failed += 1
-
-    await message.answer(f"Broadcast finished. Success: {ok}, failed: {failed}.", reply_markup=kb_broadcast_menu())
+    await _ask_confirm(message, state, storage)
 
 # Общий обработчик текста — ДОЛЖЕН быть ПОСЛЕ отправки; игнорируем кнопки
 @router.message(BroadcastText.waiting_text, F.text)
 async def bc_text_catch_text(message: Message, state: FSMContext, admin_ids: set[int]):
     # Если прилетела одна из кнопок — игнор
-    if message.text in {BTN_TXT_SEND, BTN_TXT_EDIT, BTN_TXT_CANCEL, BTN_BACK}:
+    if message.text in {BTN_TXT_SEND, BTN_TXT_EDIT, BTN_TXT_CANCEL, BTN_BACK, BTN_BC_AUDIENCE}:
         return
     if not is_admin(message, admin_ids):
         return await message.answer("Admins only.")
@@ -270,44 +540,9 @@ async def bc_media_send(message: Message, state: FSMContext, storage: Storage, a
     if not is_admin(message, admin_ids):
         return await message.reply("Admins only.")
     data = await state.get_data()
-    photos: List[str] = data.get("photos") or []
-    caption: str | None = data.get("caption")
-
-    if not photos:
+    if not data.get("photos"):
         return await message.answer("You haven’t added any photos. Use ➕ Add photo.", reply_markup=kb_media_actions())
-
-    await state.clear()
-    user_ids = await storage.get_all_user_ids()
-    ok = 0
-    failed = 0
-    await message.answer(f"Sending {len(photos)} photo(s) to {len(user_ids)} users…")
-
-    bot = message.bot
-
-    if len(photos) == 1:
-        for uid in user_ids:
-            try:
-                await bot.send_photo(uid, photos[0], caption=caption)
-                ok += 1
-                await asyncio.sleep(0.05)
-            except Exception:
-                failed += 1
-    else:
-        media_group = []
-        for i, fid in enumerate(photos[:10]):  # telegram limit is 10
-            if i == 0 and caption:
-                media_group.append(InputMediaPhoto(media=fid, caption=caption))
-            else:
-                media_group.append(InputMediaPhoto(media=fid))
-        for uid in user_ids:
-            try:
-                await bot.send_media_group(uid, media_group)
-                ok += 1
-                await asyncio.sleep(0.08)
-            except Exception:
-                failed += 1
-
-    await message.answer(f"Broadcast finished. Success: {ok}, failed: {failed}.", reply_markup=kb_broadcast_menu())
+    await _ask_confirm(message, state, storage)
 
 @router.message(BroadcastMedia.collecting, F.text.in_({BTN_MEDIA_CANCEL, BTN_BACK}))
 @router.message(BroadcastMedia.waiting_caption, F.text.in_({BTN_MEDIA_CANCEL, BTN_BACK}))
@@ -328,4 +563,156 @@ async def collect_photo(message: Message, state: FSMContext, admin_ids: set[int]
     photos.append(file_id)
 
     await state.update_data(photos=photos)
-    await message.answer(f"Photo added ({len(photos)}/10). You can add more or press 📨 Send.", reply_markup=kb_media_actions())
\ No newline at end of file
+    await message.answer(f"Photo added ({len(photos)}/10). You can add more or press 📨 Send.", reply_markup=kb_media_actions())
+
+
+# Audience + confirmation (text and media)
+def _compose_keyboard(data: dict) -> ReplyKeyboardMarkup:
+    if data.get("compose_state") == BroadcastMedia.collecting.state:
+        return kb_media_actions()
+    return kb_text_actions(has_text=bool(data.get("text")))
+
+
+async def _ask_confirm(message: Message, state: FSMContext, storage: Storage):
+    # dry run: тот же WHERE, что и у рассылки, но только COUNT(*)
+    data = await state.get_data()
+    segment = Segment.parse(data.get("segment") or "")
+    total = await storage.count_segment(segment)
+    await state.update_data(compose_state=await state.get_state())
+    await state.set_state(BroadcastAudience.confirming)
+    await message.answer(f"🎯 Audience: {segment.describe()} — {total} users.\nPress {BTN_BC_CONFIRM} to start.",
+                         reply_markup=kb_confirm())
+
+
+@router.message(BroadcastAudience.waiting_spec, F.text)
+async def bc_audience_set(message: Message, state: FSMContext, storage: Storage, admin_ids: set[int]):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    data = await state.get_data()
+    if message.text not in {BTN_BACK, BTN_TXT_CANCEL}:
+        try:
+            segment = Segment.parse(message.text)
+        except SegmentError as e:
+            return await message.answer(f"{e}\n\n{SEGMENT_HELP}")
+        total = await storage.count_segment(segment)
+        await state.update_data(segment=segment.describe())
+        await message.answer(f"🎯 Audience: {segment.describe()} — {total} users.")
+    await state.set_state(data.get("compose_state"))
+    await message.answer("Back to the broadcast.", reply_markup=_compose_keyboard(data))
+
+
+@router.message(BroadcastAudience.confirming, F.text == BTN_TXT_CANCEL)
+async def bc_confirm_cancel(message: Message, state: FSMContext):
+    data = await state.get_data()
+    await state.set_state(data.get("compose_state"))
+    await message.answer("Not sent. You can edit the broadcast.", reply_markup=_compose_keyboard(data))
+
+
+@router.message(BroadcastAudience.confirming, F.text == BTN_BC_CONFIRM)
+async def bc_confirm_send(message: Message, state: FSMContext, storage: Storage, admin_ids: set[int],
+                          fanout_metrics: FanoutMetrics | None = None):
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    data = await state.get_data()
+    await state.clear()
+    payload = {
+        "segment": data.get("segment") or "",
+        "media": data.get("compose_state") == BroadcastMedia.collecting.state,
+        "text": data.get("text"),
+        "photos": data.get("photos") or [],
+        "caption": data.get("caption"),
+    }
+    job_id = f"broadcast:{int(time.time() * 1000)}"
+    await storage.start_fanout(job_id, "broadcast", json.dumps(payload, ensure_ascii=False))
+    segment = Segment.parse(payload["segment"])
+    if payload["media"]:
+        await message.answer(f"Sending {len(payload['photos'])} photo(s) to «{segment.describe()}»…")
+    else:
+        await message.answer(f"Starting broadcast to «{segment.describe()}»…")
+    ok, failed = await _run_broadcast(message.bot, storage, job_id, payload, fanout_metrics)
+    await message.answer(f"Broadcast finished. Success: {ok}, failed: {failed}.", reply_markup=kb_broadcast_menu())
+
+
+# рассылки, идущие в этом процессе, — /resume их не трогает
+_running_broadcasts: set[str] = set()
+
+
+async def _run_broadcast(bot, storage: Storage, job_id: str, payload: dict, fanout_metrics: FanoutMetrics | None,
+                         after: int | None = None, ok: int = 0, failed: int = 0) -> tuple[int, int]:
+    segment = Segment.parse(payload["segment"])
+    photos: List[str] = payload["photos"]
+    caption: str | None = payload["caption"]
+    text: str | None = payload["text"]
+
+    if payload["media"]:
+        if len(photos) == 1:
+            async def send(uid: int):
+                await bot.send_photo(uid, photos[0], caption=caption)
+            delay = 0.05
+        else:
+            media_group = []
+            for i, fid in enumerate(photos[:10]):  # telegram limit is 10
+                if i == 0 and caption:
+                    media_group.append(InputMediaPhoto(media=fid, caption=caption))
+                else:
+                    media_group.append(InputMediaPhoto(media=fid))
+
+            async def send(uid: int):
+                await bot.send_media_group(uid, media_group)
+            delay = 0.08
+    else:
+        async def send(uid: int):
+            await bot.send_message(uid, text, disable_web_page_preview=False)
+        delay = 0.03
+
+    fm = fanout_metrics or FanoutMetrics(MetricsRegistry(enabled=False))
+    _running_broadcasts.add(job_id)
+    try:
+        # получатели читаются из БД порциями по ходу отправки; после порции — чекпойнт для /resume
+        async for chunk in storage.iter_segment(segment, after=after):
+            fm.pending.inc(len(chunk), path="broadcast")
+            for uid in chunk:
+                try:
+                    await send(uid)
+                    ok += 1
+                    fm.sent("broadcast")
+                    await asyncio.sleep(delay)
+                except Exception as e:
+                    failed += 1
+                    fm.failed("broadcast", e)
+                finally:
+                    fm.pending.dec(path="broadcast")
+            await storage.advance_fanout(job_id, chunk[-1], ok, failed)
+        await storage.finish_fanout(job_id)
+    finally:
+        _running_broadcasts.discard(job_id)
+    return ok, failed
+
+
+@router.message(Command("resume"))
+async def cmd_resume(message: Message, storage: Storage, admin_ids: set[int],
+                     fanout_metrics: FanoutMetrics | None = None):
+    """/resume — прерванные рестартом рассылки; /resume <id> — продолжить с последней порции."""
+    if not is_admin(message, admin_ids):
+        return await message.answer("Admins only.")
+    jobs = [j for j in await storage.get_unfinished_fanouts(("broadcast",)) if j[0] not in _running_broadcasts]
+    arg = (message.text or "").split(maxsplit=1)[1:]
+    if not arg:
+        if not jobs:
+            return await message.answer("No interrupted broadcasts.")
+        lines = ["⏸ Interrupted broadcasts:"]
+        for job_id, _kind, payload, cursor, sent, failed, created_at in jobs:
+            data = json.loads(payload)
+            what = f"{len(data['photos'])} photo(s)" if data["media"] else html.escape((data["text"] or "")[:40])
+            lines.append(f"• <code>{job_id.split(':', 1)[1]}</code> {created_at[:16].replace('T', ' ')} — "
+                         f"{what} → {data['segment'] or 'all'}, sent {sent}, failed {failed}")
+        lines.append("\n/resume &lt;id&gt; — continue after the last delivered chunk")
+        return await message.answer("\n".join(lines))
+    job = next((j for j in jobs if j[0] == f"broadcast:{arg[0].strip()}"), None)
+    if not job:
+        return await message.answer("No such interrupted broadcast.")
+    job_id, _kind, payload, cursor, sent, failed, _created = job
+    await message.answer(f"Resuming after user {cursor}: {sent} already sent…")
+    ok, failed = await _run_broadcast(message.bot, storage, job_id, json.loads(payload), fanout_metrics,
+                                      after=cursor, ok=sent, failed=failed)
+    await message.answer(f"Broadcast finished. Success: {ok}, failed: {failed}.", reply_markup=kb_broadcast_menu())
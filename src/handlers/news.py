@@ -5,7 +5,7 @@ from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, F
 from aiogram.filters import Command
 
 from src.storage import Storage
-from src.utils.text import md_to_html, clip_for_caption
+from src.utils.text import clip_for_caption
 
 router = Router(name="news")
 
@@ -36,24 +36,16 @@ async def cmd_news(message: Message, storage: Storage):
         await message.answer("No news yet. Please check later!")
         return
 
-    for row in rows:
-        # id, title, text, source, created_at, post_url, external_url, media_path, source_title
-        _id, title, text, source_username, *rest = row
-        post_url = rest[1] if len(rest) >= 2 else None
-        external_url = rest[2] if len(rest) >= 3 else None
-        media_path = rest[3] if len(rest) >= 4 else None
-        source_title = rest[4] if len(rest) >= 5 else None
+    for item in rows:
+        header = source_line(item.source, item.source_title)
+        kb = build_read_more_kb(item.post_url, item.external_url)
 
-        header = source_line(source_username, source_title)
-        body_html = md_to_html(text or "")
-        kb = build_read_more_kb(post_url, external_url)
-
-        add_preview_url = (external_url or post_url) if not media_path else None
+        add_preview_url = (item.external_url or item.post_url) if not item.media_path else None
         preview_tail = f"\n\n{add_preview_url}" if add_preview_url else ""
 
-        caption = f"{header}\n\n{body_html}{preview_tail}"
+        caption = f"{header}\n\n{item.html}{preview_tail}"
 
-        if media_path and os.path.exists(media_path):
-            await message.answer_photo(photo=FSInputFile(media_path), caption=clip_for_caption(caption), reply_markup=kb)
+        if item.media_path and os.path.exists(item.media_path):
+            await message.answer_photo(photo=FSInputFile(item.media_path), caption=clip_for_caption(caption), reply_markup=kb)
         else:
-            await message.answer(caption, reply_markup=kb, disable_web_page_preview=False)
\ No newline at end of file
+            await message.answer(caption, reply_markup=kb, disable_web_page_preview=False)
@@ -7,6 +7,8 @@ import os
 
 from src.storage import Storage
 from src.handlers.common_keyboards import kb_main
+from src.services.reminders import ReminderScheduler
+from src.services.timetable import Timetable
 
 router = Router(name="profile")
 
@@ -26,8 +28,7 @@ BTN_REMOVE_PHOTO_SET = {BTN_REMOVE_PHOTO, "Удалить фото"}
 BTN_BACK_SET = {BTN_BACK, "Назад"}
 BTN_SKIP_SET = {BTN_SKIP, "/skip"}
 
-PROFILE_PHOTO_DIR = "data/profile_photos"
-os.makedirs(PROFILE_PHOTO_DIR, exist_ok=True)
+PROFILE_PHOTO_DIR = "data/profile_photos"  # создаётся при первой загрузке фото
 
 class StudentFSM(StatesGroup):
     waiting_id = State()
@@ -60,9 +61,10 @@ def kb_back_or_skip() -> ReplyKeyboardMarkup:
 @router.message(StateFilter("*"), F.text.in_({"👤 Profile", "Профиль"}))
 async def show_profile(message: Message, storage: Storage):
     user_id = message.from_user.id
-    student_id, full_name, profile_photo = await storage.get_student_profile(user_id)
-    student_id = student_id or "Not set"
-    full_name = full_name or "Not set"
+    profile = await storage.get_profile(user_id)
+    profile_photo = profile.profile_photo
+    student_id = profile.student_id or "Not set"
+    full_name = profile.full_name or "Not set"
 
     text = (
         "👤 <b>Your profile</b>\n"
@@ -101,7 +103,8 @@ async def set_student_id(message: Message, state: FSMContext):
     await message.answer("Please send your student ID (format: P1234567)", reply_markup=kb_back_or_skip())
 
 @router.message(StudentFSM.waiting_id, F.text)
-async def handle_student_id(message: Message, state: FSMContext, storage: Storage):
+async def handle_student_id(message: Message, state: FSMContext, storage: Storage, timetable: Timetable | None = None,
+                            reminders: ReminderScheduler | None = None):
     student_id = (message.text or "").strip().upper()
     if student_id in BTN_BACK_SET or student_id in BTN_SKIP_SET:
         await state.clear()
@@ -111,10 +114,15 @@ async def handle_student_id(message: Message, state: FSMContext, storage: Storag
         return await message.answer("❌ Invalid ID. Please send a valid student ID (e.g. P1234567).", reply_markup=kb_back_or_skip())
 
     # Сохраняем ID, не трогая имя/фото
-    cur_id, cur_name, cur_photo = await storage.get_student_profile(message.from_user.id)
-    await storage.set_student_profile(message.from_user.id, student_id, cur_name or "", profile_photo=cur_photo)
+    cur = await storage.get_profile(message.from_user.id)
+    await storage.set_student_profile(message.from_user.id, student_id, cur.full_name or "", profile_photo=cur.profile_photo)
     await state.clear()
-    await message.answer("✅ Student ID saved.", reply_markup=kb_profile_menu())
+    if reminders:
+        # группа могла смениться — напоминания переезжают вместе с ней
+        await reminders.refresh_user(message.from_user.id)
+    group = timetable.group_for(student_id) if timetable else None
+    note = f" Group: {group}." if group else ""
+    await message.answer(f"✅ Student ID saved.{note}", reply_markup=kb_profile_menu())
 
 # Установить/изменить ФИО
 @router.message(StateFilter("*"), F.text.in_(BTN_SET_NAME_SET))
@@ -133,8 +141,8 @@ async def handle_full_name(message: Message, state: FSMContext, storage: Storage
         return await message.answer("❌ Please send your full name (Firstname Lastname).", reply_markup=kb_back_or_skip())
 
     # Сохраняем имя, не трогая ID/фото
-    cur_id, cur_name, cur_photo = await storage.get_student_profile(message.from_user.id)
-    await storage.set_student_profile(message.from_user.id, cur_id or "", full_name, profile_photo=cur_photo)
+    cur = await storage.get_profile(message.from_user.id)
+    await storage.set_student_profile(message.from_user.id, cur.student_id or "", full_name, profile_photo=cur.profile_photo)
     await state.clear()
     await message.answer("✅ Full name saved.", reply_markup=kb_profile_menu())
 
@@ -156,9 +164,9 @@ async def handle_photo(message: Message, state: FSMContext, storage: Storage):
     student_id = data.get("student_id")
     full_name = data.get("full_name")
     if student_id is None or full_name is None:
-        cur_id, cur_name, _cur_photo = await storage.get_student_profile(message.from_user.id)
-        student_id = student_id if student_id is not None else (cur_id or "")
-        full_name = full_name if full_name is not None else (cur_name or "")
+        cur = await storage.get_profile(message.from_user.id)
+        student_id = student_id if student_id is not None else (cur.student_id or "")
+        full_name = full_name if full_name is not None else (cur.full_name or "")
 
     await storage.set_student_profile(message.from_user.id, student_id, full_name, profile_photo=photo_path)
     await state.clear()
@@ -174,11 +182,11 @@ async def skip_photo(message: Message, state: FSMContext, storage: Storage):
 @router.message(StateFilter("*"), F.text.in_(BTN_REMOVE_PHOTO_SET))
 async def remove_photo(message: Message, storage: Storage):
     user_id = message.from_user.id
-    cur_id, cur_name, cur_photo = await storage.get_student_profile(user_id)
-    if cur_photo and os.path.exists(cur_photo):
+    cur = await storage.get_profile(user_id)
+    if cur.profile_photo and os.path.exists(cur.profile_photo):
         try:
-            os.remove(cur_photo)
+            os.remove(cur.profile_photo)
         except Exception:
             pass
-    await storage.set_student_profile(user_id, cur_id or "", cur_name or "", profile_photo=None)
+    await storage.set_student_profile(user_id, cur.student_id or "", cur.full_name or "", profile_photo=None)
     await message.answer("🗑 Profile photo removed.", reply_markup=kb_profile_menu())
\ No newline at end of file
@@ -3,64 +3,20 @@ from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
-import random
 
 from src.handlers.common_keyboards import kb_main
+from src.services.reminders import ReminderScheduler
+from src.services.timetable import ALL_DAYS, Timetable
 from src.storage import Storage
 
 router = Router(name="schedule")
 
 BTN_BACK = "⬅️ Back"
-DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "All"]
-
-TEACHERS = [
-    {"name": "Ivan Ivanov", "email": "ivan.ivanov@dmuk.kz"},
-    {"name": "Jane Doe", "email": "jane.doe@dmuk.kz"},
-    {"name": "Daniyar Akhmetov", "email": "daniyar.akhmetov@dmuk.kz"},
-    {"name": "Svetlana Kim", "email": "svetlana.kim@dmuk.kz"},
-    {"name": "Aidos Mukhtar", "email": "aidos.mukhtar@dmuk.kz"},
-]
-SUBJECTS = [
-    {"code": "CS101", "name": "Intro to Computer Science"},
-    {"code": "CS202", "name": "Algorithms"},
-    {"code": "CS301", "name": "Database Systems"},
-    {"code": "CS404", "name": "Artificial Intelligence"},
-    {"code": "CS303", "name": "Operating Systems"},
-    {"code": "CS220", "name": "Web Development"},
-]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", ALL_DAYS]
 
 class ScheduleFSM(StatesGroup):
     waiting_day = State()
 
-def random_room():
-    building = random.choice(["B", "C"])
-    floor = random.randint(1, 4)
-    room = random.randint(1, 9)
-    return f"{building}{floor}.{room}", building
-
-def random_timepair():
-    return random.choice(["09:00-11:30", "11:40-14:10", "14:30-17:00", "16:00-18:00"])
-
-def generate_schedule():
-    schedule = {}
-    for day in DAYS[:-1]:
-        items = []
-        for _ in range(random.randint(1, 2)):  # максимум 2, минимум 1
-            subj = random.choice(SUBJECTS)
-            teacher = random.choice(TEACHERS)
-            room_code, building = random_room()
-            items.append({
-                "subject": f"{subj['code']} {subj['name']}",
-                "teacher": f"{teacher['name']} ({teacher['email']})",
-                "room": room_code,
-                "building": building,
-                "time": random_timepair(),
-            })
-        schedule[day] = items
-    return schedule
-
-SAMPLE_SCHEDULE = generate_schedule()
-
 def kb_days_with_back() -> ReplyKeyboardMarkup:
     keyboard = [[KeyboardButton(text=day)] for day in DAYS]
     keyboard.append([KeyboardButton(text=BTN_BACK)])
@@ -72,6 +28,29 @@ async def ask_day(message: Message, state: FSMContext):
     await state.set_state(ScheduleFSM.waiting_day)
     await message.answer("Choose a day for your schedule:", reply_markup=kb_days_with_back())
 
+# Напоминания о парах: /remind [on|off] — работает и из состояния выбора дня
+@router.message(Command("remind"))
+async def cmd_remind(message: Message, storage: Storage, timetable: Timetable | None = None,
+                     reminders: ReminderScheduler | None = None):
+    if not reminders:
+        return await message.answer("Lecture reminders are disabled.")
+    user_id = message.from_user.id
+    arg = ((message.text or "").split()[1:2] or [""])[0].lower()
+    if arg in ("on", "off"):
+        await storage.set_reminders(user_id, arg == "on")
+        await reminders.refresh_user(user_id)
+    enabled = await storage.get_reminders(user_id)
+    profile = await storage.get_profile(user_id)
+    group = timetable.group_for(profile.student_id) if timetable else None
+    status = "on" if enabled else "off"
+    lines = [f"⏰ Lecture reminders are <b>{status}</b> ({reminders.lead_minutes:g} min before each lecture)."]
+    if enabled and not group:
+        lines.append("Set a student ID linked to a group in /profile to receive them.")
+    elif group:
+        lines.append(f"Group: {group}")
+    lines.append("Use /remind on or /remind off.")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
 # ВАЖНО: перехват профиля прямо из состояния расписания
 @router.message(ScheduleFSM.waiting_day, F.text.in_({"👤 Profile", "Профиль"}))
 @router.message(ScheduleFSM.waiting_day, F.text.regexp(r"^/profile\b"))
@@ -91,41 +70,25 @@ async def return_to_main_menu(message: Message, storage: Storage, admin_ids: set
     await message.fsm_context().clear()
 
 @router.message(ScheduleFSM.waiting_day, F.text)
-async def send_schedule(message: Message, state: FSMContext):
+async def send_schedule(message: Message, state: FSMContext, storage: Storage, timetable: Timetable | None = None):
     day = (message.text or "").strip()
     if day not in DAYS:
         return await message.answer("❌ Please choose a valid day.", reply_markup=kb_days_with_back())
-
-    if day == "All":
-        # Двойные отступы между днями
-        parts = []
-        for d in DAYS[:-1]:
-            items = SAMPLE_SCHEDULE.get(d, [])
-            if not items:
-                continue
-            block_lines = [f"<b>📅 {d}</b>"]
-            for item in items:
-                block_lines.append(
-                    f"📚 <b>{item['subject']}</b>\n"
-                    f"👨‍🏫 {item['teacher']}\n"
-                    f"🏢 Room: {item['room']} ({item['building']})\n"
-                    f"⏰ {item['time']}"
-                )
-            parts.append("\n".join(block_lines))
-        text = "\n\n".join(parts) if parts else "No lectures this week."
-        await message.answer(text, reply_markup=kb_days_with_back(), parse_mode="HTML")
-        return
-
-    items = SAMPLE_SCHEDULE.get(day, [])
-    if not items:
-        return await message.answer("No lectures for this day.", reply_markup=kb_days_with_back())
-
-    lines = [f"<b>📅 {day}</b>"]
-    for item in items:
-        lines.append(
-            f"📚 <b>{item['subject']}</b>\n"
-            f"👨‍🏫 {item['teacher']}\n"
-            f"🏢 Room: {item['room']} ({item['building']})\n"
-            f"⏰ {item['time']}"
-        )
-    await message.answer("\n\n".join(lines), reply_markup=kb_days_with_back(), parse_mode="HTML")
\ No newline at end of file
+    if not timetable:
+        return await message.answer("Schedule is not available yet.", reply_markup=kb_days_with_back())
+
+    # student_id берётся из кэша строки пользователя, группа и готовый текст — из словарей Timetable
+    student_id = (await storage.get_profile(message.from_user.id)).student_id
+    if not student_id:
+        return await message.answer("Set your student ID in /profile to see your group's schedule.",
+                                    reply_markup=kb_days_with_back())
+    group = timetable.group_for(student_id)
+    if not group:
+        return await message.answer(f"Student ID {student_id} is not linked to a group yet.",
+                                    reply_markup=kb_days_with_back())
+
+    text = await timetable.render(group, day)
+    if not text:
+        empty = "No lectures this week." if day == ALL_DAYS else "No lectures for this day."
+        return await message.answer(f"{empty} (group {group})", reply_markup=kb_days_with_back())
+    await message.answer(text, reply_markup=kb_days_with_back(), parse_mode="HTML")
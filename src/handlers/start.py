@@ -4,6 +4,7 @@ from aiogram.filters import CommandStart, Command
 
 from src.storage import Storage
 from src.handlers.common_keyboards import kb_main
+from src.services.digest import MODES, DigestFlusher
 
 router = Router(name="start")
 
@@ -56,8 +57,10 @@ async def cmd_help(message: Message):
         "• /news — Latest news\n"
         "• /subscribe — Enable notifications\n"
         "• /unsubscribe — Disable notifications\n"
+        "• /digest — Instant / hourly / daily delivery\n"
         "• /filters — Personal filters\n"
         "• /schedule — View your schedule\n"
+        "• /remind on|off — Lecture reminders\n"
         "• /profile — View/edit your student profile\n\n"
         "<b>Filters:</b>\n"
         "• /addkw word — Add keyword\n"
@@ -66,7 +69,7 @@ async def cmd_help(message: Message):
         "• /mute source — Mute source (e.g., tengrinews)\n"
         "• /unmute source — Unmute source\n"
         "• /muted — List muted sources\n\n"
-        "<b>Admin:</b> /broadcast_text, /broadcast_media, /sources, /refetch"
+        "<b>Admin:</b> /broadcast_text, /broadcast_media, /sources, /addsource, /rmsource, /refetch, /freshness, /stalls, /dbprofile, /timetable, /dups, /resume"
     )
     await message.answer(text, parse_mode="HTML")
 
@@ -103,4 +106,25 @@ async def do_unsubscribe(message: Message, storage: Storage, admin_ids: set[int]
         "🔕 <b>Notifications disabled.</b>",
         reply_markup=kb_main(False, is_admin),
         parse_mode="HTML"
-    )
\ No newline at end of file
+    )
+
+# Режим доставки: /digest [instant|hourly|daily]
+@router.message(Command("digest"))
+async def cmd_digest(message: Message, storage: Storage, digest: DigestFlusher | None = None):
+    user_id = message.from_user.id
+    arg = ((message.text or "").split()[1:2] or [""])[0].lower()
+    if arg:
+        if arg not in MODES or not digest:
+            return await message.answer("Usage: /digest instant | hourly | daily")
+        await digest.set_mode(user_id, arg)
+    mode = await storage.get_delivery(user_id)
+    hints = {
+        "instant": "every post is delivered right away",
+        "hourly": "posts are collected and sent once an hour",
+        "daily": "posts are collected and sent once a day",
+    }
+    await message.answer(
+        f"📬 Delivery mode: <b>{mode}</b> — {hints.get(mode, '')}.\n"
+        "Change with /digest instant, /digest hourly or /digest daily.",
+        parse_mode="HTML"
+    )
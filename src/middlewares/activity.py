@@ -0,0 +1,26 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User
+
+from src.services.activity import ActivityTracker
+
+
+class ActivityMiddleware(BaseMiddleware):
+    """
+    Outer-middleware для dp.update: отмечает активность пользователя
+    и всегда передаёт апдейт дальше, не перехватывая хендлеры.
+    """
+    def __init__(self, tracker: ActivityTracker):
+        self.tracker = tracker
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if user and not user.is_bot:
+            self.tracker.touch(user.id)
+        return await handler(event, data)
@@ -0,0 +1,31 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.services.metrics import MetricsRegistry
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Inner-middleware: латентность и ошибки по хендлерам."""
+    def __init__(self, registry: MetricsRegistry):
+        self.latency = registry.histogram("handler_seconds", "Handler latency", ["router", "handler"])
+        self.errors = registry.counter("handler_errors_total", "Handler exceptions", ["router", "handler", "error"])
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        router = getattr(data.get("event_router"), "name", "") or ""
+        name = getattr(getattr(data.get("handler"), "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self.errors.inc(router=router, handler=name, error=type(e).__name__)
+            raise
+        finally:
+            self.latency.observe(time.perf_counter() - started, router=router, handler=name)
@@ -0,0 +1,24 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from src.utils.startup import StartupProfile
+
+
+class FirstUpdateMiddleware(BaseMiddleware):
+    """Отмечает время обработки первого апдейта после старта (time-to-first-update)."""
+    def __init__(self, profile: StartupProfile):
+        self.profile = profile
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            if self.profile.first_update_s is None:
+                self.profile.first_update()
@@ -0,0 +1,103 @@
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, TelegramObject, User
+
+# group -> (burst, period_sec): не больше `burst` апдейтов за `period_sec` в среднем
+DEFAULT_LIMITS: Dict[str, Tuple[float, float]] = {
+    "news": (2, 10),
+    "filters": (6, 10),
+    "profile": (6, 10),
+    "default": (12, 10),
+}
+
+
+class TokenBuckets:
+    """
+    Per-key token buckets: O(1) state per key (tokens, last refill ts).
+    Keys are kept in LRU order, so idle (fully refilled) buckets are purged from the head in O(1) amortized.
+    """
+    def __init__(self, limits: Dict[str, Tuple[float, float]], max_keys: int = 100_000):
+        self.limits = limits
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Tuple[int, str], Tuple[float, float]]" = OrderedDict()
+        self.allowed = 0
+        self.dropped = 0
+
+    def _limit(self, group: str) -> Tuple[float, float]:
+        return self.limits.get(group) or self.limits.get("default") or DEFAULT_LIMITS["default"]
+
+    def hit(self, user_id: int, group: str) -> bool:
+        burst, period = self._limit(group)
+        rate = burst / period
+        now = time.monotonic()
+        key = (user_id, group)
+
+        tokens, last = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        ok = tokens >= 1
+        if ok:
+            tokens -= 1
+            self.allowed += 1
+        else:
+            self.dropped += 1
+        self._buckets[key] = (tokens, now)
+        self._expire(now)
+        return ok
+
+    def _expire(self, now: float):
+        while self._buckets:
+            (uid, group), (tokens, last) = next(iter(self._buckets.items()))
+            burst, period = self._limit(group)
+            # bucket полностью восстановился — он эквивалентен отсутствующему
+            if len(self._buckets) > self.max_keys or now - last >= period:
+                self._buckets.popitem(last=False)
+            else:
+                break
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Inner-middleware для dp.message / dp.callback_query.
+    Группа лимита = имя роутера, в котором сработал хендлер (news, filters, profile, ...).
+    Админы и группы из `exempt` не ограничиваются. Лишние апдейты тихо отбрасываются.
+    """
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, float]] | None = None,
+        exempt: set[str] | None = None,
+    ):
+        self.buckets = TokenBuckets(limits or DEFAULT_LIMITS)
+        self.exempt = exempt if exempt is not None else {"admin"}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        if not user or user.id in (data.get("admin_ids") or ()):
+            return await handler(event, data)
+
+        router = data.get("event_router")
+        group = getattr(router, "name", None) or "default"
+        if group in self.exempt:
+            return await handler(event, data)
+        if group not in self.buckets.limits:
+            group = "default"
+
+        if not self.buckets.hit(user.id, group):
+            if isinstance(event, CallbackQuery):
+                # убрать «часики» на кнопке, но ничего не делать
+                try:
+                    await event.answer()
+                except Exception:
+                    pass
+            return None
+        return await handler(event, data)
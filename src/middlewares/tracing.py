@@ -0,0 +1,65 @@
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.types import TelegramObject, Update
+
+from src.services.tracing import Tracer, current_trace, span
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.methods import Response, TelegramMethod
+
+
+class TraceUpdateMiddleware(BaseMiddleware):
+    """Outer-middleware на update: одна трасса на апдейт."""
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        attrs: Dict[str, Any] = {}
+        if isinstance(event, Update):
+            attrs["update_id"] = event.update_id
+            attrs["type"] = event.event_type
+        user = data.get("event_from_user")
+        if user:
+            attrs["user_id"] = user.id
+        with self.tracer.trace("update", **attrs):
+            return await handler(event, data)
+
+
+class TraceHandlerMiddleware(BaseMiddleware):
+    """Inner-middleware: спан хендлера; имя хендлера становится именем трассы."""
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        trace = current_trace()
+        if trace is None:
+            return await handler(event, data)
+        router = getattr(data.get("event_router"), "name", "") or ""
+        name = getattr(getattr(data.get("handler"), "callback", None), "__name__", "unknown")
+        trace.name = f"{router}.{name}"
+        with span(f"handler.{router}.{name}"):
+            return await handler(event, data)
+
+
+class TraceSessionMiddleware(BaseRequestMiddleware):
+    """Session-middleware бота: спан на каждый вызов Bot API (sendMessage, sendPhoto, …)."""
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: "Bot",
+        method: "TelegramMethod",
+    ) -> "Response":
+        if current_trace() is None:
+            return await make_request(bot, method)
+        with span(f"bot.{type(method).__name__}", chat_id=getattr(method, "chat_id", None)):
+            return await make_request(bot, method)
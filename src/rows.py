@@ -0,0 +1,73 @@
+import sqlite3
+from typing import NamedTuple, Optional
+
+from src.utils.text import md_to_html
+
+# Колонки news в порядке NewsItem.__init__; текст читается как BLOB (UTF-8) и декодируется при обращении
+NEWS_COLUMNS = ("n.id, n.title, CAST(n.text AS BLOB), n.source, n.created_at, n.post_url, n.external_url, "
+                "n.media_path, n.source_title")
+
+
+class UserProfile(NamedTuple):
+    """Строка users для кэша и хендлеров (неизменяемая: обновления в кэше — через _replace)."""
+    subscribed: bool
+    is_admin: bool
+    student_id: Optional[str]
+    full_name: Optional[str]
+    profile_photo: Optional[str]
+
+    @staticmethod
+    def from_row(cursor: sqlite3.Cursor, row: tuple) -> "UserProfile":
+        return UserProfile(bool(row[0]), bool(row[1]), row[2], row[3], row[4])
+
+
+NO_PROFILE = UserProfile(False, False, None, None, None)
+
+
+class NewsItem:
+    """
+    Пост из news. Текст хранится как UTF-8 bytes: строка с эмодзи в Python занимает 4 байта на символ,
+    а кириллица в UTF-8 — 2. `text` декодируется при каждом обращении, `html` (md_to_html) считается
+    при первом обращении и кэшируется — в выборках, где его не смотрят, он не создаётся.
+    """
+    __slots__ = ("id", "title", "_text", "source", "created_at", "post_url", "external_url", "media_path",
+                 "source_title", "_html")
+
+    def __init__(self, id: int, title: Optional[str], text: Optional[bytes], source: Optional[str],
+                 created_at: Optional[str] = None, post_url: Optional[str] = None, external_url: Optional[str] = None,
+                 media_path: Optional[str] = None, source_title: Optional[str] = None):
+        self.id = id
+        self.title = title
+        self._text = text
+        self.source = source
+        self.created_at = created_at
+        self.post_url = post_url
+        self.external_url = external_url
+        self.media_path = media_path
+        self.source_title = source_title
+        self._html: Optional[str] = None
+
+    @staticmethod
+    def from_row(cursor: sqlite3.Cursor, row: tuple) -> "NewsItem":
+        # row_factory для выборок с NEWS_COLUMNS
+        return NewsItem(*row)
+
+    @property
+    def text(self) -> str:
+        raw = self._text
+        if raw is None:
+            return ""
+        return raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw
+
+    @property
+    def html(self) -> str:
+        if self._html is None:
+            self._html = md_to_html(self.text)
+        return self._html
+
+    @property
+    def url(self) -> Optional[str]:
+        return self.post_url or self.external_url
+
+    def __repr__(self) -> str:
+        return f"NewsItem(id={self.id}, source={self.source!r}, title={self.title!r})"
@@ -0,0 +1,61 @@
+import asyncio
+import datetime
+from typing import Dict
+
+from src.storage import Storage
+
+
+class ActivityTracker:
+    """
+    Буферизованный трекер last_seen_at.
+    touch() только обновляет словарь в памяти (повторные касания схлопываются),
+    раз в flush_interval секунд все изменения пишутся одним executemany.
+    """
+    def __init__(self, storage: Storage, flush_interval: float = 30.0):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self._dirty: Dict[int, str] = {}
+        self._task: asyncio.Task | None = None
+        self.touches = 0
+        self.flushed_rows = 0
+
+    def touch(self, user_id: int):
+        self.touches += 1
+        self._dirty[user_id] = datetime.datetime.utcnow().isoformat()
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    async def start(self):
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        try:
+            await self.storage.touch_users(batch)
+            self.flushed_rows += len(batch)
+        except Exception as e:
+            # не теряем касания: более свежие значения из нового буфера важнее
+            for uid, ts in batch.items():
+                self._dirty.setdefault(uid, ts)
+            print(f"[ActivityTracker] Flush failed: {e}")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
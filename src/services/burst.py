@@ -0,0 +1,107 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.services.notifier import Notifier
+
+# (title, text, source, post_url, external_url, media_path, news_id) — аргументы on_new_item
+BurstItem = Tuple[str, str, str, Optional[str], Optional[str], Optional[str], Optional[int]]
+
+
+class _Burst:
+    __slots__ = ("items", "first_at", "last_at", "timer")
+
+    def __init__(self, now: float):
+        self.items: List[BurstItem] = []
+        self.first_at = now
+        self.last_at = now
+        self.timer: asyncio.Task | None = None
+
+
+class BurstCoalescer:
+    """
+    Склейка серий постов одного канала в одно уведомление (debounce по источнику).
+    Обёртка над Notifier.notify_new_item с той же сигнатурой, подключается как on_new_item фетчера.
+    Первый пост после `window` секунд тишины уходит сразу; следующие в пределах окна копятся и уходят
+    одним сообщением, когда канал замолчал на `window` секунд, прошло `max_delay` с первого отложенного
+    поста или набралось `max_items`. В БД посты остаются отдельными строками news — /news не меняется.
+    """
+    def __init__(self, notifier: Notifier, window: float, max_delay: float = 60.0, max_items: int = 10):
+        self.notifier = notifier
+        self.window = window
+        self.max_delay = max(window, max_delay)
+        self.max_items = max(2, max_items)
+        self._buffers: Dict[str, _Burst] = {}
+        self._last: Dict[str, float] = {}
+        self._jobs: set[asyncio.Task] = set()
+        self.passed = 0
+        self.bursts = 0
+        self.coalesced = 0
+
+    async def on_new_item(self, title: str, text: str, source: str, post_url: Optional[str],
+                          external_url: Optional[str], media_path: Optional[str], news_id: Optional[int] = None):
+        now = time.monotonic()
+        last = self._last.get(source)
+        self._last[source] = now
+        buf = self._buffers.get(source)
+        if buf is None and (last is None or now - last >= self.window):
+            # канал молчал — без задержки
+            self.passed += 1
+            await self.notifier.notify_new_item(title, text, source, post_url, external_url, media_path, news_id=news_id)
+            return
+        if buf is None:
+            buf = self._buffers[source] = _Burst(now)
+            buf.timer = asyncio.create_task(self._timer(source, buf), name=f"burst:{source}")
+        buf.items.append((title, text, source, post_url, external_url, media_path, news_id))
+        buf.last_at = now
+        if len(buf.items) >= self.max_items:
+            await self._flush(source, buf)
+
+    async def _timer(self, source: str, buf: _Burst):
+        while True:
+            # новые посты только отодвигают срок, поэтому после сна он пересчитывается
+            deadline = min(buf.last_at + self.window, buf.first_at + self.max_delay)
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        job = asyncio.current_task()
+        self._jobs.add(job)
+        try:
+            await self._flush(source, buf)
+        finally:
+            self._jobs.discard(job)
+
+    async def _flush(self, source: str, buf: _Burst):
+        if self._buffers.get(source) is not buf:
+            return
+        del self._buffers[source]
+        if buf.timer and buf.timer is not asyncio.current_task():
+            buf.timer.cancel()
+        items = buf.items
+        try:
+            if len(items) == 1:
+                title, text, src, post_url, external_url, media_path, news_id = items[0]
+                self.passed += 1
+                await self.notifier.notify_new_item(title, text, src, post_url, external_url, media_path, news_id=news_id)
+            else:
+                self.bursts += 1
+                self.coalesced += len(items)
+                await self.notifier.notify_burst(source, items)
+        except Exception as e:
+            print(f"[BurstCoalescer] flush failed for {source}: {e}")
+
+    async def stop(self):
+        """Отправить всё накопленное (остановка бота)."""
+        for source, buf in list(self._buffers.items()):
+            await self._flush(source, buf)
+        if self._jobs:
+            await asyncio.gather(*self._jobs, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "passed": self.passed,
+            "bursts": self.bursts,
+            "coalesced": self.coalesced,
+            "pending": sum(len(b.items) for b in self._buffers.values()),
+        }
@@ -0,0 +1,171 @@
+import asyncio
+import datetime
+import html
+import time
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from src.rows import NewsItem
+from src.services.metrics import FanoutMetrics, MetricsRegistry
+from src.storage import Storage
+
+MODES = ("instant", "hourly", "daily")
+_TITLES = {"hourly": "Hourly digest", "daily": "Daily digest", "instant": "While digest mode was on"}
+_MAX_MESSAGE = 4096
+
+
+def _spread(user_id: int, window: float) -> float:
+    # детерминированное смещение пользователя внутри окна (мультипликативный хэш Кнута)
+    return (user_id * 2654435761 % 2 ** 32) / 2 ** 32 * window
+
+
+def next_flush_at(user_id: int, mode: str, after: float, tz: Optional[datetime.tzinfo] = None,
+                  daily_hour: int = 8, daily_spread: float = 7200.0) -> Optional[float]:
+    """
+    Время следующего дайджеста строго после `after`.
+    hourly — раз в час со смещением пользователя внутри часа; daily — в daily_hour (локальное время tz)
+    плюс смещение в пределах daily_spread секунд. Отправки размазаны по окну, а не пачкой в :00.
+    """
+    if mode == "hourly":
+        offset = _spread(user_id, 3600)
+        at = after - after % 3600 + offset
+        return at if at > after else at + 3600
+    if mode == "daily":
+        offset = _spread(user_id, daily_spread)
+        now = datetime.datetime.fromtimestamp(after, tz)
+        for days in (0, 1, 2):
+            base = (now + datetime.timedelta(days=days)).replace(hour=daily_hour, minute=0, second=0, microsecond=0)
+            at = base.timestamp() + offset
+            if at > after:
+                return at
+    return None
+
+
+class DigestFlusher:
+    """
+    Доставка дайджестов (hourly / daily).
+    Notifier не шлёт таким пользователям посты сразу, а кладёт прошедшие фильтры в digest_queue.
+    Раз в `tick` секунд выбираются пользователи с наступившим digest_next_at (частичный индекс)
+    и получают одно сводное сообщение; время следующей отправки хранится в БД, так что рестарт ничего не теряет.
+    """
+    def __init__(self, bot: Bot, storage: Storage, tz: Optional[datetime.tzinfo] = None, daily_hour: int = 8,
+                 daily_spread_min: float = 120, tick: float = 15.0, batch: int = 200, max_items: int = 30,
+                 fanout_metrics: Optional[FanoutMetrics] = None, send_delay: float = 0.03):
+        self.bot = bot
+        self.storage = storage
+        self.tz = tz
+        self.daily_hour = daily_hour
+        self.daily_spread = daily_spread_min * 60
+        self.tick = tick
+        self.batch = batch
+        self.max_items = max_items
+        self.fanout_metrics = fanout_metrics or FanoutMetrics(MetricsRegistry(enabled=False))
+        self.send_delay = send_delay
+        self._task: asyncio.Task | None = None
+        self.digests_sent = 0
+        self.items_sent = 0
+        self.failed = 0
+
+    def next_at(self, user_id: int, mode: str, after: Optional[float] = None) -> Optional[float]:
+        return next_flush_at(user_id, mode, time.time() if after is None else after, self.tz,
+                             self.daily_hour, self.daily_spread)
+
+    async def set_mode(self, user_id: int, mode: str):
+        """Сменить режим; при возврате в instant накопленное отправляется сразу."""
+        await self.storage.set_delivery(user_id, mode, self.next_at(user_id, mode))
+        if mode == "instant":
+            await self.flush_user(user_id, mode)
+
+    async def start(self):
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._loop(), name="digest")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                due = await self.storage.get_due_digest_users(time.time(), self.batch)
+                for user_id, mode in due:
+                    await self.flush_user(user_id, mode)
+                if len(due) == self.batch:
+                    # очередь не разобрана — следующий проход сразу
+                    continue
+            except Exception as e:
+                print(f"[DigestFlusher] tick failed: {e}")
+            await asyncio.sleep(self.tick)
+
+    async def flush_user(self, user_id: int, mode: str) -> int:
+        """Отправить накопленное одним сообщением; возвращает число постов в дайджесте."""
+        total, max_id, rows = await self.storage.get_digest_items(user_id, self.max_items)
+        next_at = self.next_at(user_id, mode)
+        if not total:
+            await self.storage.finish_digest(user_id, 0, next_at)
+            return 0
+        fm = self.fanout_metrics
+        text = self.render(mode, total, rows)
+        try:
+            await self._send(user_id, text)
+            fm.sent("digest")
+            self.digests_sent += 1
+            self.items_sent += total
+        except TelegramForbiddenError as e:
+            # бот заблокирован — копить дальше бессмысленно
+            self.failed += 1
+            fm.failed("digest", e)
+        except Exception as e:
+            # временная ошибка: очередь не трогаем, повтор через минуту
+            self.failed += 1
+            fm.failed("digest", e)
+            await self.storage.finish_digest(user_id, 0, time.time() + 60)
+            return 0
+        await self.storage.finish_digest(user_id, max_id, next_at)
+        await asyncio.sleep(self.send_delay)
+        return total
+
+    async def _send(self, user_id: int, text: str):
+        try:
+            await self.bot.send_message(user_id, text, disable_web_page_preview=True)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            await self.bot.send_message(user_id, text, disable_web_page_preview=True)
+
+    def render(self, mode: str, total: int, rows: List[NewsItem]) -> str:
+        header = f"📰 <b>{_TITLES.get(mode, 'Digest')}</b> — {total} new post{'s' if total != 1 else ''}"
+        lines = [header, ""]
+        size = len(header) + 2
+        shown = 0
+        # rows — самые свежие первыми; в сообщении — по порядку публикации
+        for news in reversed(rows):
+            url = news.url
+            name = html.escape(news.title or "(no title)")
+            item = f'• <a href="https://t.me/{news.source}">{html.escape(news.source_title or news.source or "")}</a>: '
+            item += f'<a href="{html.escape(url, quote=True)}">{name}</a>' if url else name
+            if size + len(item) + 64 > _MAX_MESSAGE:
+                break
+            lines.append(item)
+            size += len(item) + 1
+            shown += 1
+        if total > shown:
+            lines.append(f"\n…and {total - shown} more. /news")
+        return "\n".join(lines)
+
+    async def stats(self) -> Dict[str, int]:
+        queued, users = await self.storage.count_digest_queue()
+        return {
+            "queued": queued,
+            "users_waiting": users,
+            "digests_sent": self.digests_sent,
+            "items_sent": self.items_sent,
+            "failed": self.failed,
+        }
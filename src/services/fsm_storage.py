@@ -0,0 +1,195 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional, Set
+
+import aiosqlite
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+
+@dataclass
+class _Record:
+    state: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    touched_at: float = field(default_factory=time.time)
+
+
+class SQLiteFSMStorage(BaseStorage):
+    """
+    FSM storage over the bot's SQLite database.
+    Hot entries live in memory; changes are flushed in batched transactions every `flush_interval` seconds.
+    With flush_interval=0 every change is written through and reads go to the DB (safe for several processes).
+    Entries untouched for `ttl` seconds are dropped both from memory and from the table.
+    """
+    def __init__(
+        self,
+        db_path: str,
+        ttl: float = 24 * 3600,
+        flush_interval: float = 2.0,
+        key_builder: Optional[KeyBuilder] = None,
+    ):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+
+        self._records: Dict[str, _Record] = {}
+        self._dirty: Set[str] = set()
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def init(self):
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("PRAGMA journal_mode=WAL")
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS fsm_states (
+                    key TEXT PRIMARY KEY,
+                    state TEXT,
+                    data TEXT,
+                    updated_at REAL
+                )
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_fsm_states_updated ON fsm_states(updated_at)")
+            await db.commit()
+        if self.flush_interval > 0 and not self._task:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    @property
+    def write_behind(self) -> bool:
+        return self.flush_interval > 0
+
+    # ---------- BaseStorage ----------
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        rec = await self._load(key)
+        rec.state = state.state if isinstance(state, State) else state
+        await self._mark(key, rec)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        rec = await self._load(key)
+        return rec.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        rec = await self._load(key)
+        rec.data = data.copy()
+        await self._mark(key, rec)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        rec = await self._load(key)
+        return rec.data.copy()
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    # ---------- Internals ----------
+    def _is_expired(self, rec: _Record, now: float) -> bool:
+        return self.ttl > 0 and now - rec.touched_at > self.ttl
+
+    async def _load(self, key: StorageKey) -> _Record:
+        k = self.key_builder.build(key)
+        now = time.time()
+        rec = self._records.get(k) if self.write_behind else None
+        if rec is not None and not self._is_expired(rec, now):
+            return rec
+
+        rec = _Record(touched_at=now)
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute("SELECT state, data, updated_at FROM fsm_states WHERE key = ?", (k,)) as cur:
+                row = await cur.fetchone()
+        if row and not (self.ttl > 0 and now - (row[2] or 0) > self.ttl):
+            rec.state = row[0]
+            try:
+                rec.data = json.loads(row[1]) if row[1] else {}
+            except ValueError:
+                rec.data = {}
+        if self.write_behind:
+            self._records[k] = rec
+        return rec
+
+    async def _mark(self, key: StorageKey, rec: _Record):
+        k = self.key_builder.build(key)
+        rec.touched_at = time.time()
+        if self.write_behind:
+            self._records[k] = rec
+            self._dirty.add(k)
+        else:
+            await self._write({k: rec})
+
+    async def _write(self, records: Dict[str, _Record]):
+        upserts = []
+        deletes = []
+        for k, rec in records.items():
+            if rec.state is None and not rec.data:
+                deletes.append((k,))
+                continue
+            try:
+                data = json.dumps(rec.data, ensure_ascii=False)
+            except (TypeError, ValueError) as e:
+                # несериализуемое значение в data: ключ пропускается (в памяти остаётся), иначе
+                # откатывалась бы вся пачка и при write-behind не сохранялось бы больше ничьё состояние
+                print(f"[SQLiteFSMStorage] Skipping {k}: data is not JSON-serializable ({e})")
+                continue
+            upserts.append((k, rec.state, data, rec.touched_at))
+        if not upserts and not deletes:
+            return
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("BEGIN")
+            try:
+                if upserts:
+                    await db.executemany(
+                        "INSERT INTO fsm_states (key, state, data, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, "
+                        "updated_at = excluded.updated_at",
+                        upserts
+                    )
+                if deletes:
+                    await db.executemany("DELETE FROM fsm_states WHERE key = ?", deletes)
+                await db.commit()
+            except Exception:
+                await db.execute("ROLLBACK")
+                raise
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            keys, self._dirty = self._dirty, set()
+            batch = {k: self._records[k] for k in keys if k in self._records}
+            try:
+                await self._write(batch)
+            except Exception as e:
+                # вернём ключи, чтобы попробовать в следующий раз
+                self._dirty |= keys
+                print(f"[SQLiteFSMStorage] Flush failed: {e}")
+
+    async def expire(self):
+        now = time.time()
+        for k in [k for k, rec in self._records.items() if self._is_expired(rec, now) and k not in self._dirty]:
+            del self._records[k]
+        if self.ttl > 0:
+            async with aiosqlite.connect(self.db_path) as db:
+                await db.execute("DELETE FROM fsm_states WHERE updated_at < ?", (now - self.ttl,))
+                await db.commit()
+
+    async def _flush_loop(self):
+        last_expire = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - last_expire > 60:
+                last_expire = time.monotonic()
+                try:
+                    await self.expire()
+                except Exception as e:
+                    print(f"[SQLiteFSMStorage] Expire failed: {e}")
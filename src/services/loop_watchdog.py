@@ -0,0 +1,156 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.services.metrics import MetricsRegistry
+
+# кадры из этих каталогов считаются «нашим кодом» при поиске виновника
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _frame_label(fs: traceback.FrameSummary) -> str:
+    path = fs.filename
+    if path.startswith(_PROJECT_ROOT):
+        path = "src" + path[len(_PROJECT_ROOT):]
+    else:
+        path = os.path.basename(path)
+    return f"{path}:{fs.lineno} in {fs.name}"
+
+
+class LoopWatchdog:
+    """
+    Детектор блокировок event loop.
+    Heartbeat-задача каждые `interval` секунд отмечается и меряет собственное опоздание (loop lag).
+    Отдельный поток следит за отметкой: если loop молчит дольше `threshold`, он снимает стек
+    главного потока — это и есть синхронный код, который держит loop. Когда loop оживает,
+    блокировка записывается в агрегат по месту в нашем коде (handler / стадия fetcher).
+    """
+    def __init__(self, threshold: float = 0.25, interval: float = 0.05,
+                 metrics: Optional[MetricsRegistry] = None, max_sites: int = 200):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_sites = max_sites
+        self.stalls = 0
+        self.max_lag = 0.0
+        # site -> [count, total_s, max_s, blocker, task]
+        self._sites: Dict[str, List[Any]] = {}
+        self._beat = time.monotonic()
+        # (beat, site, blocker, task) — стек, снятый потоком для текущего интервала
+        self._captured: Optional[Tuple[float, str, str, str]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        metrics = metrics or MetricsRegistry(enabled=False)
+        self._lag_hist = metrics.histogram("event_loop_lag_seconds", "Heartbeat lateness",
+                                           buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+        self._stall_counter = metrics.counter("event_loop_stalls_total", "Loop stalls over threshold", ["site"])
+
+    async def start(self):
+        if self._task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop_watchdog")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            beat = self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - beat - self.interval)
+            self._lag_hist.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag >= self.threshold:
+                captured = self._captured
+                self._record(lag, captured[1:] if captured and captured[0] == beat else None)
+            self._captured = None
+
+    def _watch(self):
+        # поток: стек снимается один раз за блокировку, пока loop ещё стоит
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            captured = self._captured
+            if (captured is None or captured[0] != beat) and time.monotonic() - beat - self.interval >= self.threshold:
+                self._captured = (beat, *self._capture())
+
+    def _capture(self) -> Tuple[str, str, str]:
+        frame = sys._current_frames().get(self._loop_thread)
+        task_name = "-"
+        try:
+            task = asyncio.current_task(self._loop)
+            if task is not None:
+                task_name = task.get_name()
+        except RuntimeError:
+            pass
+        if frame is None:
+            return "unknown", "unknown", task_name
+        stack = traceback.extract_stack(frame)
+        blocker = _frame_label(stack[-1]) if stack else "unknown"
+        # ближайший к месту блокировки кадр из src/ (кроме самого watchdog)
+        site = "outside src/"
+        for fs in reversed(stack):
+            if fs.filename.startswith(_PROJECT_ROOT) and fs.filename != __file__:
+                site = _frame_label(fs)
+                break
+        return site, blocker, task_name
+
+    def _record(self, lag: float, captured: Optional[Tuple[str, str, str]]):
+        # короткая блокировка могла закончиться раньше, чем поток успел снять стек
+        site, blocker, task_name = captured or ("unknown", "unknown", "-")
+        self.stalls += 1
+        entry = self._sites.get(site)
+        if entry is None:
+            if len(self._sites) >= self.max_sites:
+                site = "other"
+                entry = self._sites.setdefault(site, [0, 0.0, 0.0, blocker, task_name])
+            else:
+                entry = self._sites[site] = [0, 0.0, 0.0, blocker, task_name]
+        entry[0] += 1
+        entry[1] += lag
+        if lag >= entry[2]:
+            entry[2], entry[3], entry[4] = lag, blocker, task_name
+        self._stall_counter.inc(site=site)
+        print(f"[watchdog] loop stalled {lag * 1000:.0f} ms at {site} (blocked in {blocker}, task {task_name})")
+
+    def report(self, top: int = 10) -> List[Dict[str, Any]]:
+        """Места блокировок, отсортированные по суммарному времени — что выносить в поток первым."""
+        rows = sorted(self._sites.items(), key=lambda kv: kv[1][1], reverse=True)[:top]
+        return [
+            {
+                "site": site,
+                "count": count,
+                "total_ms": round(total * 1000, 1),
+                "max_ms": round(max_s * 1000, 1),
+                "blocker": blocker,
+                "task": task_name,
+            }
+            for site, (count, total, max_s, blocker, task_name) in rows
+        ]
+
+    def reset(self):
+        self._sites.clear()
+        self.stalls = 0
+        self.max_lag = 0.0
@@ -0,0 +1,243 @@
+import bisect
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _fmt_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        for key, v in self._values.items():
+            yield f"{self.name}{_fmt_labels(self.label_names, key)} {v}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), fn: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._fn = fn
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str):
+        self.inc(-amount, **labels)
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        if self._fn is not None:
+            try:
+                yield f"{self.name} {float(self._fn())}"
+            except Exception:
+                pass
+        for key, v in self._values.items():
+            yield f"{self.name}{_fmt_labels(self.label_names, key)} {v}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        row = self._values.get(key)
+        if row is None:
+            row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def render(self) -> Iterable[str]:
+        yield from super().render()
+        for key, row in self._values.items():
+            acc = 0.0
+            for le, n in zip(self.buckets, row):
+                acc += n
+                le_label = f'le="{le}"'
+                yield f"{self.name}_bucket{_fmt_labels(self.label_names, key, le_label)} {acc}"
+            acc += row[len(self.buckets)]
+            inf_label = 'le="+Inf"'
+            yield f"{self.name}_bucket{_fmt_labels(self.label_names, key, inf_label)} {acc}"
+            yield f"{self.name}_count{_fmt_labels(self.label_names, key)} {acc}"
+            yield f"{self.name}_sum{_fmt_labels(self.label_names, key)} {row[-1]}"
+
+
+class _Timer:
+    __slots__ = ("hist", "labels", "started")
+
+    def __init__(self, hist: Histogram, labels: Dict[str, str]):
+        self.hist = hist
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class _Noop:
+    """Заглушка для выключенных метрик: все вызовы ничего не делают."""
+    def inc(self, *a, **kw):
+        pass
+
+    dec = set = observe = inc
+
+    def time(self, **labels: str) -> "_Noop":
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP = _Noop()
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms rendered in Prometheus text format.
+    With enabled=False every factory returns NOOP, so instrumented paths cost one no-op call.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get(self, cls, name: str, *args, **kwargs):
+        if not self.enabled:
+            return NOOP
+        m = self._metrics.get(name)
+        if m is None:
+            m = self._metrics[name] = cls(name, *args, **kwargs)
+        return m
+
+    def counter(self, name: str, help_text: str = "", labels: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str = "", labels: Sequence[str] = (),
+              fn: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._get(Gauge, name, help_text, labels, fn=fn)
+
+    def histogram(self, name: str, help_text: str = "", labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, labels, buckets=buckets)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics.values():
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+async def start_metrics_server(registry: MetricsRegistry, host: str, port: int) -> "web.AppRunner":
+    """Отдельный маленький HTTP-сервер: GET /metrics в формате Prometheus."""
+    from aiohttp import web
+
+    async def handle(_request: "web.Request") -> "web.Response":
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    print(f"Metrics: http://{host}:{port}/metrics")
+    return runner
+
+
+def instrument_storage(storage, registry: MetricsRegistry):
+    """Per-method latency/errors for Storage (обёртка на экземпляре)."""
+    from src.utils.instrument import wrap_async_methods
+
+    latency = registry.histogram("storage_query_seconds", "Storage method latency", ["method"])
+    errors = registry.counter("storage_query_errors_total", "Storage method errors", ["method"])
+
+    def wrap(name, fn):
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                errors.inc(method=name)
+                raise
+            finally:
+                latency.observe(time.perf_counter() - started, method=name)
+        return timed
+
+    return wrap_async_methods(storage, wrap)
+
+
+class FanoutMetrics:
+    """Счётчики рассылок: notify (новые посты) и broadcast (админ)."""
+    def __init__(self, registry: MetricsRegistry):
+        self.sends = registry.counter("fanout_sends_total", "Fanout send attempts by result", ["path", "result"])
+        self.pending = registry.gauge("fanout_pending", "Recipients not yet processed", ["path"])
+        self.duration = registry.histogram("fanout_duration_seconds", "Whole fanout duration", ["path"],
+                                           buckets=(1, 5, 15, 60, 300, 900, 3600))
+
+    def sent(self, path: str):
+        self.sends.inc(path=path, result="ok")
+
+    def failed(self, path: str, exc: BaseException):
+        self.sends.inc(path=path, result=type(exc).__name__)
@@ -0,0 +1,173 @@
+import datetime
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from src.storage import Storage
+from src.utils.simhash import bands, features, from_sqlite, hamming, simhash, to_sqlite, tokens
+
+
+class _Entry:
+    __slots__ = ("news_id", "fp", "source", "at", "keys")
+
+    def __init__(self, fp: int, source: str, at: float, keys: List[int], news_id: Optional[int] = None):
+        self.news_id = news_id
+        self.fp = fp
+        self.source = source
+        self.at = at
+        self.keys = keys
+
+
+class NearDuplicateDetector:
+    """
+    Поиск почти-дубликатов среди недавних постов (репосты одной новости разными каналами).
+    Отпечаток — 64-битный SimHash по словам и биграммам. Индекс — banded LSH: отпечаток режется на `bands`
+    полос, кандидаты — посты, у которых совпала хотя бы одна полоса, затем проверка расстояния Хэмминга
+    ≤ `max_distance`. При bands > max_distance совпадение полосы гарантировано (принцип Дирихле),
+    меньше полос — уже корзины и быстрее, но часть пар с большим расстоянием теряется.
+    Окно скользящее: `window` секунд и не больше `max_entries` постов.
+    """
+    def __init__(self, max_distance: int = 7, bands: int = 8, window: float = 48 * 3600,
+                 max_entries: int = 20_000, min_tokens: int = 8):
+        self.max_distance = max_distance
+        self.bands = bands
+        self.window = window
+        self.max_entries = max_entries
+        self.min_tokens = min_tokens
+        self._entries: Deque[_Entry] = deque()
+        self._index: Dict[int, List[_Entry]] = {}
+        self.checked = 0
+        self.matches = 0
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=20)
+
+    def fingerprint(self, text: str) -> Optional[int]:
+        words = tokens(text)
+        if len(words) < self.min_tokens:
+            # короткие посты («Расписание на завтра») слишком похожи друг на друга
+            return None
+        return simhash(features(words))
+
+    def check(self, text: str, source: str, now: Optional[float] = None) -> Tuple[Optional[int], Optional[_Entry], Optional[_Entry]]:
+        """
+        (fingerprint, pending, original). Если найден оригинал — pending = None, пост не индексируется.
+        Иначе пост сразу попадает в индекс как pending (параллельный репост уже его увидит);
+        после вставки в БД нужно вызвать commit(pending, news_id). Совпадение в статистику не пишется:
+        уже сохранённый пост (повтор при backfill) совпадает сам с собой — его отсеивает точный дедуп
+        в БД, поэтому record_match вызывается только после успешной вставки.
+        """
+        now = time.time() if now is None else now
+        self._expire(now)
+        fp = self.fingerprint(text)
+        if fp is None:
+            return None, None, None
+        self.checked += 1
+        original = self.match(fp, source)
+        if original:
+            return fp, None, original
+        return fp, self._add(fp, source, now), None
+
+    def record_match(self, fp: int, source: str, original: _Entry, now: Optional[float] = None):
+        """Учесть почти-дубликат, который действительно сохранён как новый пост (для /dups)."""
+        self.matches += 1
+        self.recent.append({
+            "at": time.time() if now is None else now, "source": source, "original_source": original.source,
+            "original_id": original.news_id, "distance": hamming(fp, original.fp),
+        })
+
+    def commit(self, pending: Optional[_Entry], news_id: Optional[int]):
+        if pending is None:
+            return
+        if news_id:
+            pending.news_id = news_id
+        else:
+            # точный дубль (source, external_id) — в индексе не нужен
+            self._remove(pending)
+
+    def match(self, fp: int, source: Optional[str] = None) -> Optional[_Entry]:
+        """Ближайший пост в пределах max_distance; посты того же `source` не считаются оригиналом."""
+        best: Optional[_Entry] = None
+        best_d = self.max_distance + 1
+        for key in bands(fp, self.bands):
+            for entry in self._index.get(key, ()):
+                if source is not None and entry.source == source:
+                    # шаблонные анонсы, исправленные перевыкладки, меню на день — отдельные посты канала
+                    continue
+                d = hamming(fp, entry.fp)
+                if d < best_d:
+                    best, best_d = entry, d
+        return best
+
+    def _add(self, fp: int, source: str, at: float, news_id: Optional[int] = None) -> _Entry:
+        entry = _Entry(fp, source, at, bands(fp, self.bands), news_id)
+        self._entries.append(entry)
+        for key in entry.keys:
+            self._index.setdefault(key, []).append(entry)
+        while len(self._entries) > self.max_entries:
+            self._remove(self._entries[0])
+        return entry
+
+    def _remove(self, entry: _Entry):
+        for key in entry.keys:
+            bucket = self._index.get(key)
+            if bucket and entry in bucket:
+                bucket.remove(entry)
+                if not bucket:
+                    del self._index[key]
+        if self._entries and self._entries[0] is entry:
+            self._entries.popleft()
+        else:
+            try:
+                self._entries.remove(entry)
+            except ValueError:
+                pass
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        while self._entries and self._entries[0].at < cutoff:
+            self._remove(self._entries[0])
+
+    async def load(self, storage: Storage):
+        """Прогреть окно отпечатками из БД, чтобы репост после рестарта тоже распознавался."""
+        since = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.window)
+        rows = await storage.get_recent_fingerprints(since.isoformat(), self.max_entries)
+        for news_id, fp, source, created_at in reversed(rows):
+            try:
+                at = datetime.datetime.fromisoformat(created_at).replace(tzinfo=datetime.timezone.utc).timestamp()
+            except (TypeError, ValueError):
+                at = time.time()
+            self._add(from_sqlite(fp), source, at, news_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window": len(self._entries),
+            "buckets": len(self._index),
+            "checked": self.checked,
+            "matches": self.matches,
+            "max_distance": self.max_distance,
+            "bands": self.bands,
+        }
+
+    @staticmethod
+    def to_db(fp: Optional[int]) -> Optional[int]:
+        return to_sqlite(fp) if fp is not None else None
+
+
+async def store_news(storage: Storage, near_dup: Optional[NearDuplicateDetector], title: str, text: str,
+                     source: str, external_id: Optional[str], **fields: Any) -> Tuple[Optional[int], Optional[_Entry]]:
+    """
+    Общий для фетчеров путь сохранения поста: check → add_news_if_new(simhash, duplicate_of) → commit →
+    record_match. (news_id, original): news_id = None — точный дубль (source, external_id),
+    original — пост другого канала, дубликатом которого сохранён этот.
+    """
+    fp = pending = original = None
+    if near_dup:
+        fp, pending, original = near_dup.check(text, source)
+    news_id = await storage.add_news_if_new(
+        title, text, source, external_id,
+        simhash=NearDuplicateDetector.to_db(fp), duplicate_of=original.news_id if original else None, **fields
+    )
+    if near_dup:
+        near_dup.commit(pending, news_id)
+        if news_id and original:
+            near_dup.record_match(fp, source, original)
+    return news_id, original if news_id else None
@@ -1,25 +1,157 @@
 import asyncio
 import itertools
-from typing import Awaitable, Callable
+import json
+import os
+import random
+import struct
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence
 
+from src.services.near_dup import NearDuplicateDetector, store_news
 from src.storage import Storage
+from src.utils.stats import summarize
+from src.utils.text import make_title_and_text
+
+# словарь синтетического корпуса — общий для DemoNewsFetcher и src/tools/bench.py
+SYNTH_WORDS = ("университет", "лекция", "экзамен", "студенты", "расписание", "стипендия", "конференция", "деканат",
+               "олимпиада", "грант", "лаборатория", "семинар", "дедлайн", "хакатон", "библиотека", "кампус")
+
+
+@dataclass
+class DemoPost:
+    text: str
+    source: str = "demo"
+    external_url: Optional[str] = None
+    media: bool = False
+    # >1 — альбом: как в Telegram, подпись только у первого сообщения, остальные — media-only
+    album: int = 1
+
+
+@dataclass
+class DemoStats:
+    produced: int = 0
+    stored: int = 0
+    duplicates: int = 0
+    near_duplicates: int = 0
+    skipped: int = 0
+    ingest_errors: int = 0
+    notify_errors: int = 0
+    # окна последних значений — soak-тест может идти часами
+    lag: Deque[float] = field(default_factory=lambda: deque(maxlen=10_000))
+    notify: Deque[float] = field(default_factory=lambda: deque(maxlen=10_000))
+
+
+def synth_corpus(n: int, sources: Sequence[str], seed: int = 42) -> List[DemoPost]:
+    """Посты, похожие на настоящие: markdown, ссылки, цитаты, фото и альбомы, разная длина."""
+    rnd = random.Random(seed)
+    posts = []
+    for i in range(n):
+        paragraphs = []
+        for _ in range(rnd.choice((1, 1, 2, 3, 5, 8))):
+            words = [rnd.choice(SYNTH_WORDS) for _ in range(rnd.randint(6, 60))]
+            if rnd.random() < 0.4:
+                j = rnd.randrange(len(words))
+                words[j] = f"**{words[j]}**"
+            if rnd.random() < 0.25:
+                j = rnd.randrange(len(words))
+                words[j] = f"[{words[j]}](https://example.edu/news/{i}/{j})"
+            line = " ".join(words)
+            paragraphs.append("> " + line if rnd.random() < 0.1 else line)
+        roll = rnd.random()
+        posts.append(DemoPost(
+            text="\n\n".join(paragraphs),
+            source=rnd.choice(sources),
+            external_url=f"https://example.edu/news/{i}" if rnd.random() < 0.3 else None,
+            media=roll < 0.35,
+            album=rnd.randint(2, 6) if roll < 0.08 else 1,
+        ))
+    return posts
+
+
+def load_corpus(path: str, default_source: str = "demo") -> List[DemoPost]:
+    """JSONL: {"text", "source"?, "external_url"?, "media"?, "album"?} на строку."""
+    posts = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            posts.append(DemoPost(
+                text=row.get("text", ""),
+                source=(row.get("source") or default_source).lstrip("@").lower(),
+                external_url=row.get("external_url"),
+                media=bool(row.get("media")),
+                album=int(row.get("album") or 1),
+            ))
+    return posts
+
+
+def _solid_png(width: int, height: int, rgb: tuple[int, int, int]) -> bytes:
+    """Однотонная PNG-картинка для демо-постов с фото (без Pillow)."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = b"\x00" + bytes(rgb) * width
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(row * height))
+            + chunk(b"IEND", b""))
 
 
 class DemoNewsFetcher:
     """
-    Демо-генератор новостей.
+    Генератор синтетического трафика каналов для soak-тестов без Telegram.
+    Прокручивает корпус постов с целевой частотой `rate` (постов/с, пуассоновский поток) и всплесками
+    (`burst_prob` — вероятность, что пост открывает серию из `burst_size` постов подряд с паузой `burst_gap`).
+    Каждый пост идёт тем же путём, что у TelegramFetcher: add_news_if_new → on_new_item(…, news_id=…).
+    `concurrency` — сколько постов обрабатывается одновременно (1 = строго по очереди, как у Telethon-хендлера).
     """
-    def __init__(self, storage: Storage):
+    def __init__(
+        self,
+        storage: Storage,
+        rate: float = 1 / 30,
+        corpus: Optional[List[DemoPost]] = None,
+        sources: Sequence[str] = ("demo",),
+        burst_prob: float = 0.0,
+        burst_size: tuple[int, int] = (3, 8),
+        burst_gap: float = 2.0,
+        concurrency: int = 1,
+        max_posts: Optional[int] = None,
+        media_dir: str = os.path.join("data", "media"),
+        seed: Optional[int] = None,
+        near_dup: Optional[NearDuplicateDetector] = None,
+    ):
         self.storage = storage
+        self.rate = rate
+        self.sources = [s.lstrip("@").lower() for s in sources] or ["demo"]
+        self.corpus = corpus or synth_corpus(200, self.sources, seed=seed if seed is not None else 42)
+        self.burst_prob = burst_prob
+        self.burst_size = burst_size
+        self.burst_gap = burst_gap
+        self.max_posts = max_posts
+        self.media_dir = media_dir
+        self.rnd = random.Random(seed)
+        self.near_dup = near_dup
+        self.stats = DemoStats()
+        # уникальный префикс запуска: повторный прогон корпуса не упирается в дедупликацию
+        self._run = f"{int(time.time())}"
         self._counter = itertools.count(1)
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+        self._pending: set[asyncio.Task] = set()
         self._running = False
         self._task: asyncio.Task | None = None
+        self._on_new_item: Optional[Callable[..., Awaitable[None]]] = None
+        self._media_path: Optional[str] = None
 
-    async def start(self, on_new_item: Callable[[str, str, str], 'Awaitable[None]'] | None = None, interval_sec: int = 30):
+    async def start(self, on_new_item: Optional[Callable[..., Awaitable[None]]] = None):
         if self._running:
             return
         self._running = True
-        self._task = asyncio.create_task(self._loop(on_new_item, interval_sec))
+        self._on_new_item = on_new_item
+        self._task = asyncio.create_task(self._loop(), name="demo_news_fetcher")
 
     async def stop(self):
         self._running = False
@@ -30,20 +162,115 @@ class DemoNewsFetcher:
             except asyncio.CancelledError:
                 pass
             self._task = None
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    async def wait(self):
+        """Дождаться окончания прогона (имеет смысл с max_posts)."""
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
 
-    async def _loop(self, on_new_item, interval_sec: int):
-        for _ in range(3):
-            await self._produce_news(on_new_item)
+    # ---------- генерация ----------
+    async def _loop(self):
+        posts = itertools.cycle(self.corpus)
+        next_at = time.monotonic()
+        burst_left = 0
+        emitted = 0
         while self._running:
-            await asyncio.sleep(interval_sec)
-            await self._produce_news(on_new_item)
+            if self.max_posts is not None and emitted >= self.max_posts:
+                break
+            emitted += 1
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scheduled = next_at
+            post = next(posts)
+            await self._sem.acquire()
+            task = asyncio.create_task(self._emit(post, scheduled))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
 
-    async def _produce_news(self, on_new_item):
+            if burst_left > 0:
+                burst_left -= 1
+            elif self.burst_prob and self.rnd.random() < self.burst_prob:
+                burst_left = self.rnd.randint(*self.burst_size) - 1
+            if burst_left > 0:
+                next_at += self.rnd.uniform(0, self.burst_gap)
+            else:
+                next_at += self.rnd.expovariate(self.rate) if self.rate > 0 else 1.0
+
+    async def _emit(self, post: DemoPost, scheduled: float):
+        try:
+            # альбом = несколько сообщений; подпись только у первого
+            for part in range(post.album):
+                await self._ingest(post, scheduled, first=part == 0)
+        except Exception as e:
+            self.stats.ingest_errors += 1
+            print(f"[DemoNewsFetcher] ingest failed: {e}")
+        finally:
+            self._sem.release()
+
+    async def _ingest(self, post: DemoPost, scheduled: float, first: bool):
+        self.stats.produced += 1
         n = next(self._counter)
-        title = f"Демо-новость #{n}"
-        text = f"Это демонстрационная новость #{n}. В проде здесь будет контент из Telegram/сайта университета."
-        source = "demo"
-        await self.storage.add_news(title, text, source)
-        if on_new_item:
-            # демо-новости без ссылок
-            await on_new_item(title, text, source)
\ No newline at end of file
+        ingested_at = time.time()
+        text = post.text if first else ""
+        if not text:
+            # как TelegramFetcher: media-only сообщения без подписи не сохраняются
+            self.stats.skipped += 1
+            return
+        self.stats.lag.append(time.monotonic() - scheduled)
+        title, full_text = make_title_and_text(text)
+        source = post.source
+        media_path = self._demo_media() if post.media else None
+        news_id, original = await store_news(
+            self.storage, self.near_dup, title, full_text, source, f"demo:{self._run}:{n}",
+            post_url=f"https://t.me/{source}/{n}", external_url=post.external_url,
+            media_path=media_path, source_title=source,
+            posted_at=ingested_at, ingested_at=ingested_at,
+        )
+        if not news_id:
+            self.stats.duplicates += 1
+            return
+        self.stats.stored += 1
+        if original:
+            self.stats.near_duplicates += 1
+            return
+        if self._on_new_item:
+            started = time.perf_counter()
+            try:
+                await self._on_new_item(title, full_text, source, f"https://t.me/{source}/{n}",
+                                        post.external_url, media_path, news_id=news_id)
+            except Exception as e:
+                self.stats.notify_errors += 1
+                print(f"[DemoNewsFetcher] notify failed: {e}")
+            self.stats.notify.append(time.perf_counter() - started)
+
+    def _demo_media(self) -> str:
+        if self._media_path is None:
+            path = os.path.join(self.media_dir, "demo_photo.png")
+            if not os.path.exists(path):
+                os.makedirs(self.media_dir, exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(_solid_png(640, 360, (40, 90, 160)))
+            self._media_path = path
+        return self._media_path
+
+    def report(self) -> Dict[str, Any]:
+        st = self.stats
+        lag = summarize(st.lag)
+        notify = summarize(st.notify)
+        return {
+            "produced": st.produced,
+            "stored": st.stored,
+            "duplicates": st.duplicates,
+            "near_duplicates": st.near_duplicates,
+            "skipped_media_only": st.skipped,
+            "ingest_errors": st.ingest_errors,
+            "notify_errors": st.notify_errors,
+            "in_flight": len(self._pending),
+            "lag_ms": {k: round(v * 1000, 1) for k, v in lag.items() if k != "n" and v is not None},
+            "notify_ms": {k: round(v * 1000, 1) for k, v in notify.items() if k != "n" and v is not None},
+        }
@@ -0,0 +1,185 @@
+import asyncio
+import datetime
+import html
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
+
+from src.storage import Storage
+from src.services.metrics import FanoutMetrics, MetricsRegistry
+from src.utils.text import md_to_html, clip_for_caption
+
+_MAX_MESSAGE = 4096
+
+
+class Notifier:
+    """
+    Рассылка новых постов подписчикам с учётом фильтров (muted sources, ключевые слова).
+    notify_new_item — колбэк on_new_item для TelegramFetcher.
+    Пользователи в режиме дайджеста получают пост позже, через DigestFlusher.
+    notify_burst — серия постов одного канала одним сообщением (см. BurstCoalescer).
+    Получатели читаются из БД порциями по `chunk` (Storage.iter_user_ids), после каждой порции прогресс
+    сохраняется в fanout_jobs; resume() после рестарта продолжает с последней порции.
+    """
+    def __init__(self, bot: Bot, storage: Storage, admin_ids: set[int],
+                 fanout_metrics: Optional[FanoutMetrics] = None, send_delay: float = 0.03, chunk: int = 200):
+        self.bot = bot
+        self.storage = storage
+        self.admin_ids = admin_ids
+        self.fanout_metrics = fanout_metrics or FanoutMetrics(MetricsRegistry(enabled=False))
+        self.send_delay = send_delay
+        self.chunk = chunk
+
+    async def user_allows(self, user_id: int, source: str, title: str, text: str) -> bool:
+        if user_id in self.admin_ids:
+            return True
+        muted = set(await self.storage.list_muted_sources(user_id))
+        if source.lower() in muted:
+            return False
+        kws = await self.storage.list_keywords(user_id)
+        if not kws:
+            return True
+        lc = f"{title}\n{text}".lower()
+        return any(kw in lc for kw in kws)
+
+    async def _enqueue_digests(self, items: Sequence[Tuple], source: str) -> bool:
+        """Подходящие посты пользователей hourly/daily — в очередь дайджеста; True — мгновенно шлём только instant."""
+        if not all(it[-1] for it in items):
+            # без id поста в очередь класть нечего — все получают сразу
+            return False
+        texts = [f"{title}\n{text}".lower() for title, text, *_rest in items]
+        # порции получателей с muted/keywords одним запросом — те же правила, что в user_allows, без запросов на пользователя
+        async for chunk in self.storage.iter_digest_recipients(source, chunk=self.chunk):
+            for lc, (*_rest, news_id) in zip(texts, items):
+                user_ids = [uid for uid, muted, kws in chunk
+                            if uid in self.admin_ids or (not muted and (not kws or any(kw in lc for kw in kws)))]
+                await self.storage.enqueue_digest(news_id, user_ids)
+        return True
+
+    @staticmethod
+    def _render(source: str, text: str, post_url: Optional[str], external_url: Optional[str],
+                media_path: Optional[str]) -> Tuple[str, Optional[InlineKeyboardMarkup], bool]:
+        url = post_url or external_url
+        has_media = bool(media_path and os.path.exists(media_path))
+        kb = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="🔗 Read more", url=url)]]) if url else None
+        preview_tail = f"\n\n{url}" if (url and not has_media) else ""
+        body = f'🆕 <a href="https://t.me/{source}">{source}</a>\n\n{md_to_html(text or "")}{preview_tail}'
+        return body, kb, has_media
+
+    @staticmethod
+    def _render_burst(source: str, items: Sequence[Tuple]) -> str:
+        header = f'🆕 <a href="https://t.me/{source}">{source}</a> · {len(items)} posts'
+        full = []
+        for title, text, _src, post_url, external_url, media_path, _id in items:
+            url = post_url or external_url
+            mark = "🖼 " if media_path else ""
+            link = f'\n<a href="{html.escape(url, quote=True)}">🔗 Read more</a>' if url else ""
+            full.append(f"{mark}{md_to_html(text or '')}{link}")
+        body = header + "\n\n" + "\n\n— — —\n\n".join(full)
+        if len(body) <= _MAX_MESSAGE:
+            return body
+        # целиком не влезает — списком заголовков со ссылками
+        lines = [header, ""]
+        size = len(header) + 2
+        for title, _text, _src, post_url, external_url, _media, _id in items:
+            url = post_url or external_url
+            name = html.escape(title or "(no title)")
+            item = f'• <a href="{html.escape(url, quote=True)}">{name}</a>' if url else f"• {name}"
+            if size + len(item) + 1 > _MAX_MESSAGE:
+                break
+            lines.append(item)
+            size += len(item) + 1
+        return "\n".join(lines)
+
+    async def notify_new_item(self, title: str, text: str, source: str, post_url: Optional[str],
+                              external_url: Optional[str], media_path: Optional[str], news_id: Optional[int] = None):
+        await self._fanout(source, [(title, text, source, post_url, external_url, media_path, news_id)])
+
+    async def notify_burst(self, source: str, items: List[Tuple]):
+        """
+        Серия постов канала одним сообщением. items — кортежи аргументов notify_new_item
+        (title, text, source, post_url, external_url, media_path, news_id). Каждый пользователь получает
+        только прошедшие его фильтры; если такой пост один — обычное уведомление о нём.
+        """
+        await self._fanout(source, items)
+
+    async def _fanout(self, source: str, items: List[Tuple]):
+        # hourly/daily: пост — в очередь дайджеста (после фильтров), мгновенная рассылка — только instant
+        instant_only = await self._enqueue_digests(items, source)
+        job_id = None
+        if all(it[-1] for it in items):
+            job_id = "notify:" + ",".join(str(it[-1]) for it in items)
+            payload = {"source": source, "items": items, "instant_only": instant_only}
+            await self.storage.start_fanout(job_id, "notify", json.dumps(payload, ensure_ascii=False))
+        await self._deliver(source, items, instant_only, job_id)
+
+    async def _deliver(self, source: str, items: Sequence[Tuple], instant_only: bool, job_id: Optional[str] = None,
+                       after: Optional[int] = None, sent: int = 0, failed: int = 0):
+        fm = self.fanout_metrics
+        # у большинства пользователей одинаковый набор прошедших фильтры постов — текст рендерится один раз на набор
+        rendered: Dict[Tuple[int, ...], Tuple[str, Optional[InlineKeyboardMarkup], bool, Optional[str]]] = {}
+
+        started = time.perf_counter()
+        first_send_at: Optional[float] = None
+        last_send_at: Optional[float] = None
+        async for chunk in self.storage.iter_user_ids(only_subscribed=True, instant_only=instant_only,
+                                                      after=after, chunk=self.chunk):
+            fm.pending.inc(len(chunk), path="notify")
+            for uid in chunk:
+                try:
+                    picked = tuple([i for i, (title, text, *_rest) in enumerate(items)
+                                    if await self.user_allows(uid, source, title, text)])
+                    if not picked:
+                        continue
+                    if picked not in rendered:
+                        if len(picked) == 1:
+                            _title, text, _src, post_url, external_url, media_path, _id = items[picked[0]]
+                            rendered[picked] = (*self._render(source, text, post_url, external_url, media_path), media_path)
+                        else:
+                            rendered[picked] = (self._render_burst(source, [items[i] for i in picked]), None, False, None)
+                    body, kb, has_media, media_path = rendered[picked]
+                    if has_media:
+                        await self.bot.send_photo(uid, FSInputFile(media_path), caption=clip_for_caption(body), reply_markup=kb)
+                    else:
+                        await self.bot.send_message(uid, body, reply_markup=kb, disable_web_page_preview=len(picked) > 1)
+                    fm.sent("notify")
+                    last_send_at = time.time()
+                    first_send_at = first_send_at or last_send_at
+                    sent += 1
+                    await asyncio.sleep(self.send_delay)
+                except Exception as e:
+                    failed += 1
+                    fm.failed("notify", e)
+                finally:
+                    fm.pending.dec(path="notify")
+            if job_id:
+                # чекпойнт: после рестарта порция до chunk[-1] повторно не отправляется
+                await self.storage.advance_fanout(job_id, chunk[-1], sent, failed)
+        fm.duration.observe(time.perf_counter() - started, path="notify")
+        if job_id:
+            await self.storage.finish_fanout(job_id)
+        for *_rest, news_id in items:
+            if news_id:
+                await self.storage.record_delivery(news_id, first_send_at, last_send_at, sent)
+
+    async def resume(self, max_age: float = 6 * 3600):
+        """Продолжить рассылки, прерванные рестартом, с последней сохранённой порции; старые новости — не досылать."""
+        await self.storage.prune_fanouts()
+        now = datetime.datetime.utcnow()
+        for job_id, _kind, payload, cursor, sent, failed, created_at in await self.storage.get_unfinished_fanouts(("notify",)):
+            try:
+                age = (now - datetime.datetime.fromisoformat(created_at)).total_seconds()
+                if age > max_age:
+                    print(f"[Notifier] dropping stale fanout {job_id} ({age / 3600:.1f}h old, {sent} sent)")
+                    await self.storage.finish_fanout(job_id)
+                    continue
+                data = json.loads(payload)
+                print(f"[Notifier] resuming fanout {job_id} after user {cursor} ({sent} already sent)")
+                await self._deliver(data["source"], [tuple(it) for it in data["items"]], data["instant_only"],
+                                    job_id, after=cursor, sent=sent, failed=failed)
+            except Exception as e:
+                print(f"[Notifier] resume of {job_id} failed: {e}")
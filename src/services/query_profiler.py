@@ -0,0 +1,238 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from src.utils.stats import summarize
+
+_WS = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+def normalize_sql(sql: str) -> str:
+    # IN (?, ?, ?) разной длины — один и тот же запрос
+    return _IN_LIST.sub("(?…)", _WS.sub(" ", sql).strip())
+
+
+def has_table_scan(plan: List[str]) -> bool:
+    # "SCAN news" — полный проход; "SCAN t USING INDEX …" / "SEARCH …" — по индексу
+    return any(line.startswith("SCAN ") and " USING " not in line for line in plan)
+
+
+class _Stat:
+    __slots__ = ("count", "total", "fetch", "errors", "samples")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.fetch = 0.0
+        self.errors = 0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, dt: float):
+        self.count += 1
+        self.total += dt
+        self.samples.append(dt)
+
+    def row(self, key: str) -> Dict[str, Any]:
+        pct = summarize(self.samples)
+        return {
+            "key": key,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 1),
+            "fetch_ms": round(self.fetch * 1000, 1),
+            "errors": self.errors,
+            **{k: round(v * 1000, 2) for k, v in pct.items() if k != "n" and v is not None},
+        }
+
+
+class QueryProfiler:
+    """
+    Opt-in профилировщик Storage.
+    Методы Storage оборачиваются на экземпляре (счётчики, суммарное время, перцентили по окну).
+    SQL-выражения меряются прямо в потоке aiosqlite через sqlite3-фабрику соединения/курсора,
+    так что время — это работа SQLite, без ожидания очереди. Выражения дольше `slow_ms`
+    попадают в slow-log вместе с EXPLAIN QUERY PLAN (план считается один раз на выражение).
+    """
+    def __init__(self, slow_ms: float = 50.0, window: int = 512, slow_log_size: int = 50):
+        self.slow_s = slow_ms / 1000
+        self.window = window
+        self.started_at = time.time()
+        self.methods: Dict[str, _Stat] = {}
+        self.statements: Dict[str, _Stat] = {}
+        self.plans: Dict[str, List[str]] = {}
+        self.slow_log: Deque[Dict[str, Any]] = deque(maxlen=slow_log_size)
+        # запись идёт из рабочих потоков aiosqlite
+        self._lock = threading.Lock()
+        self.factory = self._make_factory()
+
+    # ---------- Storage methods ----------
+    def instrument(self, storage) -> List[str]:
+        from src.utils.instrument import wrap_async_methods
+
+        def wrap(name, fn):
+            async def profiled(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception:
+                    self._stat(self.methods, name).errors += 1
+                    raise
+                finally:
+                    self._stat(self.methods, name).add(time.perf_counter() - started)
+            return profiled
+
+        return wrap_async_methods(storage, wrap, skip={"init", "db"})
+
+    def _stat(self, table: Dict[str, _Stat], key: str) -> _Stat:
+        st = table.get(key)
+        if st is None:
+            st = table[key] = _Stat(self.window)
+        return st
+
+    # ---------- SQL statements (рабочий поток aiosqlite) ----------
+    def _record(self, sql: str, dt: float, failed: bool = False):
+        with self._lock:
+            st = self._stat(self.statements, normalize_sql(sql))
+            st.add(dt)
+            if failed:
+                st.errors += 1
+
+    def _record_fetch(self, sql: str, dt: float):
+        with self._lock:
+            self._stat(self.statements, normalize_sql(sql)).fetch += dt
+
+    def _slow(self, conn: sqlite3.Connection, sql: str, params: Any, elapsed: float):
+        key = normalize_sql(sql)
+        plan = self._explain(conn, key, sql, params)
+        entry = {
+            "at": time.time(),
+            "ms": round(elapsed * 1000, 1),
+            "sql": key,
+            "plan": plan,
+            "table_scan": has_table_scan(plan),
+        }
+        with self._lock:
+            self.slow_log.append(entry)
+        scan = " TABLE SCAN" if entry["table_scan"] else ""
+        print(f"[QueryProfiler] slow query {entry['ms']} ms{scan}: {key[:200]}"
+              + "".join(f"\n    {line}" for line in plan))
+
+    def _explain(self, conn: sqlite3.Connection, key: str, sql: str, params: Any) -> List[str]:
+        cached = self.plans.get(key)
+        if cached is not None:
+            return cached
+        plan: List[str] = []
+        if sql.lstrip().upper().startswith(_EXPLAINABLE) and params is not None:
+            try:
+                # базовый курсор, чтобы не профилировать сам EXPLAIN; row_factory соединения
+                # (UserProfile/NewsItem.from_row) рассчитан на строки запроса, а не плана
+                cur = sqlite3.Cursor(conn)
+                cur.row_factory = None
+                rows = cur.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+                plan = [str(r[-1]) for r in rows]
+            except sqlite3.Error as e:
+                plan = [f"(explain failed: {e})"]
+        with self._lock:
+            self.plans[key] = plan
+        return plan
+
+    def _make_factory(self):
+        profiler = self
+
+        class ProfiledCursor(sqlite3.Cursor):
+            # текущее выражение курсора: execute + все fetch* до следующего execute
+            _sql: Optional[str] = None
+            _params: Any = None
+            _elapsed = 0.0
+            _logged = False
+
+            def _track(self, dt: float):
+                self._elapsed += dt
+                if not self._logged and self._elapsed >= profiler.slow_s:
+                    self._logged = True
+                    profiler._slow(self.connection, self._sql, self._params, self._elapsed)
+
+            def execute(self, sql, parameters=()):
+                self._sql, self._params, self._elapsed, self._logged = sql, parameters, 0.0, False
+                started = time.perf_counter()
+                try:
+                    result = super().execute(sql, parameters)
+                except Exception:
+                    profiler._record(sql, time.perf_counter() - started, failed=True)
+                    raise
+                dt = time.perf_counter() - started
+                profiler._record(sql, dt)
+                self._track(dt)
+                return result
+
+            def executemany(self, sql, seq_of_parameters):
+                # без параметров для EXPLAIN: в slow-log попадёт только время
+                self._sql, self._params, self._elapsed, self._logged = sql, None, 0.0, False
+                started = time.perf_counter()
+                try:
+                    result = super().executemany(sql, seq_of_parameters)
+                except Exception:
+                    profiler._record(sql, time.perf_counter() - started, failed=True)
+                    raise
+                dt = time.perf_counter() - started
+                profiler._record(sql, dt)
+                self._track(dt)
+                return result
+
+            def _fetch(self, fn, *args):
+                started = time.perf_counter()
+                try:
+                    return fn(*args)
+                finally:
+                    if self._sql is not None:
+                        dt = time.perf_counter() - started
+                        profiler._record_fetch(self._sql, dt)
+                        self._track(dt)
+
+            def fetchone(self):
+                return self._fetch(super().fetchone)
+
+            def fetchmany(self, *args):
+                return self._fetch(super().fetchmany, *args)
+
+            def fetchall(self):
+                return self._fetch(super().fetchall)
+
+        class ProfiledConnection(sqlite3.Connection):
+            def cursor(self, factory=ProfiledCursor):
+                return super().cursor(factory)
+
+            def execute(self, sql, parameters=()):
+                return self.cursor().execute(sql, parameters)
+
+            def executemany(self, sql, seq_of_parameters):
+                return self.cursor().executemany(sql, seq_of_parameters)
+
+        return ProfiledConnection
+
+    # ---------- Report ----------
+    def summary(self, top: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            methods = sorted(self.methods.items(), key=lambda kv: kv[1].total, reverse=True)[:top]
+            statements = sorted(self.statements.items(), key=lambda kv: kv[1].total + kv[1].fetch, reverse=True)[:top]
+            slow = list(self.slow_log)[-top:]
+            scans = [key for key, plan in self.plans.items() if has_table_scan(plan)]
+            return {
+                "since": self.started_at,
+                "methods": [st.row(k) for k, st in methods],
+                "statements": [st.row(k) for k, st in statements],
+                "slow": slow,
+                "table_scans": scans,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.methods.clear()
+            self.statements.clear()
+            self.plans.clear()
+            self.slow_log.clear()
+            self.started_at = time.time()
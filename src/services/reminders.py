@@ -0,0 +1,239 @@
+import asyncio
+import datetime
+import heapq
+import html
+import itertools
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+
+from src.services.metrics import FanoutMetrics, MetricsRegistry
+from src.services.timetable import Timetable
+from src.storage import Storage
+
+# слот группы: (weekday, "HH:MM" начала)
+SlotKey = Tuple[int, str]
+
+
+def next_start(weekday: int, hhmm: str, after: float, tz: Optional[datetime.tzinfo] = None) -> float:
+    """Ближайшее начало пары (epoch) строго после `after`; время пары — локальное для `tz` (None = системная зона)."""
+    now = datetime.datetime.fromtimestamp(after, tz)
+    h, m = (int(x) for x in hhmm.split(":")[:2])
+    days = (weekday - now.weekday()) % 7
+    for extra in (0, 7):
+        # арифметика по «стенным» часам: переход на летнее время не сдвигает пару
+        cand = (now + datetime.timedelta(days=days + extra)).replace(hour=h, minute=m, second=0, microsecond=0)
+        if cand.timestamp() > after:
+            return cand.timestamp()
+    return cand.timestamp()
+
+
+class ReminderScheduler:
+    """
+    Напоминания «пара через N минут».
+    Один таймер на весь бот: min-heap событий (время отправки, группа, слот), а не задача на пользователя.
+    Получатели слота — все подписчики группы, одна пачка отправок на слот.
+    Изменение расписания группы или подписок пересобирает только затронутую группу (версия группы
+    делает старые записи кучи недействительными — ленивое удаление). После рестарта куча строится заново
+    из подписчиков (частичный индекс по users.reminders), а reminder_log не даёт отправить слот дважды;
+    пропущенные за время простоя напоминания уходят сразу, если пара ещё не началась.
+    """
+    def __init__(self, bot: Bot, storage: Storage, timetable: Timetable, lead_minutes: float = 15,
+                 tz: Optional[datetime.tzinfo] = None, fanout_metrics: Optional[FanoutMetrics] = None,
+                 send_delay: float = 0.03):
+        self.bot = bot
+        self.storage = storage
+        self.timetable = timetable
+        self.lead = lead_minutes * 60
+        self.lead_minutes = lead_minutes
+        self.tz = tz
+        self.fanout_metrics = fanout_metrics or FanoutMetrics(MetricsRegistry(enabled=False))
+        self.send_delay = send_delay
+        # (fire_at, seq, group, slot, start_at, version)
+        self._heap: List[Tuple[float, int, str, SlotKey, float, int]] = []
+        self._seq = itertools.count()
+        self._versions: Dict[str, int] = {}
+        # сколько записей кучи устарело (ленивое удаление); при перевесе куча перестраивается
+        self._stale = 0
+        self._texts: Dict[str, Dict[SlotKey, str]] = {}
+        self._subscribers: Dict[str, Set[int]] = {}
+        self._user_group: Dict[int, str] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._jobs: set[asyncio.Task] = set()
+        self.jobs_sent = 0
+        self.messages_sent = 0
+        self.failed = 0
+
+    async def start(self):
+        if self._task:
+            return
+        await self.storage.prune_reminder_log(time.time() - 8 * 86400)
+        await self.reload_subscribers()
+        self._task = asyncio.create_task(self._loop(), name="reminders")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._jobs:
+            await asyncio.gather(*self._jobs, return_exceptions=True)
+
+    # ---------- subscribers ----------
+    async def reload_subscribers(self):
+        """Полная пересборка подписчиков (старт, смена списка студентов)."""
+        subscribers: Dict[str, Set[int]] = {}
+        user_group: Dict[int, str] = {}
+        for user_id, group in await self.storage.get_reminder_subscribers():
+            subscribers.setdefault(group, set()).add(user_id)
+            user_group[user_id] = group
+        dropped = set(self._subscribers) - set(subscribers)
+        added = set(subscribers) - set(self._subscribers)
+        self._subscribers, self._user_group = subscribers, user_group
+        for group in dropped:
+            self._drop_group(group)
+        for group in added:
+            await self._schedule_group(group)
+
+    async def refresh_user(self, user_id: int):
+        """Пользователь включил/выключил напоминания или сменил student_id."""
+        rows = await self.storage.get_reminder_subscribers(user_id)
+        group = rows[0][1] if rows else None
+        old = self._user_group.pop(user_id, None)
+        if old and old != group:
+            users = self._subscribers.get(old)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._subscribers[old]
+                    self._drop_group(old)
+        if group:
+            self._user_group[user_id] = group
+            users = self._subscribers.setdefault(group, set())
+            users.add(user_id)
+            if group not in self._texts:
+                await self._schedule_group(group)
+
+    def on_timetable_change(self, groups: Set[str], roster: bool):
+        """Колбэк Timetable.on_change: пересобрать только изменённые группы."""
+        job = asyncio.create_task(self._apply_change(groups, roster))
+        self._jobs.add(job)
+        job.add_done_callback(self._jobs.discard)
+
+    async def _apply_change(self, groups: Set[str], roster: bool):
+        try:
+            if roster:
+                await self.reload_subscribers()
+            for group in groups:
+                if group in self._subscribers:
+                    await self._schedule_group(group)
+        except Exception as e:
+            print(f"[Reminders] rebuild failed: {e}")
+
+    # ---------- heap ----------
+    async def _schedule_group(self, group: str):
+        rows = await self.storage.get_group_lessons(group)
+        by_slot: Dict[SlotKey, List[Tuple]] = {}
+        for r in rows:
+            by_slot.setdefault((r[0], r[2]), []).append(r)
+        self._drop_group(group)
+        self._texts[group] = {key: self._render(items) for key, items in by_slot.items()}
+        now = time.time()
+        for key in by_slot:
+            self._push(group, key, next_start(key[0], key[1], now, self.tz))
+        self._wakeup.set()
+
+    def _drop_group(self, group: str):
+        # записи в куче остаются, но с устаревшей версией пропускаются
+        self._versions[group] = self._versions.get(group, 0) + 1
+        self._stale += len(self._texts.pop(group, None) or ())
+        if self._stale > 256 and self._stale * 2 > len(self._heap):
+            self._heap = [e for e in self._heap if e[5] == self._versions.get(e[2])]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def _push(self, group: str, key: SlotKey, start_at: float):
+        heapq.heappush(self._heap, (start_at - self.lead, next(self._seq), group, key, start_at, self._versions[group]))
+
+    def _render(self, items: List[Tuple]) -> str:
+        lines = [f"⏰ <b>Lecture in {self.lead_minutes:g} min</b>"]
+        for _weekday, _slot, start, end, subject, _teacher, room, building in items:
+            where = html.escape(room or "-") + (f" ({html.escape(building)})" if building else "")
+            lines.append(f"📚 <b>{html.escape(subject or '')}</b>\n🏢 Room: {where}\n🕘 {start}-{end}")
+        return "\n\n".join(lines)
+
+    async def _loop(self):
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                _fire_at, _seq, group, key, start_at, version = heapq.heappop(self._heap)
+                if version != self._versions.get(group):
+                    self._stale = max(0, self._stale - 1)
+                    continue
+                self._push(group, key, next_start(key[0], key[1], start_at, self.tz))
+                if start_at <= now:
+                    # пара уже началась (долгий простой) — напоминать поздно
+                    continue
+                job = asyncio.create_task(self._send(group, key, start_at))
+                self._jobs.add(job)
+                job.add_done_callback(self._jobs.discard)
+            self._wakeup.clear()
+            # потолок сна: переводы системных часов не должны надолго «усыпить» таймер
+            timeout = min(300.0, self._heap[0][0] - now) if self._heap else 300.0
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, group: str, key: SlotKey, start_at: float):
+        text = self._texts.get(group, {}).get(key)
+        users = sorted(self._subscribers.get(group, ()))
+        if not text or not users:
+            return
+        try:
+            if not await self.storage.claim_reminder(group, int(start_at)):
+                return
+        except Exception as e:
+            print(f"[Reminders] claim failed for {group}: {e}")
+            return
+        fm = self.fanout_metrics
+        started = time.perf_counter()
+        sent = 0
+        fm.pending.inc(len(users), path="reminder")
+        for uid in users:
+            try:
+                # отписался, пока шла пачка
+                if uid not in self._subscribers.get(group, ()):
+                    continue
+                await self.bot.send_message(uid, text)
+                fm.sent("reminder")
+                sent += 1
+                await asyncio.sleep(self.send_delay)
+            except Exception as e:
+                self.failed += 1
+                fm.failed("reminder", e)
+            finally:
+                fm.pending.dec(path="reminder")
+        fm.duration.observe(time.perf_counter() - started, path="reminder")
+        self.jobs_sent += 1
+        self.messages_sent += sent
+        await self.storage.finish_reminder(group, int(start_at), sent)
+
+    def stats(self) -> Dict[str, object]:
+        live = [e for e in self._heap if e[5] == self._versions.get(e[2])]
+        nxt = min(live)[0] if live else None
+        return {
+            "groups": len(self._subscribers),
+            "subscribers": len(self._user_group),
+            "queued": len(live),
+            "heap": len(self._heap),
+            "next_at": datetime.datetime.fromtimestamp(nxt, self.tz).strftime("%a %H:%M") if nxt else None,
+            "jobs_sent": self.jobs_sent,
+            "messages_sent": self.messages_sent,
+            "failed": self.failed,
+        }
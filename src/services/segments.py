@@ -0,0 +1,102 @@
+import datetime
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+SEGMENT_HELP = (
+    "Audience spec — space-separated conditions, all must match:\n"
+    "• all — every user (default)\n"
+    "• subscribed — news subscription on\n"
+    "• active:N — seen in the last N days\n"
+    "• kw:word — has keyword filter «word»\n"
+    "• unmuted:channel — does not mute the channel\n"
+    "• sid:PREFIX — student ID starts with PREFIX\n"
+    "• group:CODE — student of timetable group CODE\n"
+    "Example: subscribed active:30 group:CS-101"
+)
+
+
+class SegmentError(ValueError):
+    pass
+
+
+@dataclass
+class Segment:
+    """
+    Аудитория рассылки. Условия объединяются по AND и компилируются в один WHERE по users:
+    каждое опирается на индекс (last_seen_at, student_id, user_keywords.keyword,
+    UNIQUE(user_id, source) в user_muted_sources, student_groups.group_code), без выборки в Python.
+    """
+    subscribed: bool = False
+    active_days: Optional[int] = None
+    keyword: Optional[str] = None
+    unmuted: Optional[str] = None
+    sid_prefix: Optional[str] = None
+    group: Optional[str] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "Segment":
+        seg = cls()
+        for token in (spec or "").split():
+            name, _, value = token.partition(":")
+            name = name.lower()
+            if name == "all" and not value:
+                continue
+            if name == "subscribed" and not value:
+                seg.subscribed = True
+            elif name == "active" and value.isdigit() and int(value) > 0:
+                seg.active_days = int(value)
+            elif name == "kw" and value:
+                seg.keyword = value.lower()
+            elif name == "unmuted" and value:
+                seg.unmuted = value.lower().lstrip("@")
+            elif name == "sid" and value:
+                seg.sid_prefix = value
+            elif name == "group" and value:
+                seg.group = value
+            else:
+                raise SegmentError(f"Unknown condition: {token}")
+        return seg
+
+    def where(self) -> Tuple[str, List]:
+        """(условие для `FROM users u`, параметры); пустая строка — все пользователи."""
+        conditions: List[str] = []
+        params: List = []
+        if self.subscribed:
+            conditions.append("u.subscribed_news = 1")
+        if self.active_days:
+            since = datetime.datetime.utcnow() - datetime.timedelta(days=self.active_days)
+            conditions.append("u.last_seen_at >= ?")
+            params.append(since.isoformat())
+        if self.sid_prefix:
+            # диапазон вместо LIKE 'x%': LIKE регистронезависим и индекс по student_id не использует
+            upper = self.sid_prefix[:-1] + chr(ord(self.sid_prefix[-1]) + 1)
+            conditions.append("u.student_id >= ? AND u.student_id < ?")
+            params += [self.sid_prefix, upper]
+        if self.group:
+            conditions.append("u.student_id IN (SELECT student_id FROM student_groups WHERE group_code = ?)")
+            params.append(self.group)
+        if self.keyword:
+            conditions.append("u.user_id IN (SELECT user_id FROM user_keywords WHERE keyword = ?)")
+            params.append(self.keyword)
+        if self.unmuted:
+            conditions.append(
+                "NOT EXISTS (SELECT 1 FROM user_muted_sources m WHERE m.user_id = u.user_id AND m.source = ?)"
+            )
+            params.append(self.unmuted)
+        return " AND ".join(conditions), params
+
+    def describe(self) -> str:
+        parts = []
+        if self.subscribed:
+            parts.append("subscribed")
+        if self.active_days:
+            parts.append(f"active:{self.active_days}")
+        if self.keyword:
+            parts.append(f"kw:{self.keyword}")
+        if self.unmuted:
+            parts.append(f"unmuted:{self.unmuted}")
+        if self.sid_prefix:
+            parts.append(f"sid:{self.sid_prefix}")
+        if self.group:
+            parts.append(f"group:{self.group}")
+        return " ".join(parts) or "all"
@@ -1,22 +1,18 @@
 import asyncio
 import os
+import time
 from typing import Awaitable, Callable, Iterable, Optional
 
 from telethon import TelegramClient, events
 from telethon.errors import RPCError
 from telethon.tl.custom.message import Message
 from telethon.tl.functions.channels import JoinChannelRequest
-from telethon.tl.types import MessageEntityUrl, MessageEntityTextUrl
+from telethon.tl.types import InputPeerChannel, MessageEntityUrl, MessageEntityTextUrl
 
 from src.storage import Storage
-
-
-def make_title_and_text(text: str, max_title_len: int = 120) -> tuple[str, str]:
-    if not text:
-        return "Post", ""
-    first = text.strip().splitlines()[0].strip()
-    title = (first[: max_title_len] + "…") if len(first) > max_title_len else first
-    return title, text
+from src.utils.text import make_title_and_text
+from src.services.tracing import NOOP_TRACER, Tracer, span
+from src.services.near_dup import NearDuplicateDetector, store_news
 
 
 def extract_external_url(msg: Message) -> Optional[str]:
@@ -43,7 +39,7 @@ class TelegramFetcher:
     """
     Telethon-based public channels parser.
     Stores post URL, first external URL and first photo (downloaded to disk).
-    on_new_item signature: (title, text, source, post_url, external_url, media_path)
+    on_new_item signature: (title, text, source, post_url, external_url, media_path, news_id=...)
     """
     def __init__(
         self,
@@ -52,32 +48,41 @@ class TelegramFetcher:
         session_name: str,
         channels: Iterable[str],
         storage: Storage,
+        resolve_concurrency: int = 4,
+        tracer: Optional[Tracer] = None,
+        near_dup: Optional[NearDuplicateDetector] = None,
     ):
         self.api_id = api_id
         self.api_hash = api_hash
         self.session_name = session_name
         self.channels = [c.lstrip("@") for c in channels]
         self.storage = storage
+        self.tracer = tracer or NOOP_TRACER
+        # почти-дубликаты (репост новости другим каналом) сохраняются со ссылкой на оригинал и не рассылаются
+        self.near_dup = near_dup
 
         self.client: Optional[TelegramClient] = None
         self._running = False
         self._handler_registered = False
-        self._on_new_item: Optional[Callable[[str, str, str, Optional[str], Optional[str], Optional[str]], Awaitable[None]]] = None
+        self._on_new_item: Optional[Callable[..., Awaitable[None]]] = None
         self._entities = []
+        self._peers: dict[str, InputPeerChannel] = {}
         self._channel_titles: dict[str, str] = {}
+        self._resolve_sem = asyncio.Semaphore(resolve_concurrency)
 
         self.media_dir = os.path.join("data", "media")
         os.makedirs(self.media_dir, exist_ok=True)
 
     async def start(
         self,
-        on_new_item: Optional[Callable[[str, str, str, Optional[str], Optional[str], Optional[str]], Awaitable[None]]] = None,
+        on_new_item: Optional[Callable[..., Awaitable[None]]] = None,
         backfill_per_channel: int = 5,
     ):
         if self._running:
             return
         self._on_new_item = on_new_item
 
+        t0 = time.perf_counter()
         self.client = TelegramClient(self.session_name, self.api_id, self.api_hash)
         await self.client.connect()
 
@@ -87,29 +92,118 @@ class TelegramFetcher:
         me = await self.client.get_me()
         if getattr(me, "bot", False):
             raise RuntimeError("Telethon is logged in as a bot; login with a user account.")
+        t_connect = time.perf_counter()
 
         self._running = True
 
-        # Resolve and join
+        # Resolve (кэш из БД, остальное — параллельно) and join
+        cached = await self.storage.get_channel_entities(self.channels)
+        resolved = await asyncio.gather(*(self._resolve_channel(ch, cached.get(ch.lower())) for ch in self.channels))
+        t_resolve = time.perf_counter()
+
+        to_join = [r for r in resolved if r and not r[3]]
+        joined = await asyncio.gather(*(self._join_channel(r[0], r[1]) for r in to_join))
+        t_join = time.perf_counter()
+
+        fresh = []
         self._entities = []
-        for ch in self.channels:
-            try:
+        for r in resolved:
+            if not r:
+                continue
+            ch, peer, title, is_member, from_cache = r
+            self._entities.append(peer)
+            self._peers[ch.lower()] = peer
+            self._channel_titles[ch.lower()] = title or ch
+            if not from_cache:
+                fresh.append((ch, peer.channel_id, peer.access_hash, title, is_member))
+        for (ch, peer, title, _m, _c), ok in zip(to_join, joined):
+            if ok:
+                fresh.append((ch, peer.channel_id, peer.access_hash, title, True))
+        await self.storage.save_channel_entities(fresh)
+
+        self._register_handler()
+
+        await self._backfill(backfill_per_channel)
+        t_backfill = time.perf_counter()
+        print(
+            f"[TelegramFetcher] Startup: connect {t_connect - t0:.2f}s, "
+            f"resolve {t_resolve - t_connect:.2f}s ({len(cached)} cached, {len(self.channels) - len(cached)} looked up), "
+            f"join {t_join - t_resolve:.2f}s ({sum(1 for ok in joined if ok)}/{len(to_join)}), "
+            f"backfill {t_backfill - t_join:.2f}s"
+        )
+
+    async def _resolve_channel(self, ch: str, cached: Optional[tuple]):
+        """-> (username, peer, title, is_member, from_cache) или None."""
+        if cached:
+            channel_id, access_hash, title, is_member = cached
+            return ch, InputPeerChannel(channel_id, access_hash), title, is_member, True
+        try:
+            async with self._resolve_sem:
                 entity = await self.client.get_entity(ch)
-                self._entities.append(entity)
-                self._channel_titles[getattr(entity, "username", ch).lower()] = getattr(entity, "title", ch)
-                try:
-                    await self.client(JoinChannelRequest(entity))
-                    print(f"[TelegramFetcher] Joined channel: {ch}")
-                except Exception:
-                    pass
-            except RPCError as e:
-                print(f"[TelegramFetcher] Failed to get channel {ch}: {e}")
+        except (RPCError, ValueError) as e:
+            print(f"[TelegramFetcher] Failed to get channel {ch}: {e}")
+            return None
+        access_hash = getattr(entity, "access_hash", None)
+        if access_hash is None:
+            print(f"[TelegramFetcher] {ch} is not a channel, skipped")
+            return None
+        peer = InputPeerChannel(entity.id, access_hash)
+        # Channel.left == False означает, что мы уже участник
+        return ch, peer, getattr(entity, "title", ch), not getattr(entity, "left", True), False
 
+    def _register_handler(self):
+        # фильтр chats у NewMessage фиксируется при регистрации — пересоздаём его целиком
+        if self._handler_registered:
+            self.client.remove_event_handler(self._on_new_message)
+            self._handler_registered = False
         if self._entities:
-            self.client.add_event_handler(self._on_new_message, events.NewMessage(chats=self._entities))
+            self.client.add_event_handler(self._on_new_message, events.NewMessage(chats=list(self._entities)))
             self._handler_registered = True
 
-        await self._backfill(backfill_per_channel)
+    async def add_channel(self, channel: str, backfill: int = 5) -> str:
+        """Подключить канал на лету: resolve/join, новый фильтр событий, backfill только этого канала."""
+        ch = channel.strip().lstrip("@")
+        if not self.client:
+            raise RuntimeError("Telethon is not running.")
+        if ch.lower() in self._peers:
+            return self._channel_titles.get(ch.lower(), ch)
+        resolved = await self._resolve_channel(ch, None)
+        if not resolved:
+            raise ValueError(f"Cannot resolve channel {ch}")
+        _ch, peer, title, is_member, _cached = resolved
+        if not is_member:
+            is_member = await self._join_channel(ch, peer)
+        await self.storage.save_channel_entities([(ch, peer.channel_id, peer.access_hash, title, is_member)])
+
+        # канал из TG_CHANNELS, который не удалось резолвить при старте, уже есть в списке
+        if ch.lower() not in (c.lower() for c in self.channels):
+            self.channels.append(ch)
+        self._entities.append(peer)
+        self._peers[ch.lower()] = peer
+        self._channel_titles[ch.lower()] = title or ch
+        self._register_handler()
+        await self._backfill_channel(ch, backfill)
+        return title or ch
+
+    def remove_channel(self, channel: str) -> bool:
+        ch = channel.strip().lstrip("@").lower()
+        peer = self._peers.pop(ch, None)
+        self.channels[:] = [c for c in self.channels if c.lower() != ch]
+        if peer is None:
+            return False
+        self._entities = [e for e in self._entities if e is not peer]
+        if self.client:
+            self._register_handler()
+        return True
+
+    async def _join_channel(self, ch: str, peer: InputPeerChannel) -> bool:
+        try:
+            async with self._resolve_sem:
+                await self.client(JoinChannelRequest(peer))
+            print(f"[TelegramFetcher] Joined channel: {ch}")
+            return True
+        except Exception:
+            return False
 
     async def stop(self):
         self._running = False
@@ -127,13 +221,20 @@ class TelegramFetcher:
     async def _backfill(self, per_channel: int):
         if not self.client:
             return
-        for ch in self.channels:
-            try:
-                async for msg in self.client.iter_messages(ch, limit=per_channel):
-                    await self._process_message(ch, msg)
-                    await asyncio.sleep(0.02)
-            except RPCError as e:
-                print(f"[TelegramFetcher] Backfill error for {ch}: {e}")
+        for ch in list(self.channels):
+            await self._backfill_channel(ch, per_channel)
+
+    async def _backfill_channel(self, ch: str, per_channel: int):
+        peer = self._peers.get(ch.lower(), ch)
+        try:
+            async for msg in self.client.iter_messages(peer, limit=per_channel):
+                await self._process_message(ch, msg, live=False)
+                await asyncio.sleep(0.02)
+        except RPCError as e:
+            print(f"[TelegramFetcher] Backfill error for {ch}: {e}")
+            if ch.lower() in self._peers:
+                # возможно, устаревший access_hash — при следующем старте резолвим заново
+                await self.storage.forget_channel_entity(ch)
 
     async def _on_new_message(self, event: events.NewMessage.Event):
         if not self._running:
@@ -145,7 +246,12 @@ class TelegramFetcher:
             ch = "unknown"
         await self._process_message(ch, msg)
 
-    async def _process_message(self, channel: str, msg: Message):
+    async def _process_message(self, channel: str, msg: Message, live: bool = True):
+        with self.tracer.trace("fetcher.message", channel=channel, msg_id=msg.id):
+            await self._ingest_message(channel, msg, live)
+
+    async def _ingest_message(self, channel: str, msg: Message, live: bool = True):
+        ingested_at = time.time()
         text = (msg.text or msg.message or "").strip()
 
         # Accept media-only posts via WebPage title/description
@@ -165,6 +271,31 @@ class TelegramFetcher:
         post_url = f"https://t.me/{source_username}/{msg.id}" if source_username and source_username != "unknown" else None
         external_url = extract_external_url(msg)
 
+        with span("fetcher.media"):
+            media_path = await self._download_media(msg, source_username)
+
+        # свежесть (news_delivery) — только для живых постов: у backfill posted_at может быть
+        # многочасовой давности, и такие строки исказили бы /freshness
+        posted_at = None
+        if live:
+            posted_at = msg.date.timestamp() if getattr(msg, "date", None) else ingested_at
+        with span("fetcher.store"):
+            news_id, original = await store_news(
+                self.storage, self.near_dup, title, full_text, source_username, external_id,
+                post_url=post_url, external_url=external_url, media_path=media_path, source_title=source_title,
+                posted_at=posted_at, ingested_at=ingested_at,
+            )
+        if original:
+            print(f"[TelegramFetcher] near-duplicate of #{original.news_id} (@{original.source}): {post_url}")
+            return
+        if news_id and self._on_new_item:
+            try:
+                with span("fetcher.notify"):
+                    await self._on_new_item(title, full_text, source_username, post_url, external_url, media_path, news_id=news_id)
+            except Exception:
+                pass
+
+    async def _download_media(self, msg: Message, source_username: str) -> Optional[str]:
         media_path = None
         try:
             # (a) Photo attachment
@@ -194,13 +325,4 @@ class TelegramFetcher:
                 media_path = path
         except Exception as e:
             print(f"[TelegramFetcher] Failed to download media for {source_username}/{msg.id}: {e}")
-
-        added = await self.storage.add_news_if_new(
-            title, full_text, source_username, external_id,
-            post_url=post_url, external_url=external_url, media_path=media_path, source_title=source_title
-        )
-        if added and self._on_new_item:
-            try:
-                await self._on_new_item(title, full_text, source_username, post_url, external_url, media_path)
-            except Exception:
-                pass
\ No newline at end of file
+        return media_path
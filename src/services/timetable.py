@@ -0,0 +1,374 @@
+import csv
+import datetime
+import hashlib
+import html
+import io
+import os
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.storage import Storage
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+ALL_DAYS = "All"
+
+_DAY_ALIASES = {
+    **{d.lower(): i for i, d in enumerate(WEEKDAYS)},
+    **{d[:3].lower(): i for i, d in enumerate(WEEKDAYS)},
+    **{d[:2].upper(): i for i, d in enumerate(WEEKDAYS)},  # ICS BYDAY: MO, TU, …
+    **{str(i + 1): i for i in range(7)},
+    "понедельник": 0, "вторник": 1, "среда": 2, "четверг": 3, "пятница": 4, "суббота": 5, "воскресенье": 6,
+    "пн": 0, "вт": 1, "ср": 2, "чт": 3, "пт": 4, "сб": 5, "вс": 6,
+}
+_TIME_RANGE = re.compile(r"^\s*(\d{1,2}:\d{2})\s*[-–]\s*(\d{1,2}:\d{2})\s*$")
+_BUILDING = re.compile(r"^([A-Za-zА-Яа-я]+)")
+
+
+@dataclass(frozen=True)
+class Lesson:
+    group: str
+    weekday: int
+    slot: int
+    start: str
+    end: str
+    subject: str
+    teacher: str = ""
+    room: str = ""
+    building: str = ""
+
+    def row(self) -> Tuple:
+        return (self.weekday, self.slot, self.start, self.end, self.subject, self.teacher, self.room, self.building)
+
+
+class TimetableFormatError(ValueError):
+    pass
+
+
+def parse_weekday(value: str) -> int:
+    key = (value or "").strip()
+    day = _DAY_ALIASES.get(key, _DAY_ALIASES.get(key.lower(), _DAY_ALIASES.get(key.upper())))
+    if day is None:
+        raise TimetableFormatError(f"unknown weekday: {value!r}")
+    return day
+
+
+def _hhmm(value: str) -> str:
+    h, m = value.strip().split(":")[:2]
+    return f"{int(h):02d}:{int(m):02d}"
+
+
+def _building(room: str) -> str:
+    # "B2.3" → "B"
+    m = _BUILDING.match(room or "")
+    return m.group(1) if m else ""
+
+
+def _with_slots(raw: List[Tuple[str, int, Optional[int], str, str, str, str, str, str]]) -> List[Lesson]:
+    """Номер пары, если его нет в файле, — порядковый номер по времени начала внутри группы и дня."""
+    raw.sort(key=lambda r: (r[0], r[1], r[3], r[4]))
+    lessons: List[Lesson] = []
+    counters: Dict[Tuple[str, int], int] = {}
+    for group, weekday, slot, start, end, subject, teacher, room, building in raw:
+        n = counters[(group, weekday)] = counters.get((group, weekday), 0) + 1
+        lessons.append(Lesson(group, weekday, slot or n, start, end, subject, teacher, room, building or _building(room)))
+    return lessons
+
+
+# ---------- CSV ----------
+def parse_csv(text: str, group: Optional[str] = None) -> Tuple[List[Lesson], List[Tuple[str, str]]]:
+    """
+    Два вида CSV (разделитель `,` или `;`, первая строка — заголовок):
+      расписание — group, weekday, [slot], start, end | time ("09:00-10:30"), subject, [teacher], [room], [building];
+      список студентов — student_id, group.
+    `group` подставляется, если колонки group нет. Возвращает (lessons, [(student_id, group)]).
+    """
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    fields = {(f or "").strip().lower() for f in reader.fieldnames or []}
+    if "student_id" in fields and "weekday" not in fields:
+        students = []
+        for row in reader:
+            row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+            if row.get("student_id") and (row.get("group") or group):
+                students.append((row["student_id"].upper(), row.get("group") or group))
+        return [], students
+    if "weekday" not in fields or "subject" not in fields:
+        raise TimetableFormatError("CSV needs weekday and subject columns (or student_id,group for a roster)")
+
+    raw = []
+    for line_no, row in enumerate(reader, start=2):
+        row = {(k or "").strip().lower(): (v or "").strip() for k, v in row.items()}
+        if not row.get("subject"):
+            continue
+        grp = row.get("group") or group
+        if not grp:
+            raise TimetableFormatError(f"line {line_no}: no group")
+        start, end = row.get("start", ""), row.get("end", "")
+        if not start and row.get("time"):
+            m = _TIME_RANGE.match(row["time"])
+            if not m:
+                raise TimetableFormatError(f"line {line_no}: bad time {row['time']!r}")
+            start, end = m.groups()
+        try:
+            weekday = parse_weekday(row["weekday"])
+            start, end = _hhmm(start), _hhmm(end)
+        except (TimetableFormatError, ValueError) as e:
+            raise TimetableFormatError(f"line {line_no}: {e}") from None
+        slot = int(row["slot"]) if row.get("slot", "").isdigit() else None
+        raw.append((grp, weekday, slot, start, end, row["subject"], row.get("teacher", ""),
+                    row.get("room", ""), row.get("building", "")))
+    return _with_slots(raw), []
+
+
+# ---------- ICS ----------
+def _ics_unescape(value: str) -> str:
+    return value.replace("\\n", "\n").replace("\\N", "\n").replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\")
+
+
+def _ics_time(value: str) -> Tuple[Optional[datetime.date], str]:
+    # 20250901T090000[Z]
+    value = value.strip()
+    if "T" not in value:
+        return None, ""
+    date, t = value.split("T", 1)
+    return datetime.date(int(date[:4]), int(date[4:6]), int(date[6:8])), f"{t[:2]}:{t[2:4]}"
+
+
+def parse_ics(text: str, group: Optional[str] = None) -> List[Lesson]:
+    """
+    VEVENT → занятие. День недели — из RRULE BYDAY (еженедельные пары) или из даты DTSTART.
+    Группа — X-GROUP / CATEGORIES события, иначе `group` (по умолчанию имя файла).
+    Преподаватель — ORGANIZER;CN=…, иначе первая строка DESCRIPTION.
+    """
+    # разворачиваем перенесённые строки (RFC 5545: продолжение начинается с пробела/таба)
+    lines: List[str] = []
+    for line in text.splitlines():
+        if line[:1] in (" ", "\t") and lines:
+            lines[-1] += line[1:]
+        else:
+            lines.append(line)
+
+    raw = []
+    event: Optional[Dict[str, Tuple[str, str]]] = None
+    for line in lines:
+        if line == "BEGIN:VEVENT":
+            event = {}
+            continue
+        if line == "END:VEVENT" and event is not None:
+            raw.extend(_ics_event(event, group))
+            event = None
+            continue
+        if event is None or ":" not in line:
+            continue
+        head, value = line.split(":", 1)
+        name, _, params = head.partition(";")
+        # ORGANIZER;CN="Ivan Ivanov":mailto:…
+        event[name.upper()] = (params, value)
+    return _with_slots(raw)
+
+
+def _ics_event(event: Dict[str, Tuple[str, str]], group: Optional[str]) -> List[Tuple]:
+    subject = _ics_unescape(event.get("SUMMARY", ("", ""))[1]).strip()
+    date, start = _ics_time(event.get("DTSTART", ("", ""))[1])
+    _date, end = _ics_time(event.get("DTEND", ("", ""))[1])
+    grp = (_ics_unescape(event.get("X-GROUP", ("", ""))[1]) or _ics_unescape(event.get("CATEGORIES", ("", ""))[1]).split(",")[0]).strip() or group
+    if not subject or not start or not grp:
+        return []
+    teacher = ""
+    org_params, org_value = event.get("ORGANIZER", ("", ""))
+    m = re.search(r'CN="?([^";:]+)"?', org_params)
+    if m:
+        email = org_value.split(":", 1)[1] if org_value.lower().startswith("mailto:") else ""
+        teacher = f"{m.group(1).strip()} ({email})" if email else m.group(1).strip()
+    elif "DESCRIPTION" in event:
+        teacher = _ics_unescape(event["DESCRIPTION"][1]).split("\n")[0].strip()
+    room = _ics_unescape(event.get("LOCATION", ("", ""))[1]).strip()
+
+    rrule = dict(p.split("=", 1) for p in event.get("RRULE", ("", ""))[1].split(";") if "=" in p)
+    if rrule.get("BYDAY"):
+        # "MO,WE" или "1MO" — берём две последние буквы
+        days = sorted({parse_weekday(d.strip()[-2:]) for d in rrule["BYDAY"].split(",") if d.strip()})
+    elif date:
+        days = [date.weekday()]
+    else:
+        return []
+    return [(grp, d, None, start, end or start, subject, teacher, room, "") for d in days]
+
+
+def load_file(path: str, group: Optional[str] = None) -> Tuple[List[Lesson], List[Tuple[str, str]]]:
+    """CSV или ICS по расширению; для ICS без группы в событиях группа = имя файла."""
+    with open(path, encoding="utf-8-sig") as f:
+        text = f.read()
+    if path.lower().endswith((".ics", ".ical")):
+        return parse_ics(text, group or os.path.splitext(os.path.basename(path))[0]), []
+    return parse_csv(text, group)
+
+
+def expand_paths(paths: Iterable[str]) -> List[str]:
+    """Файлы и каталоги (берутся *.csv / *.ics) в стабильном порядке."""
+    files: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(os.path.join(p, n) for n in sorted(os.listdir(p)) if n.lower().endswith((".csv", ".ics", ".ical")))
+        elif os.path.isfile(p):
+            files.append(p)
+    return files
+
+
+def group_digest(lessons: Iterable[Lesson]) -> str:
+    h = hashlib.sha1()
+    for lesson in sorted(lessons, key=Lesson.row):
+        h.update(repr(lesson.row()).encode("utf-8"))
+    return h.hexdigest()
+
+
+def render_lessons(day: str, lessons: List[Lesson]) -> str:
+    lines = [f"<b>📅 {day}</b>"]
+    for item in lessons:
+        room = html.escape(item.room or "-")
+        if item.building:
+            room += f" ({html.escape(item.building)})"
+        lines.append(
+            f"📚 <b>{html.escape(item.subject)}</b>\n"
+            + (f"👨‍🏫 {html.escape(item.teacher)}\n" if item.teacher else "")
+            + f"🏢 Room: {room}\n"
+            f"⏰ {item.start}-{item.end}"
+        )
+    return "\n\n".join(lines)
+
+
+class Timetable:
+    """
+    Расписание групп из SQLite с готовыми HTML-рендерами.
+    Тап по дню — это student_id из кэша профиля → группа (dict) → готовый текст (dict): O(1), без SQL.
+    Рендер группы строится при первом запросе и сбрасывается, только если импорт изменил её занятия
+    (сравнение хэша содержимого группы), поэтому реимпорт неизменённого файла ничего не трогает.
+    """
+    def __init__(self, storage: Storage):
+        self.storage = storage
+        self._student_groups: Dict[str, str] = {}
+        self._digests: Dict[str, str] = {}
+        # (group, day) → HTML; day — имя дня из WEEKDAYS или ALL_DAYS
+        self._renders: Dict[Tuple[str, str], str] = {}
+        self._rendered_groups: set[str] = set()
+        # подписчик на изменения (планировщик напоминаний): (изменённые группы, изменился ли список студентов)
+        self.on_change: Optional[Callable[[Set[str], bool], None]] = None
+
+    def _changed(self, groups: Set[str], roster: bool = False):
+        if self.on_change and (groups or roster):
+            self.on_change(groups, roster)
+
+    async def load(self):
+        """(Пере)читать привязки студентов и хэши групп из БД; рендеры изменённых групп сбрасываются."""
+        students = await self.storage.get_student_groups()
+        roster = students != self._student_groups
+        self._student_groups = students
+        digests = await self.storage.get_timetable_digests()
+        changed = {g for g in set(self._digests) | set(digests) if self._digests.get(g) != digests.get(g)}
+        for group in changed:
+            self._invalidate(group)
+        self._digests = digests
+        self._changed(changed, roster)
+
+    def group_for(self, student_id: Optional[str]) -> Optional[str]:
+        if not student_id:
+            return None
+        return self._student_groups.get(student_id.strip().upper())
+
+    def has_group(self, group: str) -> bool:
+        return group in self._digests
+
+    async def render(self, group: str, day: str) -> Optional[str]:
+        """HTML для дня (или ALL_DAYS); None — в этот день занятий нет."""
+        if group not in self._rendered_groups:
+            await self._render_group(group)
+        return self._renders.get((group, day))
+
+    async def _render_group(self, group: str):
+        rows = await self.storage.get_group_lessons(group)
+        by_day: Dict[int, List[Lesson]] = {}
+        for r in rows:
+            by_day.setdefault(r[0], []).append(Lesson(group, *r))
+        parts = []
+        for weekday, lessons in sorted(by_day.items()):
+            text = render_lessons(WEEKDAYS[weekday], lessons)
+            self._renders[(group, WEEKDAYS[weekday])] = text
+            parts.append(text)
+        if parts:
+            self._renders[(group, ALL_DAYS)] = "\n\n".join(parts)
+        self._rendered_groups.add(group)
+
+    def _invalidate(self, group: str):
+        self._rendered_groups.discard(group)
+        for day in WEEKDAYS + [ALL_DAYS]:
+            self._renders.pop((group, day), None)
+
+    # ---------- Import ----------
+    async def import_lessons(self, lessons: List[Lesson], replace: bool = False) -> Dict[str, int]:
+        """
+        Инкрементальный импорт: перезаписываются только группы, чьё содержимое изменилось.
+        replace=True дополнительно удаляет группы, которых нет в `lessons` (полная выгрузка).
+        """
+        by_group: Dict[str, List[Lesson]] = {}
+        for lesson in lessons:
+            by_group.setdefault(lesson.group, []).append(lesson)
+        changed: Dict[str, Tuple[str, List[Tuple]]] = {}
+        for group, items in by_group.items():
+            digest = group_digest(items)
+            if self._digests.get(group) != digest:
+                changed[group] = (digest, [lesson.row() for lesson in items])
+        removed = sorted(set(self._digests) - set(by_group)) if replace else []
+
+        await self.storage.replace_timetable_groups(changed)
+        await self.storage.delete_timetable_groups(removed)
+        for group, (digest, _rows) in changed.items():
+            self._digests[group] = digest
+            self._invalidate(group)
+        for group in removed:
+            self._digests.pop(group, None)
+            self._invalidate(group)
+        self._changed(set(changed) | set(removed))
+        return {
+            "groups": len(by_group),
+            "changed": len(changed),
+            "unchanged": len(by_group) - len(changed),
+            "removed": len(removed),
+            "lessons": len(lessons),
+        }
+
+    async def import_students(self, pairs: List[Tuple[str, str]], replace: bool = False) -> int:
+        pairs = [(sid.strip().upper(), group.strip()) for sid, group in pairs if sid.strip() and group.strip()]
+        await self.storage.set_student_groups(pairs, replace=replace)
+        if replace:
+            self._student_groups = dict(pairs)
+        else:
+            self._student_groups.update(pairs)
+        self._changed(set(), roster=True)
+        return len(pairs)
+
+    async def import_files(self, paths: Iterable[str], group: Optional[str] = None, replace: bool = False) -> Dict[str, int]:
+        lessons: List[Lesson] = []
+        students: List[Tuple[str, str]] = []
+        files = expand_paths(paths)
+        for path in files:
+            file_lessons, file_students = load_file(path, group)
+            lessons.extend(file_lessons)
+            students.extend(file_students)
+        result = {"files": len(files)}
+        if lessons:
+            result.update(await self.import_lessons(lessons, replace=replace))
+        if students:
+            result["students"] = await self.import_students(students, replace=replace)
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "groups": len(self._digests),
+            "students": len(self._student_groups),
+            "rendered_groups": len(self._rendered_groups),
+            "cached_views": len(self._renders),
+        }
@@ -0,0 +1,197 @@
+import asyncio
+import datetime
+import json
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# (trace, индекс текущего спана; -1 = корень)
+_current: ContextVar[Optional[Tuple["Trace", int]]] = ContextVar("trace_current", default=None)
+
+
+class Trace:
+    __slots__ = ("trace_id", "name", "attrs", "started", "at", "duration", "spans", "dropped", "sampled", "error")
+
+    def __init__(self, name: str, attrs: Dict[str, Any], sampled: bool):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started = time.perf_counter()
+        self.at = datetime.datetime.utcnow().isoformat()
+        self.duration = 0.0
+        # [name, parent, start_s, dur_s, attrs, error]
+        self.spans: List[list] = []
+        self.dropped = 0
+        self.sampled = sampled
+        self.error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "at": self.at,
+            "dur_ms": round(self.duration * 1000, 2),
+            "attrs": self.attrs,
+            "error": self.error,
+            "sampled": self.sampled,
+            "dropped_spans": self.dropped,
+            "spans": [
+                {
+                    "name": name,
+                    "parent": parent,
+                    "start_ms": round(start * 1000, 2),
+                    "dur_ms": round((dur or 0.0) * 1000, 2),
+                    "attrs": attrs,
+                    "error": error,
+                }
+                for name, parent, start, dur, attrs, error in self.spans
+            ],
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    cur = _current.get()
+    return cur[0] if cur else None
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[None]:
+    """Дочерний спан текущей трассы; без активной (или не попавшей в выборку) трассы — почти бесплатен."""
+    cur = _current.get()
+    if cur is None or not cur[0].sampled:
+        yield
+        return
+    trace, parent = cur
+    if len(trace.spans) >= Tracer.max_spans:
+        trace.dropped += 1
+        yield
+        return
+    started = time.perf_counter()
+    rec = [name, parent, started - trace.started, None, attrs, None]
+    trace.spans.append(rec)
+    token = _current.set((trace, len(trace.spans) - 1))
+    try:
+        yield
+    except BaseException as e:
+        rec[5] = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        rec[3] = time.perf_counter() - started
+
+
+class Tracer:
+    """
+    Лёгкая трассировка апдейтов и стадий fetcher.
+    trace() открывает корень (одна трасса на апдейт/пост), span() — вложенные участки; связь через contextvars,
+    поэтому спаны из Storage и Bot API попадают в трассу того апдейта, в чьей задаче выполняются.
+    В выборку попадает доля `sample_rate`; трассы дольше `slow_ms` пишутся всегда (без выборки — только корень).
+    Готовые трассы копятся в памяти и раз в flush_interval дописываются в JSONL из отдельного потока.
+    """
+    max_spans = 256
+
+    def __init__(self, path: Optional[str], sample_rate: float = 0.0, slow_ms: float = 0.0,
+                 flush_interval: float = 5.0, max_buffer: int = 1000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.slow_s = slow_ms / 1000 if slow_ms else 0.0
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self.exported = 0
+        self.dropped_traces = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and (self.sample_rate > 0 or self.slow_s > 0)
+
+    @contextmanager
+    def trace(self, name: str, **attrs: Any) -> Iterator[Optional[Trace]]:
+        if not self.enabled:
+            yield None
+            return
+        if _current.get() is not None:
+            # уже внутри трассы (например, notify из fetcher) — просто вложенный спан
+            with span(name, **attrs):
+                yield current_trace()
+            return
+        t = Trace(name, attrs, sampled=random.random() < self.sample_rate)
+        token = _current.set((t, -1))
+        try:
+            yield t
+        except BaseException as e:
+            t.error = type(e).__name__
+            raise
+        finally:
+            _current.reset(token)
+            t.duration = time.perf_counter() - t.started
+            self._finish(t)
+
+    def _finish(self, t: Trace):
+        slow = self.slow_s and t.duration >= self.slow_s
+        if not (t.sampled or slow):
+            return
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped_traces += 1
+            return
+        self._buffer.append(t.as_dict())
+
+    async def start(self):
+        if self._task or not self.enabled:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        if not self._buffer or not self.path:
+            return
+        batch, self._buffer = self._buffer, []
+        try:
+            # запись файла — не в event loop
+            await asyncio.to_thread(self._write, batch)
+            self.exported += len(batch)
+        except OSError as e:
+            print(f"[Tracer] Failed to write {self.path}: {e}")
+
+    def _write(self, batch: List[dict]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for row in batch:
+                f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+NOOP_TRACER = Tracer(None)
+
+
+def trace_storage(storage):
+    """Спан на каждый публичный async-метод Storage (обёртка на экземпляре)."""
+    from src.utils.instrument import wrap_async_methods
+
+    def wrap(name, fn):
+        label = f"storage.{name}"
+
+        async def traced(*args, **kwargs):
+            with span(label):
+                return await fn(*args, **kwargs)
+        return traced
+
+    return wrap_async_methods(storage, wrap)
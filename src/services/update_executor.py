@@ -0,0 +1,112 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+
+def update_key(update: Update) -> Optional[Hashable]:
+    """Ключ упорядочивания: чат (или пользователь, если чата нет)."""
+    try:
+        event = update.event
+    except Exception:
+        return None
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return ("chat", chat.id)
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return ("user", user.id)
+    return None
+
+
+class KeyedUpdateExecutor:
+    """
+    Параллельная обработка апдейтов с лимитом воркеров и строгим порядком внутри одного чата.
+    Сначала берётся замок ключа (FIFO), потом слот глобального семафора,
+    поэтому очередь одного пользователя не занимает чужие слоты.
+    """
+    def __init__(self, workers: int = 16, window: int = 1024):
+        self.workers = workers
+        self._slots = asyncio.Semaphore(workers)
+        self._keys: Dict[Hashable, list] = {}  # key -> [Lock, holders+waiters]
+        self.waiting = 0
+        self.running = 0
+        self.processed = 0
+        self.max_waiting = 0
+        self._waits: deque[float] = deque(maxlen=window)
+
+    @asynccontextmanager
+    async def slot(self, key: Optional[Hashable]) -> AsyncIterator[None]:
+        enqueued = time.perf_counter()
+        entry = None
+        if key is not None:
+            entry = self._keys.get(key)
+            if entry is None:
+                entry = self._keys[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = False
+        try:
+            if entry is not None:
+                await entry[0].acquire()
+            try:
+                async with self._slots:
+                    self.waiting -= 1
+                    started = True
+                    self.running += 1
+                    self._waits.append(time.perf_counter() - enqueued)
+                    try:
+                        yield
+                    finally:
+                        self.running -= 1
+                        self.processed += 1
+            finally:
+                if entry is not None:
+                    entry[0].release()
+        finally:
+            # отмена во время ожидания — апдейт так и не начал выполняться
+            if not started:
+                self.waiting -= 1
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._keys.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def pct(q: float) -> float:
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 3) if waits else 0.0
+
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "active_keys": len(self._keys),
+            "processed": self.processed,
+            "wait_p50_ms": pct(0.50),
+            "wait_p95_ms": pct(0.95),
+            "wait_max_ms": pct(1.0),
+        }
+
+
+class OrderedDispatcher(Dispatcher):
+    """
+    Dispatcher, пропускающий каждый апдейт через KeyedUpdateExecutor.
+    feed_update — первое, что выполняется в задаче апдейта (и при polling, и при webhook),
+    поэтому порядок захвата замков совпадает с порядком апдейтов, а FSM-состояние
+    читается уже под замком.
+    """
+    def __init__(self, *args: Any, executor: KeyedUpdateExecutor, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.executor = executor
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        async with self.executor.slot(update_key(update)):
+            return await super().feed_update(bot, update, **kwargs)
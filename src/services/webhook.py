@@ -0,0 +1,54 @@
+import asyncio
+from typing import Any
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret: str | None = None, **data: Any) -> web.Application:
+    """
+    aiohttp-приложение с webhook-эндпоинтом.
+    Апдейты уходят в тот же Dispatcher (роутеры, middlewares, dp["storage"] и т.д.),
+    заголовок X-Telegram-Bot-Api-Secret-Token сверяется с `secret`.
+    """
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret, **data).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+
+    async def health(_request: web.Request) -> web.Response:
+        return web.Response(text="ok")
+
+    app.router.add_get("/healthz", health)
+    return app
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    host: str,
+    port: int,
+    path: str,
+    secret: str | None = None,
+    base_url: str | None = None,
+):
+    """
+    Поднимает webhook-сервер и ждёт отмены.
+    Если задан base_url — регистрирует webhook в Telegram (для локальных тестов можно не задавать).
+    """
+    app = build_webhook_app(dp, bot, path=path, secret=secret)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+    print(f"Webhook server listening on http://{host}:{port}{path}")
+
+    if base_url:
+        url = base_url.rstrip("/") + path
+        await bot.set_webhook(url, secret_token=secret, allowed_updates=dp.resolve_used_update_types())
+        print(f"Webhook registered: {url}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -1,13 +1,37 @@
 import aiosqlite
 import datetime
-from typing import List, Tuple, Optional
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Tuple, Optional
+
+from src.rows import NEWS_COLUMNS, NO_PROFILE, NewsItem, UserProfile
+from src.utils.cache import LRUCache, MISSING
+
+if TYPE_CHECKING:
+    from src.services.query_profiler import QueryProfiler
+    from src.services.segments import Segment
+
+def _offset_ms(base: float, ts: Optional[float]) -> Optional[int]:
+    return int((ts - base) * 1000) if ts is not None else None
+
 
 class Storage:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, user_cache_size: int = 10_000, user_cache_ttl: float = 300.0,
+                 release: Optional[str] = None, profiler: Optional["QueryProfiler"] = None):
         self.db_path = db_path
+        # opt-in профилировщик: sqlite3-фабрика соединений меряет каждое SQL-выражение
+        self.profiler = profiler
+        # метка релиза в news_delivery, чтобы сравнивать свежесть доставки между версиями
+        self.release = release
+        # read-through / write-through кэш строк users (None = пользователя нет в БД)
+        self.user_cache = LRUCache(maxsize=user_cache_size, ttl=user_cache_ttl)
+
+    def _connect(self) -> aiosqlite.Connection:
+        if self.profiler:
+            return aiosqlite.connect(self.db_path, factory=self.profiler.factory)
+        return aiosqlite.connect(self.db_path)
 
     async def init(self):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("""
                 CREATE TABLE IF NOT EXISTS users (
                     user_id INTEGER PRIMARY KEY,
@@ -50,15 +74,141 @@ class Storage:
                     UNIQUE(user_id, source)
                 )
             """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS channels (
+                    username TEXT PRIMARY KEY,
+                    enabled INTEGER DEFAULT 1,
+                    added_by INTEGER,
+                    created_at TEXT
+                )
+            """)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS channel_entities (
+                    username TEXT PRIMARY KEY,
+                    channel_id INTEGER NOT NULL,
+                    access_hash INTEGER NOT NULL,
+                    title TEXT,
+                    joined INTEGER DEFAULT 0,
+                    updated_at TEXT
+                )
+            """)
+            # Freshness: время жизни поста от публикации в канале до доставки.
+            # posted_at — epoch секунды, остальные поля — смещения от posted_at в мс (компактные INTEGER).
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS news_delivery (
+                    news_id INTEGER PRIMARY KEY,
+                    source TEXT,
+                    posted_at INTEGER,
+                    ingest_ms INTEGER,
+                    persist_ms INTEGER,
+                    first_send_ms INTEGER,
+                    last_send_ms INTEGER,
+                    sent_count INTEGER DEFAULT 0,
+                    release TEXT
+                )
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_news_delivery_posted ON news_delivery(posted_at)")
+            # Расписание: строки по группам; weekday 0 = понедельник, slot — номер пары в дне.
+            # timetable_groups хранит хэш содержимого группы для инкрементального реимпорта.
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS timetable_lessons (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    group_code TEXT NOT NULL,
+                    weekday INTEGER NOT NULL,
+                    slot INTEGER NOT NULL,
+                    start_time TEXT,
+                    end_time TEXT,
+                    subject TEXT,
+                    teacher TEXT,
+                    room TEXT,
+                    building TEXT
+                )
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_timetable_group_day ON timetable_lessons(group_code, weekday, slot)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_timetable_teacher ON timetable_lessons(teacher, weekday)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_timetable_room ON timetable_lessons(room, weekday)")
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS timetable_groups (
+                    group_code TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    lessons INTEGER DEFAULT 0,
+                    updated_at TEXT
+                )
+            """)
+            # Привязка студента к группе по student_id из профиля
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS student_groups (
+                    student_id TEXT PRIMARY KEY,
+                    group_code TEXT NOT NULL,
+                    updated_at TEXT
+                )
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_student_groups_group ON student_groups(group_code)")
+            # Очередь дайджеста: посты, прошедшие фильтры пользователя, до ближайшей отправки
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS digest_queue (
+                    user_id INTEGER NOT NULL,
+                    news_id INTEGER NOT NULL,
+                    created_at TEXT,
+                    PRIMARY KEY (user_id, news_id)
+                )
+            """)
+            # Напоминания о парах: отметка «слот группы уже разослан» переживает рестарт
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS reminder_log (
+                    group_code TEXT NOT NULL,
+                    slot_at INTEGER NOT NULL,
+                    sent_count INTEGER DEFAULT 0,
+                    created_at TEXT,
+                    PRIMARY KEY (group_code, slot_at)
+                )
+            """)
+            # Прогресс рассылок: cursor — последний обработанный user_id (ключ возобновления),
+            # payload — JSON со всем, что нужно, чтобы продолжить рассылку после рестарта
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS fanout_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT,
+                    cursor INTEGER,
+                    sent INTEGER DEFAULT 0,
+                    failed INTEGER DEFAULT 0,
+                    created_at TEXT,
+                    updated_at TEXT,
+                    finished_at TEXT
+                )
+            """)
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_fanout_jobs_open ON fanout_jobs(kind) WHERE finished_at IS NULL")
             # Новые поля пользователя
             await self._ensure_column(db, "users", "student_id", "TEXT")
             await self._ensure_column(db, "users", "full_name", "TEXT")
             await self._ensure_column(db, "users", "profile_photo", "TEXT")
+            await self._ensure_column(db, "users", "last_seen_at", "TEXT")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_users_last_seen ON users(last_seen_at)")
+            await self._ensure_column(db, "users", "reminders", "INTEGER DEFAULT 0")
+            # частичный индекс: при старте читаются только подписанные на напоминания, без прохода по всем users
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_users_reminders ON users(student_id) WHERE reminders = 1")
+            # Режим доставки новостей: instant | hourly | daily; для дайджестов — время следующей отправки (epoch)
+            await self._ensure_column(db, "users", "delivery", "TEXT DEFAULT 'instant'")
+            await self._ensure_column(db, "users", "digest_next_at", "INTEGER")
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_users_digest_due ON users(digest_next_at) WHERE delivery != 'instant'"
+            )
+            # получатели дайджеста по user_id — порциями при разборе нового поста
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_users_digest ON users(user_id) WHERE delivery != 'instant'")
             # Новые поля в news
             await self._ensure_column(db, "news", "post_url", "TEXT")
             await self._ensure_column(db, "news", "external_url", "TEXT")
             await self._ensure_column(db, "news", "media_path", "TEXT")
             await self._ensure_column(db, "news", "source_title", "TEXT")
+            # SimHash поста (знаковый 64-бит) и ссылка на оригинал для почти-дубликатов из других каналов
+            await self._ensure_column(db, "news", "simhash", "INTEGER")
+            await self._ensure_column(db, "news", "duplicate_of", "INTEGER")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_news_created ON news(created_at)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_news_source ON news(source)")
+            # сегменты рассылок: префикс student_id и «у кого есть ключевое слово»
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_users_student ON users(student_id)")
+            await db.execute("CREATE INDEX IF NOT EXISTS idx_user_keywords_keyword ON user_keywords(keyword)")
             await db.commit()
 
     async def _ensure_column(self, db: aiosqlite.Connection, table: str, column: str, col_type: str):
@@ -71,56 +221,135 @@ class Storage:
                 pass
 
     # ---------- Users ----------
+    async def _get_user_row(self, user_id: int) -> Optional[UserProfile]:
+        row = self.user_cache.get(user_id)
+        if row is not MISSING:
+            return row
+        async with self._connect() as db:
+            db.row_factory = UserProfile.from_row
+            async with db.execute(
+                "SELECT subscribed_news, is_admin, student_id, full_name, profile_photo FROM users WHERE user_id = ?",
+                (user_id,)
+            ) as cur:
+                row = await cur.fetchone()
+        self.user_cache.set(user_id, row)
+        return row
+
+    def user_cache_stats(self) -> dict:
+        return self.user_cache.stats()
+
     async def add_or_update_user(self, user_id: int, is_admin: bool):
         now = datetime.datetime.utcnow().isoformat()
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "INSERT OR IGNORE INTO users (user_id, is_admin, subscribed_news, created_at) VALUES (?, ?, 1, ?)",
                 (user_id, 1 if is_admin else 0, now)
             )
             await db.execute("UPDATE users SET is_admin = ? WHERE user_id = ?", (1 if is_admin else 0, user_id))
             await db.commit()
+        cached = self.user_cache.peek(user_id, MISSING)
+        if cached is None:
+            self.user_cache.set(user_id, UserProfile(True, bool(is_admin), None, None, None))
+        elif cached is not MISSING:
+            self.user_cache.set(user_id, cached._replace(is_admin=bool(is_admin)))
 
     async def set_subscription(self, user_id: int, subscribed: bool):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("UPDATE users SET subscribed_news = ? WHERE user_id = ?", (1 if subscribed else 0, user_id))
             await db.commit()
+        cached = self.user_cache.peek(user_id, MISSING)
+        if cached is not MISSING and cached is not None:
+            self.user_cache.set(user_id, cached._replace(subscribed=bool(subscribed)))
 
     async def is_subscribed(self, user_id: int) -> bool:
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT subscribed_news FROM users WHERE user_id = ?", (user_id,)) as cur:
-                row = await cur.fetchone()
-                return bool(row and row[0])
+        row = await self._get_user_row(user_id)
+        return bool(row and row.subscribed)
 
     async def set_student_profile(self, user_id: int, student_id: str, full_name: str, profile_photo: Optional[str] = None):
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "UPDATE users SET student_id = ?, full_name = ?, profile_photo = ? WHERE user_id = ?",
                 (student_id, full_name, profile_photo, user_id)
             )
             await db.commit()
+        cached = self.user_cache.peek(user_id, MISSING)
+        if cached is not MISSING and cached is not None:
+            self.user_cache.set(user_id, cached._replace(student_id=student_id, full_name=full_name,
+                                                         profile_photo=profile_photo))
+
+    async def get_profile(self, user_id: int) -> UserProfile:
+        """Cached users row; NO_PROFILE (all empty) for unknown users."""
+        return await self._get_user_row(user_id) or NO_PROFILE
 
-    async def get_student_profile(self, user_id: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
-        async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("SELECT student_id, full_name, profile_photo FROM users WHERE user_id = ?", (user_id,)) as cur:
+    async def count_segment(self, segment: "Segment") -> int:
+        """Dry run for a broadcast: how many users match the segment."""
+        where, params = segment.where()
+        query = "SELECT COUNT(*) FROM users u" + (f" WHERE {where}" if where else "")
+        async with self._connect() as db:
+            async with db.execute(query, params) as cur:
                 row = await cur.fetchone()
-                if row:
-                    return row
-                return (None, None, None)
-
-    async def get_all_user_ids(self, only_subscribed: bool = False) -> List[int]:
-        async with aiosqlite.connect(self.db_path) as db:
-            query = "SELECT user_id FROM users WHERE subscribed_news = 1" if only_subscribed else "SELECT user_id FROM users"
-            async with db.execute(query) as cur:
-                rows = await cur.fetchall()
-                return [r[0] for r in rows]
+                return row[0] if row else 0
+
+    async def iter_user_ids(self, only_subscribed: bool = False, instant_only: bool = False,
+                            after: Optional[int] = None, chunk: int = 200) -> AsyncIterator[List[int]]:
+        """Chunks of user ids in user_id order, starting after `after`. instant_only: without digest users."""
+        conditions = []
+        if only_subscribed:
+            conditions.append("u.subscribed_news = 1")
+        if instant_only:
+            conditions.append("COALESCE(u.delivery, 'instant') = 'instant'")
+        async for ids in self._iter_users(" AND ".join(conditions), [], after, chunk):
+            yield ids
+
+    async def iter_segment(self, segment: "Segment", after: Optional[int] = None,
+                           chunk: int = 200) -> AsyncIterator[List[int]]:
+        where, params = segment.where()
+        async for ids in self._iter_users(where, params, after, chunk):
+            yield ids
+
+    async def _iter_users(self, where: str, params: List, after: Optional[int], chunk: int) -> AsyncIterator[List[int]]:
+        """
+        Keyset pagination by user_id: each chunk is its own short query, and chunk[-1] is the resume key.
+        Between chunks no connection is held, so a long fanout does not block writers, and memory stays at one chunk.
+        """
+        query = ("SELECT u.user_id FROM users u WHERE u.user_id > ?" + (f" AND {where}" if where else "")
+                 + " ORDER BY u.user_id LIMIT ?")
+        last = -1 << 63 if after is None else after
+        while True:
+            async with self._connect() as db:
+                async with db.execute(query, (last, *params, chunk)) as cur:
+                    ids = [r[0] for r in await cur.fetchall()]
+            if ids:
+                yield ids
+            if len(ids) < chunk:
+                return
+            last = ids[-1]
+
+    # ---------- Activity ----------
+    async def touch_users(self, last_seen: Dict[int, str]):
+        """Batched last_seen_at update: {user_id: iso timestamp}."""
+        if not last_seen:
+            return
+        async with self._connect() as db:
+            await db.executemany(
+                "UPDATE users SET last_seen_at = ? WHERE user_id = ?",
+                [(ts, uid) for uid, ts in last_seen.items()]
+            )
+            await db.commit()
+
+    async def count_active_users(self, days: int) -> int:
+        since = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).isoformat()
+        async with self._connect() as db:
+            async with db.execute("SELECT COUNT(*) FROM users WHERE last_seen_at >= ?", (since,)) as cur:
+                row = await cur.fetchone()
+                return row[0] if row else 0
 
     # ---------- News ----------
     async def add_news(self, title: str, text: str, source: str,
                        post_url: Optional[str] = None, external_url: Optional[str] = None,
                        media_path: Optional[str] = None, source_title: Optional[str] = None):
         now = datetime.datetime.utcnow().isoformat()
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "INSERT INTO news (title, text, source, created_at, post_url, external_url, media_path, source_title) "
                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
@@ -130,10 +359,15 @@ class Storage:
 
     async def add_news_if_new(self, title: str, text: str, source: str, external_id: Optional[str],
                               post_url: Optional[str] = None, external_url: Optional[str] = None,
-                              media_path: Optional[str] = None, source_title: Optional[str] = None) -> bool:
+                              media_path: Optional[str] = None, source_title: Optional[str] = None,
+                              posted_at: Optional[float] = None, ingested_at: Optional[float] = None,
+                              simhash: Optional[int] = None, duplicate_of: Optional[int] = None) -> Optional[int]:
+        """Returns the new news id, or None if (source, external_id) was already ingested."""
         now = datetime.datetime.utcnow().isoformat()
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("BEGIN")
+        async with self._connect() as db:
+            # IMMEDIATE: сразу берём write-lock, иначе два параллельных ingest'а (SELECT → INSERT)
+            # получают взаимную блокировку и SQLite отвечает "database is locked" без ожидания
+            await db.execute("BEGIN IMMEDIATE")
             try:
                 if external_id:
                     async with db.execute(
@@ -142,39 +376,441 @@ class Storage:
                     ) as cur:
                         if await cur.fetchone():
                             await db.execute("ROLLBACK")
-                            return False
-                await db.execute(
-                    "INSERT INTO news (title, text, source, created_at, post_url, external_url, media_path, source_title) "
-                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                    (title, text, source, now, post_url, external_url, media_path, source_title)
+                            return None
+                cur = await db.execute(
+                    "INSERT INTO news (title, text, source, created_at, post_url, external_url, media_path, source_title, "
+                    "simhash, duplicate_of) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (title, text, source, now, post_url, external_url, media_path, source_title, simhash, duplicate_of)
                 )
+                news_id = cur.lastrowid
                 if external_id:
                     await db.execute(
                         "INSERT OR IGNORE INTO ingested_items (source, external_id, created_at) VALUES (?, ?, ?)",
                         (source, external_id, now)
                     )
+                if posted_at is not None:
+                    persisted_at = time.time()
+                    await db.execute(
+                        "INSERT INTO news_delivery (news_id, source, posted_at, ingest_ms, persist_ms, release) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (news_id, source, int(posted_at),
+                         _offset_ms(posted_at, ingested_at), _offset_ms(posted_at, persisted_at), self.release)
+                    )
                 await db.commit()
-                return True
+                return news_id
             except Exception:
                 await db.execute("ROLLBACK")
                 raise
 
-    async def get_latest_news(self, limit: int = 5):
-        async with aiosqlite.connect(self.db_path) as db:
+    # ---------- Fanout jobs ----------
+    async def start_fanout(self, job_id: str, kind: str, payload: str):
+        now = datetime.datetime.utcnow().isoformat()
+        async with self._connect() as db:
+            await db.execute(
+                "INSERT OR IGNORE INTO fanout_jobs (job_id, kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, payload, now, now)
+            )
+            await db.commit()
+
+    async def advance_fanout(self, job_id: str, cursor: int, sent: int, failed: int):
+        """Checkpoint after a chunk: a restart resumes after `cursor`."""
+        now = datetime.datetime.utcnow().isoformat()
+        async with self._connect() as db:
+            await db.execute(
+                "UPDATE fanout_jobs SET cursor = ?, sent = ?, failed = ?, updated_at = ? WHERE job_id = ?",
+                (cursor, sent, failed, now, job_id)
+            )
+            await db.commit()
+
+    async def finish_fanout(self, job_id: str):
+        now = datetime.datetime.utcnow().isoformat()
+        async with self._connect() as db:
+            await db.execute("UPDATE fanout_jobs SET finished_at = ?, updated_at = ? WHERE job_id = ?", (now, now, job_id))
+            await db.commit()
+
+    async def get_unfinished_fanouts(self, kinds: Tuple[str, ...]) -> List[Tuple[str, str, str, Optional[int], int, int, str]]:
+        """[(job_id, kind, payload, cursor, sent, failed, created_at)] oldest first."""
+        marks = ",".join("?" * len(kinds))
+        async with self._connect() as db:
             async with db.execute(
-                "SELECT id, title, text, source, created_at, post_url, external_url, media_path, source_title "
-                "FROM news ORDER BY id DESC LIMIT ?",
+                f"SELECT job_id, kind, payload, cursor, sent, failed, created_at FROM fanout_jobs "
+                f"WHERE finished_at IS NULL AND kind IN ({marks}) ORDER BY created_at",
+                kinds
+            ) as cur:
+                return await cur.fetchall()
+
+    async def prune_fanouts(self, days: int = 7):
+        since = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).isoformat()
+        async with self._connect() as db:
+            await db.execute("DELETE FROM fanout_jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (since,))
+            await db.commit()
+
+    # ---------- Freshness ----------
+    async def record_delivery(self, news_id: int, first_send_at: Optional[float], last_send_at: Optional[float], sent_count: int):
+        """Fanout results for a post (epoch seconds; stored as ms offsets from posted_at)."""
+        async with self._connect() as db:
+            # COALESCE: рассылка, продолженная после рестарта, не затирает время первой отправки
+            await db.execute(
+                "UPDATE news_delivery SET first_send_ms = COALESCE(first_send_ms, CAST((? - posted_at) * 1000 AS INTEGER)), "
+                "last_send_ms = CAST((? - posted_at) * 1000 AS INTEGER), sent_count = ? WHERE news_id = ?",
+                (first_send_at, last_send_at, sent_count, news_id)
+            )
+            await db.commit()
+
+    async def get_freshness_rows(self, days: int = 7, release: Optional[str] = None) -> List[Tuple]:
+        """[(source, ingest_ms, persist_ms, first_send_ms, last_send_ms, sent_count)] for posts of the last `days`."""
+        since = int(time.time() - days * 86400)
+        query = ("SELECT source, ingest_ms, persist_ms, first_send_ms, last_send_ms, sent_count "
+                 "FROM news_delivery WHERE posted_at >= ?")
+        params: list = [since]
+        if release:
+            query += " AND release = ?"
+            params.append(release)
+        async with self._connect() as db:
+            async with db.execute(query, params) as cur:
+                return await cur.fetchall()
+
+    async def get_latest_news(self, limit: int = 5) -> List[NewsItem]:
+        async with self._connect() as db:
+            db.row_factory = NewsItem.from_row
+            async with db.execute(
+                f"SELECT {NEWS_COLUMNS} FROM news n WHERE n.duplicate_of IS NULL ORDER BY n.id DESC LIMIT ?",
                 (limit,)
             ) as cur:
                 return await cur.fetchall()
 
+    # ---------- Timetable ----------
+    async def get_timetable_digests(self) -> Dict[str, str]:
+        """{group_code: digest of its imported lessons}"""
+        async with self._connect() as db:
+            async with db.execute("SELECT group_code, digest FROM timetable_groups") as cur:
+                rows = await cur.fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    async def replace_timetable_groups(self, groups: Dict[str, Tuple[str, List[Tuple]]]):
+        """
+        {group_code: (digest, [(weekday, slot, start_time, end_time, subject, teacher, room, building)])}.
+        Rows of each listed group are replaced in one transaction; other groups are untouched.
+        """
+        if not groups:
+            return
+        now = datetime.datetime.utcnow().isoformat()
+        async with self._connect() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                for group, (digest, lessons) in groups.items():
+                    await db.execute("DELETE FROM timetable_lessons WHERE group_code = ?", (group,))
+                    await db.executemany(
+                        "INSERT INTO timetable_lessons (group_code, weekday, slot, start_time, end_time, subject, teacher, room, building) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(group,) + tuple(row) for row in lessons]
+                    )
+                    await db.execute(
+                        "INSERT INTO timetable_groups (group_code, digest, lessons, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(group_code) DO UPDATE SET digest = excluded.digest, lessons = excluded.lessons, "
+                        "updated_at = excluded.updated_at",
+                        (group, digest, len(lessons), now)
+                    )
+                await db.commit()
+            except Exception:
+                await db.execute("ROLLBACK")
+                raise
+
+    async def delete_timetable_groups(self, groups: List[str]):
+        if not groups:
+            return
+        marks = ",".join("?" for _ in groups)
+        async with self._connect() as db:
+            await db.execute(f"DELETE FROM timetable_lessons WHERE group_code IN ({marks})", groups)
+            await db.execute(f"DELETE FROM timetable_groups WHERE group_code IN ({marks})", groups)
+            await db.commit()
+
+    async def get_group_lessons(self, group_code: str) -> List[Tuple]:
+        """[(weekday, slot, start_time, end_time, subject, teacher, room, building)] ordered by day and slot."""
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT weekday, slot, start_time, end_time, subject, teacher, room, building "
+                "FROM timetable_lessons WHERE group_code = ? ORDER BY weekday, slot",
+                (group_code,)
+            ) as cur:
+                return await cur.fetchall()
+
+    async def set_student_groups(self, pairs: List[Tuple[str, str]], replace: bool = False):
+        """Upsert [(student_id, group_code)]; replace=True drops students missing from `pairs`."""
+        now = datetime.datetime.utcnow().isoformat()
+        async with self._connect() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            try:
+                if replace:
+                    await db.execute("DELETE FROM student_groups")
+                await db.executemany(
+                    "INSERT INTO student_groups (student_id, group_code, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(student_id) DO UPDATE SET group_code = excluded.group_code, updated_at = excluded.updated_at",
+                    [(sid, group, now) for sid, group in pairs]
+                )
+                await db.commit()
+            except Exception:
+                await db.execute("ROLLBACK")
+                raise
+
+    async def get_student_groups(self) -> Dict[str, str]:
+        """{student_id: group_code}"""
+        async with self._connect() as db:
+            async with db.execute("SELECT student_id, group_code FROM student_groups") as cur:
+                rows = await cur.fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    async def get_timetable_stats(self) -> Tuple[int, int, int]:
+        """(groups, lessons, linked students)"""
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT (SELECT COUNT(*) FROM timetable_groups), (SELECT COUNT(*) FROM timetable_lessons), "
+                "(SELECT COUNT(*) FROM student_groups)"
+            ) as cur:
+                row = await cur.fetchone()
+        return row[0], row[1], row[2]
+
+    # ---------- Digest delivery ----------
+    async def set_delivery(self, user_id: int, mode: str, next_at: Optional[float] = None):
+        async with self._connect() as db:
+            await db.execute(
+                "UPDATE users SET delivery = ?, digest_next_at = ? WHERE user_id = ?",
+                (mode, int(next_at) if next_at is not None else None, user_id)
+            )
+            await db.commit()
+
+    async def get_delivery(self, user_id: int) -> str:
+        async with self._connect() as db:
+            async with db.execute("SELECT delivery FROM users WHERE user_id = ?", (user_id,)) as cur:
+                row = await cur.fetchone()
+        return (row and row[0]) or "instant"
+
+    async def iter_digest_recipients(self, source: str, after: Optional[int] = None,
+                                     chunk: int = 200) -> AsyncIterator[List[Tuple[int, bool, List[str]]]]:
+        """
+        Subscribed hourly/daily users in user_id chunks: [(user_id, mutes `source`, keywords)].
+        Mute flag and keyword list come with the chunk, so filtering needs no per-user queries.
+        """
+        query = (
+            "SELECT u.user_id, "
+            "EXISTS (SELECT 1 FROM user_muted_sources m WHERE m.user_id = u.user_id AND m.source = ?), "
+            "(SELECT group_concat(k.keyword, char(31)) FROM user_keywords k WHERE k.user_id = u.user_id) "
+            "FROM users u INDEXED BY idx_users_digest "
+            "WHERE u.delivery != 'instant' AND u.user_id > ? AND u.subscribed_news = 1 "
+            "ORDER BY u.user_id LIMIT ?"
+        )
+        last = -1 << 63 if after is None else after
+        src = (source or "").lower()
+        while True:
+            async with self._connect() as db:
+                async with db.execute(query, (src, last, chunk)) as cur:
+                    rows = await cur.fetchall()
+            if rows:
+                yield [(uid, bool(muted), kws.split("\x1f") if kws else []) for uid, muted, kws in rows]
+            if len(rows) < chunk:
+                return
+            last = rows[-1][0]
+
+    async def enqueue_digest(self, news_id: int, user_ids: List[int]):
+        if not user_ids:
+            return
+        now = datetime.datetime.utcnow().isoformat()
+        async with self._connect() as db:
+            await db.executemany(
+                "INSERT OR IGNORE INTO digest_queue (user_id, news_id, created_at) VALUES (?, ?, ?)",
+                [(uid, news_id, now) for uid in user_ids]
+            )
+            await db.commit()
+
+    async def get_due_digest_users(self, now: float, limit: int = 200) -> List[Tuple[int, str]]:
+        """[(user_id, delivery)] whose digest_next_at has passed, earliest first."""
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT user_id, delivery FROM users WHERE delivery != 'instant' AND digest_next_at <= ? "
+                "ORDER BY digest_next_at LIMIT ?",
+                (int(now), limit)
+            ) as cur:
+                return await cur.fetchall()
+
+    async def get_digest_items(self, user_id: int, limit: int = 30) -> Tuple[int, int, List[NewsItem]]:
+        """(queued count, max queued news_id, newest `limit` posts without text)."""
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT COUNT(*), MAX(news_id) FROM digest_queue WHERE user_id = ?", (user_id,)
+            ) as cur:
+                total, max_id = await cur.fetchone()
+            if not total:
+                return 0, 0, []
+            db.row_factory = NewsItem.from_row
+            async with db.execute(
+                "SELECT n.id, n.title, NULL, n.source, n.created_at, n.post_url, n.external_url, NULL, n.source_title "
+                "FROM digest_queue q JOIN news n ON n.id = q.news_id WHERE q.user_id = ? "
+                "ORDER BY q.news_id DESC LIMIT ?",
+                (user_id, limit)
+            ) as cur:
+                rows = await cur.fetchall()
+        return total, max_id, rows
+
+    async def finish_digest(self, user_id: int, upto_news_id: int, next_at: Optional[float]):
+        """Drop sent items (news_id <= upto) and schedule the next digest in one transaction."""
+        async with self._connect() as db:
+            await db.execute("DELETE FROM digest_queue WHERE user_id = ? AND news_id <= ?", (user_id, upto_news_id))
+            await db.execute(
+                "UPDATE users SET digest_next_at = ? WHERE user_id = ?",
+                (int(next_at) if next_at is not None else None, user_id)
+            )
+            await db.commit()
+
+    async def count_digest_queue(self) -> Tuple[int, int]:
+        """(queued items, users with a non-empty queue)"""
+        async with self._connect() as db:
+            async with db.execute("SELECT COUNT(*), COUNT(DISTINCT user_id) FROM digest_queue") as cur:
+                row = await cur.fetchone()
+        return row[0], row[1]
+
+    # ---------- Reminders ----------
+    async def set_reminders(self, user_id: int, enabled: bool):
+        async with self._connect() as db:
+            await db.execute("UPDATE users SET reminders = ? WHERE user_id = ?", (1 if enabled else 0, user_id))
+            await db.commit()
+
+    async def get_reminders(self, user_id: int) -> bool:
+        async with self._connect() as db:
+            async with db.execute("SELECT reminders FROM users WHERE user_id = ?", (user_id,)) as cur:
+                row = await cur.fetchone()
+        return bool(row and row[0])
+
+    async def get_reminder_subscribers(self, user_id: Optional[int] = None) -> List[Tuple[int, str]]:
+        """[(user_id, group_code)] for users with reminders on and a student_id linked to a group."""
+        query = ("SELECT u.user_id, sg.group_code FROM users u JOIN student_groups sg ON sg.student_id = u.student_id "
+                 "WHERE u.reminders = 1")
+        params: tuple = ()
+        if user_id is not None:
+            query += " AND u.user_id = ?"
+            params = (user_id,)
+        async with self._connect() as db:
+            async with db.execute(query, params) as cur:
+                return await cur.fetchall()
+
+    async def claim_reminder(self, group_code: str, slot_at: int) -> bool:
+        """True if this (group, lecture start) has not been sent yet — by this or a previous process."""
+        now = datetime.datetime.utcnow().isoformat()
+        async with self._connect() as db:
+            cur = await db.execute(
+                "INSERT OR IGNORE INTO reminder_log (group_code, slot_at, created_at) VALUES (?, ?, ?)",
+                (group_code, slot_at, now)
+            )
+            await db.commit()
+            return cur.rowcount == 1
+
+    async def finish_reminder(self, group_code: str, slot_at: int, sent_count: int):
+        async with self._connect() as db:
+            await db.execute(
+                "UPDATE reminder_log SET sent_count = ? WHERE group_code = ? AND slot_at = ?",
+                (sent_count, group_code, slot_at)
+            )
+            await db.commit()
+
+    async def prune_reminder_log(self, before: float):
+        async with self._connect() as db:
+            await db.execute("DELETE FROM reminder_log WHERE slot_at < ?", (int(before),))
+            await db.commit()
+
+    async def get_recent_fingerprints(self, since_iso: str, limit: int) -> List[Tuple[int, int, str, str]]:
+        """[(id, simhash, source, created_at)] of original (non-duplicate) posts since `since_iso`, newest first."""
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT id, simhash, source, created_at FROM news "
+                "WHERE simhash IS NOT NULL AND duplicate_of IS NULL AND created_at >= ? ORDER BY id DESC LIMIT ?",
+                (since_iso, limit)
+            ) as cur:
+                return await cur.fetchall()
+
+    async def count_duplicates(self, days: int = 7) -> Dict[str, int]:
+        """{source: near-duplicate posts suppressed in the last `days`}"""
+        since = (datetime.datetime.utcnow() - datetime.timedelta(days=days)).isoformat()
+        async with self._connect() as db:
+            async with db.execute(
+                "SELECT source, COUNT(*) FROM news WHERE duplicate_of IS NOT NULL AND created_at >= ? GROUP BY source",
+                (since,)
+            ) as cur:
+                rows = await cur.fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    # ---------- Channel registry ----------
+    async def sync_channels(self, seed: List[str]) -> List[str]:
+        """Add channels from config (keeps ones disabled via /rmsource disabled); returns enabled channels."""
+        now = datetime.datetime.utcnow().isoformat()
+        async with self._connect() as db:
+            await db.executemany(
+                "INSERT OR IGNORE INTO channels (username, enabled, created_at) VALUES (?, 1, ?)",
+                [(c.strip().lstrip("@").lower(), now) for c in seed if c.strip()]
+            )
+            await db.commit()
+            async with db.execute("SELECT username FROM channels WHERE enabled = 1 ORDER BY created_at, username") as cur:
+                rows = await cur.fetchall()
+                return [r[0] for r in rows]
+
+    async def set_channel_enabled(self, username: str, enabled: bool, added_by: Optional[int] = None):
+        now = datetime.datetime.utcnow().isoformat()
+        src = username.strip().lstrip("@").lower()
+        async with self._connect() as db:
+            await db.execute(
+                "INSERT INTO channels (username, enabled, added_by, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET enabled = excluded.enabled",
+                (src, 1 if enabled else 0, added_by, now)
+            )
+            await db.commit()
+
+    async def get_source_stats(self) -> Dict[str, Tuple[int, Optional[str]]]:
+        """{source: (posts ingested, last created_at)}"""
+        async with self._connect() as db:
+            async with db.execute("SELECT source, COUNT(*), MAX(created_at) FROM news GROUP BY source") as cur:
+                rows = await cur.fetchall()
+        return {r[0]: (r[1], r[2]) for r in rows}
+
+    # ---------- Channel entities (Telethon cache) ----------
+    async def get_channel_entities(self, usernames: List[str]) -> Dict[str, Tuple[int, int, Optional[str], bool]]:
+        """{username: (channel_id, access_hash, title, joined)} for known channels."""
+        names = [u.lower() for u in usernames]
+        if not names:
+            return {}
+        marks = ",".join("?" for _ in names)
+        async with self._connect() as db:
+            async with db.execute(
+                f"SELECT username, channel_id, access_hash, title, joined FROM channel_entities WHERE username IN ({marks})",
+                names
+            ) as cur:
+                rows = await cur.fetchall()
+        return {r[0]: (r[1], r[2], r[3], bool(r[4])) for r in rows}
+
+    async def save_channel_entities(self, entities: List[Tuple[str, int, int, Optional[str], bool]]):
+        """Upsert [(username, channel_id, access_hash, title, joined)]."""
+        if not entities:
+            return
+        now = datetime.datetime.utcnow().isoformat()
+        async with self._connect() as db:
+            await db.executemany(
+                "INSERT INTO channel_entities (username, channel_id, access_hash, title, joined, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(username) DO UPDATE SET channel_id = excluded.channel_id, access_hash = excluded.access_hash, "
+                "title = excluded.title, joined = excluded.joined, updated_at = excluded.updated_at",
+                [(u.lower(), cid, ah, title, 1 if joined else 0, now) for u, cid, ah, title, joined in entities]
+            )
+            await db.commit()
+
+    async def forget_channel_entity(self, username: str):
+        async with self._connect() as db:
+            await db.execute("DELETE FROM channel_entities WHERE username = ?", (username.lower(),))
+            await db.commit()
+
     # ---------- Filters ----------
     async def add_keyword(self, user_id: int, keyword: str):
         now = datetime.datetime.utcnow().isoformat()
         kw = (keyword or "").strip().lower()
         if not kw:
             return
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "INSERT OR IGNORE INTO user_keywords (user_id, keyword, created_at) VALUES (?, ?, ?)",
                 (user_id, kw, now)
@@ -183,12 +819,12 @@ class Storage:
 
     async def remove_keyword(self, user_id: int, keyword: str):
         kw = (keyword or "").strip().lower()
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("DELETE FROM user_keywords WHERE user_id = ? AND keyword = ?", (user_id, kw))
             await db.commit()
 
     async def list_keywords(self, user_id: int) -> List[str]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute("SELECT keyword FROM user_keywords WHERE user_id = ? ORDER BY keyword", (user_id,)) as cur:
                 rows = await cur.fetchall()
                 return [r[0] for r in rows]
@@ -198,7 +834,7 @@ class Storage:
         src = (source or "").strip().lower().lstrip("@")
         if not src:
             return
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute(
                 "INSERT OR IGNORE INTO user_muted_sources (user_id, source, created_at) VALUES (?, ?, ?)",
                 (user_id, src, now)
@@ -207,15 +843,15 @@ class Storage:
 
     async def unmute_source(self, user_id: int, source: str):
         src = (source or "").strip().lower().lstrip("@")
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             await db.execute("DELETE FROM user_muted_sources WHERE user_id = ? AND source = ?", (user_id, src))
             await db.commit()
 
     async def list_muted_sources(self, user_id: int) -> List[str]:
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._connect() as db:
             async with db.execute("SELECT source FROM user_muted_sources WHERE user_id = ? ORDER BY source", (user_id,)) as cur:
                 rows = await cur.fetchall()
                 return [r[0] for r in rows]
 
     async def db(self):
-        return await aiosqlite.connect(self.db_path)
\ No newline at end of file
+        return await self._connect()
\ No newline at end of file
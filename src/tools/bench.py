@@ -0,0 +1,538 @@
+"""
+Бенчмарки горячих путей бота. Всё локально: временная SQLite-база, Bot API — заглушка без сети
+(запрос сериализуется и ответ парсится так же, как в AiohttpSession).
+
+    python -m src.tools.bench                          # все кейсы, результат в data/bench/<release>.json
+    python -m src.tools.bench --only text,latest --quick
+    python -m src.tools.bench --corpus posts.jsonl     # корпус постов: JSONL с полем "text"
+    python -m src.tools.bench --db data/bot.db         # корпус из таблицы news рабочей базы
+    python -m src.tools.bench --compare data/bench/prev.json   # сравнить с прошлым прогоном (exit 1 при регрессии)
+
+Кейсы: text (md_to_html / clip_for_caption), allows (фильтр рассылки user_allows на 1k/10k/100k пользователей),
+insert (add_news_if_new), latest (get_latest_news на 1M строк), broadcast (send_message через заглушку),
+notify (Notifier.notify_new_item целиком), timetable (импорт/реимпорт расписания и выдача дня студенту),
+neardup (точность/полнота SimHash+LSH на репостах корпуса при разных порогах, скорость отпечатка и поиска),
+rows (память и время выборки 100k строк news/users: кортежи против NewsItem/UserProfile).
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, SendMessage, SendPhoto, TelegramMethod
+from aiogram.types import User
+
+from src.rows import NEWS_COLUMNS, NewsItem, UserProfile
+from src.services.news_fetcher import SYNTH_WORDS, synth_corpus
+from src.services.notifier import Notifier
+from src.services.near_dup import NearDuplicateDetector
+from src.services.timetable import WEEKDAYS, Lesson, Timetable
+from src.storage import Storage
+from src.utils.stats import summarize
+from src.utils.simhash import features, hamming, simhash, tokens
+from src.utils.text import clip_for_caption, md_to_html
+
+CASES = ("text", "allows", "insert", "latest", "broadcast", "notify", "timetable", "neardup", "rows")
+
+
+# ---------- Bot API stub ----------
+class EchoSession(BaseSession):
+    """Отвечает на sendMessage/sendPhoto валидным Message; сериализация и парсинг — как у настоящей сессии."""
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+
+    async def close(self):
+        pass
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        self.requests += 1
+        files: dict = {}
+        payload = {k: self.prepare_value(v, bot=bot, files=files) for k, v in method.model_dump(warnings=False).items()}
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="bench", username="bench_bot")
+        if isinstance(method, (SendMessage, SendPhoto)):
+            result = {
+                "message_id": self.requests,
+                "date": int(time.time()),
+                "chat": {"id": int(payload["chat_id"]), "type": "private"},
+                "text": payload.get("text") or payload.get("caption") or "",
+            }
+            content = json.dumps({"ok": True, "result": result})
+            return self.check_response(bot=bot, method=method, status_code=200, content=content).result
+        return True
+
+    async def stream_content(self, url: str, headers: Optional[dict] = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+# ---------- corpus ----------
+def synth_posts(n: int, seed: int = 42) -> List[str]:
+    # тот же генератор, что у DemoNewsFetcher, — soak и bench идут на одном корпусе
+    return [p.text for p in synth_corpus(n, ("bench_channel",), seed=seed)]
+
+
+def load_corpus(path: Optional[str], db: Optional[str], n: int) -> tuple[List[str], str]:
+    if path:
+        with open(path, encoding="utf-8") as f:
+            texts = [json.loads(line).get("text", "") for line in f if line.strip()]
+        return [t for t in texts if t][:n] or synth_posts(n), path
+    if db and os.path.exists(db):
+        with sqlite3.connect(db) as conn:
+            texts = [r[0] for r in conn.execute("SELECT text FROM news WHERE text != '' ORDER BY id DESC LIMIT ?", (n,))]
+        if texts:
+            return texts, db
+    return synth_posts(n), "synthetic"
+
+
+# ---------- helpers ----------
+def _lat(samples: List[float], unit: float = 1000.0, suffix: str = "ms") -> Dict[str, float]:
+    pct = summarize(samples)
+    return {f"{k}_{suffix}": round(v * unit, 3) for k, v in pct.items() if k != "n" and v is not None}
+
+
+def _populate_users(db_path: str, n: int, seed: int = 1):
+    """n пользователей; ~20% с ключевыми словами, ~10% с заглушёнными источниками."""
+    rnd = random.Random(seed)
+    now = datetime.datetime.utcnow().isoformat()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM users")
+        conn.execute("DELETE FROM user_keywords")
+        conn.execute("DELETE FROM user_muted_sources")
+        conn.executemany(
+            "INSERT INTO users (user_id, is_admin, subscribed_news, created_at) VALUES (?, 0, 1, ?)",
+            ((10_000 + i, now) for i in range(n))
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO user_keywords (user_id, keyword, created_at) VALUES (?, ?, ?)",
+            ((10_000 + i, rnd.choice(SYNTH_WORDS), now) for i in range(n) if rnd.random() < 0.2)
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO user_muted_sources (user_id, source, created_at) VALUES (?, ?, ?)",
+            ((10_000 + i, "bench_channel", now) for i in range(n) if rnd.random() < 0.1)
+        )
+
+
+def _populate_news(db_path: str, n: int):
+    now = datetime.datetime.utcnow().isoformat()
+    body = synth_posts(1)[0]
+    with sqlite3.connect(db_path) as conn:
+        have = conn.execute("SELECT COUNT(*) FROM news").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO news (title, text, source, created_at) VALUES (?, ?, ?, ?)",
+            ((f"post {i}", body, f"ch{i % 20}", now) for i in range(have, n))
+        )
+
+
+# ---------- cases ----------
+def bench_text(corpus: List[str], rounds: int = 3) -> Dict[str, Any]:
+    res: Dict[str, Any] = {"posts": len(corpus), "avg_chars": round(sum(map(len, corpus)) / max(1, len(corpus)))}
+    rendered = [md_to_html(t) for t in corpus]
+    for name, fn, inputs in (("md_to_html", md_to_html, corpus), ("clip_for_caption", clip_for_caption, rendered)):
+        samples = []
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for text in inputs:
+                t0 = time.perf_counter()
+                fn(text)
+                samples.append(time.perf_counter() - t0)
+        total = time.perf_counter() - started
+        res[name] = {"per_s": round(len(samples) / total, 1), **_lat(samples, 1e6, "us")}
+    return res
+
+
+async def bench_allows(storage: Storage, sizes: List[int]) -> Dict[str, Any]:
+    notifier = Notifier(Bot("1:bench", session=EchoSession()), storage, admin_ids=set())
+    title, text = "Расписание", synth_posts(1, seed=7)[0]
+    res: Dict[str, Any] = {}
+    for n in sizes:
+        _populate_users(storage.db_path, n)
+        started = time.perf_counter()
+        t_first: Optional[float] = None
+        allowed = 0
+        # как Notifier._deliver: получатели порциями по keyset, фильтры на каждого
+        async for chunk in storage.iter_user_ids(only_subscribed=True, instant_only=True, chunk=notifier.chunk):
+            if t_first is None:
+                t_first = time.perf_counter() - started
+            for uid in chunk:
+                allowed += await notifier.user_allows(uid, "bench_channel", title, text)
+        total = time.perf_counter() - started
+        res[str(n)] = {
+            "total_s": round(total, 3),
+            "first_chunk_ms": round((t_first or 0.0) * 1000, 2),
+            "per_user_us": round(total / max(1, n) * 1e6, 1),
+            "users_per_s": round(n / total, 1),
+            "allowed": allowed,
+        }
+    return res
+
+
+async def bench_insert(storage: Storage, n: int) -> Dict[str, Any]:
+    corpus = synth_posts(50, seed=3)
+    samples = []
+    started = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        await storage.add_news_if_new(f"post {i}", corpus[i % len(corpus)], "bench_channel", f"bench:{i}",
+                                      posted_at=time.time(), ingested_at=time.time())
+        samples.append(time.perf_counter() - t0)
+    total = time.perf_counter() - started
+    # повторная вставка — путь дедупликации
+    t0 = time.perf_counter()
+    for i in range(min(n, 500)):
+        await storage.add_news_if_new(f"post {i}", "", "bench_channel", f"bench:{i}")
+    dup = time.perf_counter() - t0
+    return {"inserts": n, "per_s": round(n / total, 1), **_lat(samples),
+            "duplicate_per_s": round(min(n, 500) / dup, 1)}
+
+
+async def bench_latest(storage: Storage, rows: int, calls: int = 200) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    _populate_news(storage.db_path, rows)
+    setup = time.perf_counter() - t0
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        await storage.get_latest_news(5)
+        samples.append(time.perf_counter() - t0)
+    return {"rows": rows, "calls": calls, "setup_s": round(setup, 1), **_lat(samples)}
+
+
+async def bench_broadcast(n: int, corpus: List[str]) -> Dict[str, Any]:
+    bot = Bot("1:bench", session=EchoSession())
+    body = md_to_html(corpus[0])
+    started = time.perf_counter()
+    for i in range(n):
+        await bot.send_message(10_000 + i, body, disable_web_page_preview=False)
+    total = time.perf_counter() - started
+    return {"messages": n, "per_s": round(n / total, 1), "per_msg_us": round(total / n * 1e6, 1)}
+
+
+async def bench_notify(storage: Storage, users: int, corpus: List[str]) -> Dict[str, Any]:
+    _populate_users(storage.db_path, users)
+    session = EchoSession()
+    notifier = Notifier(Bot("1:bench", session=session), storage, admin_ids=set(), send_delay=0)
+    started = time.perf_counter()
+    await notifier.notify_new_item("Bench", corpus[0], "bench_channel", "https://t.me/bench_channel/1", None, None)
+    total = time.perf_counter() - started
+    return {"users": users, "sent": session.requests, "total_s": round(total, 3),
+            "per_s": round(session.requests / total, 1) if total else None}
+
+
+def synth_timetable(groups: int, seed: int = 5) -> List[Lesson]:
+    rnd = random.Random(seed)
+    times = (("09:00", "10:30"), ("10:40", "12:10"), ("12:40", "14:10"), ("14:20", "15:50"))
+    lessons = []
+    for g in range(groups):
+        for day in range(6):
+            for slot in sorted(rnd.sample(range(4), rnd.randint(1, 4))):
+                lessons.append(Lesson(f"G{g:04d}", day, slot + 1, *times[slot], f"CS{rnd.randint(100, 499)} Course",
+                                      f"Teacher {rnd.randint(1, 300)}", f"B{rnd.randint(1, 4)}.{rnd.randint(1, 9)}", "B"))
+    return lessons
+
+
+async def bench_timetable(storage: Storage, groups: int, students: int, taps: int = 20_000) -> Dict[str, Any]:
+    timetable = Timetable(storage)
+    await timetable.load()
+    lessons = synth_timetable(groups)
+    t0 = time.perf_counter()
+    await timetable.import_lessons(lessons)
+    full = time.perf_counter() - t0
+    await timetable.import_students([(f"P{1_000_000 + i}", f"G{i % groups:04d}") for i in range(students)])
+    # реимпорт без изменений и с одной изменённой группой
+    t0 = time.perf_counter()
+    unchanged = await timetable.import_lessons(lessons)
+    t_same = time.perf_counter() - t0
+    edited = [Lesson(x.group, x.weekday, x.slot, x.start, x.end, x.subject + " (moved)", x.teacher, x.room, x.building)
+              if x.group == "G0000" else x for x in lessons]
+    t0 = time.perf_counter()
+    await timetable.import_lessons(edited)
+    t_one = time.perf_counter() - t0
+
+    rnd = random.Random(9)
+    cold, warm = [], []
+    for _ in range(taps):
+        sid = f"P{1_000_000 + rnd.randrange(students)}"
+        day = rnd.choice(WEEKDAYS[:6])
+        t0 = time.perf_counter()
+        group = timetable.group_for(sid)
+        first = group not in timetable._rendered_groups
+        await timetable.render(group, day)
+        (cold if first else warm).append(time.perf_counter() - t0)
+    return {
+        "groups": groups, "students": students, "lessons": len(lessons),
+        "import_s": round(full, 3),
+        "reimport_unchanged_ms": round(t_same * 1000, 2), "unchanged_groups": unchanged["unchanged"],
+        "reimport_one_group_ms": round(t_one * 1000, 2),
+        "tap_cold": _lat(cold, 1e6, "us"),
+        "tap_warm": {**_lat(warm, 1e6, "us"), "per_s": round(len(warm) / max(sum(warm), 1e-9), 1)},
+    }
+
+
+def synth_news(n: int, seed: int = 13) -> List[str]:
+    """Посты с реалистичным словарём (Zipf по 5000 псевдослов) — у synth_posts словарь слишком мал для near-dup."""
+    rnd = random.Random(seed)
+    syllables = ["ка", "ро", "ми", "те", "на", "ус", "ли", "бер", "ден", "то", "ва", "сти", "пре", "ор", "ган"]
+    vocab = ["".join(rnd.choice(syllables) for _ in range(rnd.randint(2, 4))) for _ in range(5000)]
+    weights = [1 / (i + 1) for i in range(len(vocab))]
+    posts = []
+    for _ in range(n):
+        sentences = [" ".join(rnd.choices(vocab, weights, k=rnd.randint(6, 18))) + "." for _ in range(rnd.randint(2, 8))]
+        posts.append(" ".join(sentences))
+    return posts
+
+
+def _repost(text: str, rnd: random.Random) -> str:
+    """Как репостит другой канал: своя шапка/подпись, без ссылок, пара правок, иногда без последнего абзаца."""
+    words = text.split()
+    for _ in range(rnd.randint(0, 2)):
+        if len(words) > 10:
+            words[rnd.randrange(len(words))] = rnd.choice(("важно", "срочно", "сегодня", "студентам"))
+    if rnd.random() < 0.3 and len(words) > 40:
+        words = words[: int(len(words) * 0.85)]
+    head = rnd.choice(("", "⚡️ Новости:", "Репост от коллег", "📢"))
+    tail = rnd.choice(("", "Подписывайтесь на @uni_news", "Источник: https://t.me/other/1", "#новости #университет"))
+    return " ".join(p for p in (head, " ".join(words), tail) if p)
+
+
+def bench_neardup(corpus: List[str], bands: int = 8, ks=(3, 5, 7, 8, 10, 12)) -> Dict[str, Any]:
+    rnd = random.Random(11)
+    posts = [t for t in corpus if len(tokens(t)) >= 8]
+    half = len(posts) // 2
+    originals, unrelated = posts[:half], posts[half:]
+    reposts = [_repost(t, rnd) for t in originals]
+
+    started = time.perf_counter()
+    fps = [simhash(features(tokens(t))) for t in originals]
+    fp_rate = len(fps) / (time.perf_counter() - started)
+    repost_fps = [simhash(features(tokens(t))) for t in reposts]
+    unrelated_fps = [simhash(features(tokens(t))) for t in unrelated]
+    dist_pos = [hamming(a, b) for a, b in zip(fps, repost_fps)]
+
+    res: Dict[str, Any] = {
+        "posts": len(posts), "bands": bands, "fingerprint_per_s": round(fp_rate, 1),
+        "repost_distance": {k: v for k, v in summarize(dist_pos).items() if k != "n"},
+    }
+    for k in ks:
+        det = NearDuplicateDetector(max_distance=k, bands=bands, min_tokens=0, max_entries=len(fps) + 1)
+        for i, fp in enumerate(fps):
+            det._add(fp, "a", 0.0, news_id=i)
+        correct = wrong = 0
+        samples = []
+        for i, fp in enumerate(repost_fps):
+            t0 = time.perf_counter()
+            m = det.match(fp)
+            samples.append(time.perf_counter() - t0)
+            if m is not None:
+                if m.news_id == i:
+                    correct += 1
+                else:
+                    wrong += 1
+        false_hits = sum(det.match(fp) is not None for fp in unrelated_fps)
+        exact = sum(d <= k for d in dist_pos)
+        res[f"k{k}"] = {
+            "recall": round(correct / max(1, len(repost_fps)), 4),
+            # доля пар в пределах порога, которые LSH-индекс действительно нашёл (при bands > k — 1.0)
+            "lsh_recall": round(correct / max(1, exact), 4),
+            "precision": round(correct / max(1, correct + wrong + false_hits), 4),
+            "false_positive_rate": round(false_hits / max(1, len(unrelated_fps)), 4),
+            **_lat(samples, 1e6, "us"),
+        }
+    return res
+
+
+async def _fetch_rows(storage: Storage, query: str, factory: Optional[Callable]) -> List:
+    async with storage._connect() as db:
+        if factory:
+            db.row_factory = factory
+        async with db.execute(query) as cur:
+            return await cur.fetchall()
+
+
+async def _measure_rows(storage: Storage, query: str, factory: Optional[Callable], n: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    rows = await _fetch_rows(storage, query, factory)
+    fetch_s = time.perf_counter() - started
+    del rows
+    # память — отдельным прогоном: tracemalloc замедляет выборку
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    rows = await _fetch_rows(storage, query, factory)
+    held = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    assert len(rows) == n
+    return {"fetch_s": round(fetch_s, 3), "held_bytes": held, "per_row_bytes": round(held / max(1, n))}
+
+
+async def bench_rows(storage: Storage, corpus: List[str], n: int) -> Dict[str, Any]:
+    """Память выборки n строк, удерживаемой в Python (кэш, пачка рассылки): кортежи против типизированных строк."""
+    now = datetime.datetime.utcnow().isoformat()
+    with sqlite3.connect(storage.db_path) as conn:
+        conn.execute("DELETE FROM news")
+        conn.executemany(
+            "INSERT INTO news (title, text, source, created_at, post_url, source_title) VALUES (?, ?, ?, ?, ?, ?)",
+            ((f"post {i}", corpus[i % len(corpus)], f"ch{i % 20}", now, f"https://t.me/ch{i % 20}/{i}", f"Channel {i % 20}")
+             for i in range(n))
+        )
+    _populate_users(storage.db_path, n)
+    with sqlite3.connect(storage.db_path) as conn:
+        conn.execute("UPDATE users SET student_id = 'P' || (1000000 + user_id), full_name = 'Student ' || user_id")
+
+    plain_news = ("SELECT n.id, n.title, n.text, n.source, n.created_at, n.post_url, n.external_url, n.media_path, "
+                  "n.source_title FROM news n")
+    users = "SELECT subscribed_news, is_admin, student_id, full_name, profile_photo FROM users"
+
+    def user_tuple(_cursor, r):
+        # прежний кэш строки пользователя
+        return bool(r[0]), bool(r[1]), r[2], r[3], r[4]
+
+    res: Dict[str, Any] = {
+        "rows": n,
+        "news_tuple": await _measure_rows(storage, plain_news, None, n),
+        "news_item": await _measure_rows(storage, f"SELECT {NEWS_COLUMNS} FROM news n", NewsItem.from_row, n),
+        "user_tuple": await _measure_rows(storage, users, user_tuple, n),
+        "user_profile": await _measure_rows(storage, users, UserProfile.from_row, n),
+    }
+    res["news_saved_pct"] = round(100 * (1 - res["news_item"]["held_bytes"] / res["news_tuple"]["held_bytes"]), 1)
+    with sqlite3.connect(storage.db_path) as conn:
+        conn.execute("DELETE FROM news")
+    return res
+
+
+# ---------- compare ----------
+def _flatten(d: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else k
+        if isinstance(v, dict):
+            out.update(_flatten(v, key))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def _higher_is_better(key: str) -> Optional[bool]:
+    last = key.rsplit(".", 1)[-1]
+    if last.endswith("per_s"):
+        return True
+    if last.endswith(("_ms", "_us", "_s", "_bytes")) and last != "setup_s":
+        return False
+    return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    cur, base = _flatten(current["results"]), _flatten(baseline["results"])
+    regressions = []
+    print(f"\nvs {baseline.get('meta', {}).get('label', '?')} (tolerance {tolerance:.0%}):")
+    for key in sorted(cur.keys() & base.keys()):
+        better_up = _higher_is_better(key)
+        if better_up is None or not base[key]:
+            continue
+        change = (cur[key] - base[key]) / base[key]
+        worse = -change if better_up else change
+        mark = "REGRESSION" if worse > tolerance else ""
+        print(f"  {key:<45} {base[key]:>12.3f} -> {cur[key]:>12.3f}  {change:+7.1%} {mark}")
+        if mark:
+            regressions.append(key)
+    return regressions
+
+
+# ---------- main ----------
+async def run(args) -> Dict[str, Any]:
+    only = set(args.only.split(",")) if args.only else set(CASES)
+    scale = 10 if args.quick else 1
+    sizes = [max(1, int(x) // scale) for x in args.users.split(",")]
+    corpus, corpus_src = load_corpus(args.corpus, args.db, args.posts)
+    results: Dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Storage(os.path.join(tmp, "bench.db"), user_cache_size=0)
+        await storage.init()
+
+        def step(name: str) -> bool:
+            if name in only:
+                print(f"[bench] {name}…", flush=True)
+                return True
+            return False
+
+        if step("text"):
+            results["text"] = bench_text(corpus)
+        if step("allows"):
+            results["allows"] = await bench_allows(storage, sizes)
+        if step("insert"):
+            results["insert"] = await bench_insert(storage, args.inserts // scale)
+        if step("latest"):
+            results["latest"] = await bench_latest(storage, args.news_rows // scale)
+        if step("broadcast"):
+            results["broadcast"] = await bench_broadcast(args.messages // scale, corpus)
+        if step("notify"):
+            results["notify"] = await bench_notify(storage, sizes[0], corpus)
+        if step("timetable"):
+            results["timetable"] = await bench_timetable(storage, max(1, 500 // scale), max(1, 20_000 // scale))
+        if step("neardup"):
+            texts = corpus if corpus_src != "synthetic" else synth_news(max(200, 4000 // scale))
+            results["neardup"] = bench_neardup(texts)
+        if step("rows"):
+            results["rows"] = await bench_rows(storage, corpus, 100_000 // scale)
+
+    label = args.label or os.getenv("RELEASE") or datetime.datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    return {
+        "meta": {
+            "label": label,
+            "at": datetime.datetime.utcnow().isoformat(),
+            "python": sys.version.split()[0],
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "corpus": corpus_src,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the bot's hot paths")
+    parser.add_argument("--only", help=f"comma-separated subset of: {','.join(CASES)}")
+    parser.add_argument("--quick", action="store_true", help="10x smaller sizes")
+    parser.add_argument("--users", default="1000,10000,100000")
+    parser.add_argument("--posts", type=int, default=500, help="corpus size for text benchmarks")
+    parser.add_argument("--inserts", type=int, default=5000)
+    parser.add_argument("--news-rows", type=int, default=1_000_000)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--corpus", help="JSONL with real posts ({\"text\": ...} per line)")
+    parser.add_argument("--db", help="take the corpus from this bot database (news.text)")
+    parser.add_argument("--label", help="run label (default: RELEASE or timestamp)")
+    parser.add_argument("--out", help="output JSON (default: data/bench/<label>.json)")
+    parser.add_argument("--compare", help="previous result JSON to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    out = args.out or os.path.join("data", "bench", f"{report['meta']['label']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report["results"], ensure_ascii=False, indent=2))
+    print(f"\nSaved to {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
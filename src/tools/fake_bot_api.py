@@ -0,0 +1,331 @@
+"""
+Локальная замена api.telegram.org для нагрузочных и отказных тестов (без сети).
+
+    python -m src.tools.fake_bot_api --port 8081 --latency-ms 40 --jitter-ms 20 \\
+        --rate-429 0.01 --blocked 0.05 --chat-rate 1/1 --global-rate 30/1
+
+Бот направляется сюда через BOT_API_URL=http://127.0.0.1:8081 (см. src/config.py).
+
+Методы: getMe, sendMessage, sendPhoto, sendMediaGroup, getUpdates, getFile, deleteWebhook, setWebhook;
+файлы из multipart сохраняются в памяти и отдаются по /file/bot<token>/<path>. Прочие методы отвечают true.
+Ошибки как у Telegram: 429 с parameters.retry_after (случайные и при превышении лимитов чата/бота),
+403 «bot was blocked by the user» для заблокированных чатов.
+
+Управление:
+    POST /_control/updates   [{"text": "/news", "user_id": 1}, …] или сырые Update — в очередь getUpdates
+    GET  /_control/stats     счётчики по методам/результатам, число чатов, задержки
+    POST /_control/reset     сбросить счётчики
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import math
+import random
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+from src.middlewares.throttling import TokenBuckets
+from src.utils.stats import summarize
+
+
+def _parse_rate(raw: str) -> Tuple[float, float]:
+    burst, period = raw.split("/", 1)
+    return float(burst), float(period)
+
+
+class FakeBotAPI:
+    """Состояние фейкового Bot API: очередь апдейтов, файлы, лимиты, инъекция ошибок, статистика."""
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        rate_429: float = 0.0,
+        retry_after: int = 3,
+        blocked: float = 0.0,
+        blocked_ids: Optional[Set[int]] = None,
+        chat_rate: Optional[Tuple[float, float]] = (1, 1),
+        global_rate: Optional[Tuple[float, float]] = (30, 1),
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.blocked = blocked
+        self.blocked_ids = blocked_ids or set()
+        limits: Dict[str, Tuple[float, float]] = {}
+        if chat_rate:
+            limits["chat"] = chat_rate
+        if global_rate:
+            limits["global"] = global_rate
+        self.limits = limits
+        self.buckets = TokenBuckets(limits) if limits else None
+        self.rnd = random.Random(seed)
+
+        self._updates: Deque[dict] = deque()
+        self._update_id = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._message_id = itertools.count(1)
+        self._files: Dict[str, bytes] = {}
+        self.reset()
+
+    def reset(self):
+        self.calls: Counter = Counter()
+        self.chats: Counter = Counter()
+        self.latencies: Deque[float] = deque(maxlen=10_000)
+        self.started = time.time()
+
+    # ---------- отказы ----------
+    def is_blocked(self, chat_id: int) -> bool:
+        if chat_id in self.blocked_ids:
+            return True
+        if not self.blocked:
+            return False
+        # детерминированно по chat_id: один и тот же пользователь «заблокировал» бота всегда
+        h = int.from_bytes(hashlib.blake2b(str(chat_id).encode(), digest_size=4).digest(), "big")
+        return h / 0xFFFFFFFF < self.blocked
+
+    def check_limits(self, chat_id: Optional[int]) -> Optional[int]:
+        """-> retry_after, если запрос нужно отклонить с 429."""
+        if self.rate_429 and self.rnd.random() < self.rate_429:
+            return self.retry_after
+        if self.buckets is None:
+            return None
+        for group, key in (("global", 0), ("chat", chat_id)):
+            if group in self.limits and key is not None and not self.buckets.hit(key, group):
+                burst, period = self.limits[group]
+                return max(1, math.ceil(period / burst))
+        return None
+
+    # ---------- апдейты ----------
+    def push_updates(self, items: List[dict]) -> int:
+        for item in items:
+            if "update_id" not in item and ("text" in item or "user_id" in item):
+                uid = int(item.get("user_id", 1))
+                item = {
+                    "message": {
+                        "message_id": next(self._message_id),
+                        "date": int(time.time()),
+                        "chat": {"id": uid, "type": "private"},
+                        "from": {"id": uid, "is_bot": False, "first_name": item.get("first_name", "Test")},
+                        "text": item.get("text", ""),
+                    }
+                }
+            item["update_id"] = next(self._update_id)
+            self._updates.append(item)
+        self._new_updates.set()
+        return len(items)
+
+    async def get_updates(self, offset: int, limit: int, timeout: float) -> List[dict]:
+        # offset подтверждает всё, что меньше него
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._updates, limit))
+
+    # ---------- файлы ----------
+    def store_file(self, data: bytes) -> Dict[str, Any]:
+        file_id = f"fake_{hashlib.sha1(data).hexdigest()[:24]}"
+        self._files[file_id] = data
+        return {"file_id": file_id, "file_unique_id": file_id[-12:], "file_size": len(data),
+                "width": 800, "height": 600}
+
+    def photo_sizes(self, value: Any, files: Dict[str, bytes]) -> List[Dict[str, Any]]:
+        if isinstance(value, str) and value.startswith("attach://"):
+            data = files.get(value[len("attach://"):], b"")
+            return [self.store_file(data)]
+        if isinstance(value, bytes):
+            return [self.store_file(value)]
+        file_id = str(value)
+        return [{"file_id": file_id, "file_unique_id": file_id[-12:], "width": 800, "height": 600}]
+
+
+def _ok(result: Any) -> web.Response:
+    return web.json_response({"ok": True, "result": result})
+
+
+def _error(code: int, description: str, **parameters: Any) -> web.Response:
+    body: Dict[str, Any] = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return web.json_response(body, status=code)
+
+
+async def _read_params(request: web.Request) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+    params: Dict[str, Any] = dict(request.query)
+    files: Dict[str, bytes] = {}
+    if request.content_type == "application/json":
+        params.update(await request.json())
+        return params, files
+    if request.can_read_body:
+        form = await request.post()
+        for key, value in form.items():
+            if isinstance(value, web.FileField):
+                files[key] = value.file.read()
+            else:
+                params[key] = value
+    # сложные поля (reply_markup, media, …) aiogram кодирует в JSON-строки
+    for key in ("reply_markup", "media", "allowed_updates"):
+        if isinstance(params.get(key), str):
+            try:
+                params[key] = json.loads(params[key])
+            except ValueError:
+                pass
+    return params, files
+
+
+def build_app(api: FakeBotAPI) -> web.Application:
+    app = web.Application(client_max_size=50 * 1024 * 1024)
+
+    def message(chat_id: int, **fields: Any) -> Dict[str, Any]:
+        return {
+            "message_id": next(api._message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": {"id": 1, "is_bot": True, "first_name": "fake", "username": "fake_bot"},
+            **fields,
+        }
+
+    async def handle(request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        started = time.perf_counter()
+        params, files = await _read_params(request)
+        key = method.lower()
+        chat_id = int(params["chat_id"]) if str(params.get("chat_id", "")).lstrip("-").isdigit() else None
+
+        if api.latency or api.jitter:
+            await asyncio.sleep(max(0.0, api.latency + api.rnd.uniform(-api.jitter, api.jitter)))
+
+        try:
+            if key == "getupdates":
+                updates = await api.get_updates(int(params.get("offset", 0) or 0),
+                                                int(params.get("limit", 100) or 100),
+                                                float(params.get("timeout", 0) or 0))
+                api.calls[(method, "ok")] += 1
+                return _ok(updates)
+            if key == "getme":
+                api.calls[(method, "ok")] += 1
+                return _ok({"id": 1, "is_bot": True, "first_name": "fake", "username": "fake_bot"})
+            if key == "getfile":
+                file_id = str(params.get("file_id", ""))
+                if file_id not in api._files:
+                    api.calls[(method, "400")] += 1
+                    return _error(400, "Bad Request: invalid file_id")
+                api.calls[(method, "ok")] += 1
+                return _ok({"file_id": file_id, "file_unique_id": file_id[-12:],
+                            "file_size": len(api._files[file_id]), "file_path": f"photos/{file_id}.jpg"})
+
+            if key in {"sendmessage", "sendphoto", "sendmediagroup"}:
+                if chat_id is None:
+                    api.calls[(method, "400")] += 1
+                    return _error(400, "Bad Request: chat not found")
+                if api.is_blocked(chat_id):
+                    api.calls[(method, "403")] += 1
+                    return _error(403, "Forbidden: bot was blocked by the user")
+                retry_after = api.check_limits(chat_id)
+                if retry_after is not None:
+                    api.calls[(method, "429")] += 1
+                    return _error(429, f"Too Many Requests: retry after {retry_after}", retry_after=retry_after)
+                api.chats[chat_id] += 1
+                api.calls[(method, "ok")] += 1
+                if key == "sendmessage":
+                    return _ok(message(chat_id, text=params.get("text", "")))
+                if key == "sendphoto":
+                    photo = files.get("photo", params.get("photo"))
+                    return _ok(message(chat_id, photo=api.photo_sizes(photo, files),
+                                       caption=params.get("caption")))
+                media = params.get("media") or []
+                group_id = str(next(api._message_id))
+                return _ok([
+                    message(chat_id, media_group_id=group_id, photo=api.photo_sizes(m.get("media"), files),
+                            caption=m.get("caption"))
+                    for m in media
+                ])
+
+            api.calls[(method, "ok")] += 1
+            return _ok(True)
+        finally:
+            # long-poll getUpdates исказил бы задержки отправки
+            if key != "getupdates":
+                api.latencies.append(time.perf_counter() - started)
+
+    async def download(request: web.Request) -> web.Response:
+        name = request.match_info["path"].rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        data = api._files.get(name)
+        if data is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=data, content_type="application/octet-stream")
+
+    async def control_updates(request: web.Request) -> web.Response:
+        body = await request.json()
+        n = api.push_updates(body if isinstance(body, list) else [body])
+        return web.json_response({"queued": n})
+
+    async def control_stats(_request: web.Request) -> web.Response:
+        by_method: Dict[str, Dict[str, int]] = {}
+        for (method, result), n in api.calls.items():
+            by_method.setdefault(method, {})[result] = n
+        lat = summarize(api.latencies)
+        return web.json_response({
+            "uptime_s": round(time.time() - api.started, 1),
+            "calls": by_method,
+            "chats": len(api.chats),
+            "messages": sum(api.chats.values()),
+            "pending_updates": len(api._updates),
+            "latency_ms": {k: round(v * 1000, 2) for k, v in lat.items() if k != "n" and v is not None},
+        })
+
+    async def control_reset(_request: web.Request) -> web.Response:
+        api.reset()
+        return web.json_response({"ok": True})
+
+    app.router.add_post("/_control/updates", control_updates)
+    app.router.add_get("/_control/stats", control_stats)
+    app.router.add_post("/_control/reset", control_reset)
+    app.router.add_get("/file/bot{token}/{path:.+}", download)
+    app.router.add_route("*", "/bot{token}/{method}", handle)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="share of send requests failed with random 429")
+    parser.add_argument("--retry-after", type=int, default=3)
+    parser.add_argument("--blocked", type=float, default=0.0, help="share of chats that 'blocked' the bot (403)")
+    parser.add_argument("--blocked-ids", default="", help="comma-separated chat ids that always get 403")
+    parser.add_argument("--chat-rate", default="1/1", help="per-chat limit burst/period_sec, 'off' to disable")
+    parser.add_argument("--global-rate", default="30/1", help="bot-wide limit burst/period_sec, 'off' to disable")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    api = FakeBotAPI(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        blocked=args.blocked,
+        blocked_ids={int(x) for x in args.blocked_ids.split(",") if x.strip().lstrip("-").isdigit()},
+        chat_rate=None if args.chat_rate == "off" else _parse_rate(args.chat_rate),
+        global_rate=None if args.global_rate == "off" else _parse_rate(args.global_rate),
+        seed=args.seed,
+    )
+    print(f"Fake Bot API on http://{args.host}:{args.port} (BOT_API_URL=http://{args.host}:{args.port})")
+    web.run_app(build_app(api), host=args.host, port=args.port, print=None, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Офлайн soak-тест ingest → fanout на синтетическом трафике DemoNewsFetcher.
+
+    python -m src.tools.soak --users 2000 --rate 30 --posts 200             # Bot API — заглушка в процессе
+    python -m src.tools.soak --bot-api http://127.0.0.1:8081 --duration 600  # против src.tools.fake_bot_api
+
+--rate — постов в минуту; --burst-prob добавляет серии постов подряд; --corpus — свой JSONL с постами.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from src.services.metrics import FanoutMetrics, MetricsRegistry
+from src.services.news_fetcher import DemoNewsFetcher, load_corpus
+from src.services.notifier import Notifier
+from src.storage import Storage
+from src.tools.bench import EchoSession, _populate_users
+
+
+async def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Storage(os.path.join(tmp, "soak.db"), user_cache_size=0)
+        await storage.init()
+        _populate_users(storage.db_path, args.users)
+
+        if args.bot_api:
+            session = AiohttpSession(api=TelegramAPIServer.from_base(args.bot_api.rstrip("/")))
+        else:
+            session = EchoSession()
+        bot = Bot("1:soak", session=session)
+        registry = MetricsRegistry()
+        notifier = Notifier(bot, storage, admin_ids=set(), fanout_metrics=FanoutMetrics(registry),
+                            send_delay=args.send_delay)
+        fetcher = DemoNewsFetcher(
+            storage,
+            rate=args.rate / 60,
+            corpus=load_corpus(args.corpus) if args.corpus else None,
+            sources=("demo", "demo_events", "demo_science"),
+            burst_prob=args.burst_prob,
+            concurrency=args.concurrency,
+            max_posts=args.posts,
+            media_dir=os.path.join(tmp, "media"),
+            seed=args.seed,
+        )
+        started = time.perf_counter()
+        await fetcher.start(on_new_item=notifier.notify_new_item)
+        try:
+            if args.duration:
+                await asyncio.wait_for(fetcher.wait(), timeout=args.duration)
+            else:
+                await fetcher.wait()
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            await fetcher.stop()
+            await bot.session.close()
+        elapsed = time.perf_counter() - started
+
+        report = fetcher.report()
+        sends = {k.split("result=")[-1].strip('"}'): float(v.split()[-1])
+                 for k, v in ((line.split(" ")[0], line) for line in registry.render().splitlines())
+                 if k.startswith("fanout_sends_total{")}
+        report.update({
+            "elapsed_s": round(elapsed, 1),
+            "posts_per_min": round(report["stored"] / elapsed * 60, 1) if elapsed else None,
+            "sends": sends,
+            "sends_per_s": round(sum(sends.values()) / elapsed, 1) if elapsed else None,
+        })
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline soak test of ingest and fanout")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=30.0, help="posts per minute")
+    parser.add_argument("--posts", type=int, default=100, help="stop after this many posts (0 = until --duration)")
+    parser.add_argument("--duration", type=float, default=0.0, help="seconds")
+    parser.add_argument("--burst-prob", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--send-delay", type=float, default=0.0, help="pause between sends inside one fanout")
+    parser.add_argument("--corpus", help="JSONL corpus of posts")
+    parser.add_argument("--bot-api", help="Bot API base URL (e.g. the fake server); default is an in-process stub")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    args.posts = args.posts or None
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
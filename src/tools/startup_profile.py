@@ -0,0 +1,89 @@
+"""
+Профиль холодного старта.
+
+    python -m src.tools.startup_profile            # -X importtime для src.bot и хендлеров, топ модулей
+    python -m src.tools.startup_profile --history  # фазы запуска и time-to-first-update из data/startup.jsonl
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_TARGETS = [
+    "src.bot",
+    "src.handlers.start",
+    "src.handlers.news",
+    "src.handlers.admin",
+    "src.handlers.filters",
+    "src.handlers.schedule",
+    "src.handlers.profile",
+]
+
+
+def run_importtime(modules: list[str]) -> list[tuple[str, int, int]]:
+    """-> [(module, self_us, cumulative_us)] из stderr `python -X importtime`."""
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.getcwd(),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cum_us, name = parts
+        # отступ в имени = глубина вложенности импорта
+        rows.append((name[1:].rstrip(), int(self_us), int(cum_us)))
+    return rows
+
+
+def print_importtime(top: int, include_optional: bool):
+    modules = list(IMPORT_TARGETS)
+    if include_optional:
+        modules.append("src.services.telegram_fetcher")
+    rows = run_importtime(modules)
+    total = sum(r[1] for r in rows)
+    print(f"Total import time: {total / 1000:.1f} ms over {len(rows)} modules\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    top_level = [r for r in rows if not r[0].startswith(" ")]
+    for name, self_us, cum_us in sorted(rows, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"{cum_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name.strip()}")
+    print("\nTop-level packages:")
+    for name, _self_us, cum_us in sorted(top_level, key=lambda r: r[2], reverse=True)[:top]:
+        print(f"{cum_us / 1000:>14.1f}  {name}")
+
+
+def print_history(path: str, last: int):
+    if not os.path.exists(path):
+        print(f"No startup history at {path}")
+        return
+    with open(path, encoding="utf-8") as f:
+        runs = [json.loads(line) for line in f if line.strip()][-last:]
+    for run in runs:
+        phases = ", ".join(f"{k} {v:.0f}ms" for k, v in run.get("phases_ms", {}).items())
+        print(f"{run.get('at', '?')[:19]}  ready {run.get('ready_s')}s  first update {run.get('first_update_s')}s  [{phases}]")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start profile for the bot")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--with-telethon", action="store_true", help="also import the optional Telethon fetcher")
+    parser.add_argument("--history", action="store_true", help="show recorded startup runs instead")
+    parser.add_argument("--log", default=os.getenv("STARTUP_LOG", "data/startup.jsonl"))
+    parser.add_argument("--last", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.history:
+        print_history(args.log, args.last)
+    else:
+        print_importtime(args.top, args.with_telethon)
+
+
+if __name__ == "__main__":
+    main()
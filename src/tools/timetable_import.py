@@ -0,0 +1,45 @@
+"""
+Импорт расписания в базу бота без запуска бота.
+
+    python -m src.tools.timetable_import data/timetable/                     # все *.csv / *.ics каталога
+    python -m src.tools.timetable_import cs-101.ics --group CS-101
+    python -m src.tools.timetable_import timetable.csv students.csv --replace # полная выгрузка: лишние группы удаляются
+
+Импорт инкрементальный: группы, чьё содержимое не изменилось, не перезаписываются.
+Работающий бот подхватывает изменения по /timetable reload.
+"""
+import argparse
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+from src.services.timetable import Timetable, TimetableFormatError
+from src.storage import Storage
+
+
+async def run(args) -> dict:
+    storage = Storage(args.db, user_cache_size=0)
+    await storage.init()
+    timetable = Timetable(storage)
+    await timetable.load()
+    return await timetable.import_files(args.paths, group=args.group, replace=args.replace)
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Import CSV/ICS timetables and student rosters")
+    parser.add_argument("paths", nargs="+", help="CSV/ICS files or directories")
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "bot.db"))
+    parser.add_argument("--group", help="group for files without a group column / ICS categories")
+    parser.add_argument("--replace", action="store_true", help="drop groups (and roster entries) missing from the input")
+    args = parser.parse_args()
+    try:
+        result = asyncio.run(run(args))
+    except (OSError, TimetableFormatError) as e:
+        raise SystemExit(f"import failed: {e}")
+    print(", ".join(f"{k}: {v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
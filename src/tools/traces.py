@@ -0,0 +1,92 @@
+"""
+Самые медленные трассы из TRACE_LOG.
+
+    python -m src.tools.traces                    # топ-10 по длительности с деревом спанов
+    python -m src.tools.traces --name news --top 5
+    python -m src.tools.traces --summary          # суммарное self-time по именам спанов
+"""
+import argparse
+import json
+import os
+from collections import defaultdict
+
+
+def load_traces(path: str, name: str | None = None) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    traces = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                t = json.loads(line)
+            except ValueError:
+                continue
+            if name and name not in t.get("name", ""):
+                continue
+            traces.append(t)
+    return traces
+
+
+def self_times(trace: dict) -> list[float]:
+    """Время спана за вычетом прямых детей, мс."""
+    spans = trace.get("spans", [])
+    own = [s["dur_ms"] for s in spans]
+    for s in spans:
+        if s["parent"] >= 0:
+            own[s["parent"]] -= s["dur_ms"]
+    return [max(0.0, v) for v in own]
+
+
+def print_trace(trace: dict):
+    attrs = " ".join(f"{k}={v}" for k, v in (trace.get("attrs") or {}).items())
+    flag = "" if trace.get("sampled") else " (root only)"
+    err = f" ERROR {trace['error']}" if trace.get("error") else ""
+    print(f"{trace['dur_ms']:>9.1f} ms  {trace['name']}  {trace.get('at', '')[:19]}  {attrs}{flag}{err}")
+    spans = trace.get("spans", [])
+    depth = []
+    for s in spans:
+        d = depth[s["parent"]] + 1 if s["parent"] >= 0 else 1
+        depth.append(d)
+        err = f"  ! {s['error']}" if s.get("error") else ""
+        print(f"{'':>13}{'  ' * d}+{s['start_ms']:.1f}  {s['dur_ms']:.1f} ms  {s['name']}{err}")
+    if trace.get("dropped_spans"):
+        print(f"{'':>15}… {trace['dropped_spans']} spans dropped")
+
+
+def print_summary(traces: list[dict], top: int):
+    total: dict[str, float] = defaultdict(float)
+    count: dict[str, int] = defaultdict(int)
+    for t in traces:
+        for s, own in zip(t.get("spans", []), self_times(t)):
+            total[s["name"]] += own
+            count[s["name"]] += 1
+    print(f"{'self ms':>10} {'calls':>7} {'avg ms':>8}  span")
+    for name, ms in sorted(total.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f"{ms:>10.1f} {count[name]:>7} {ms / count[name]:>8.2f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the slowest recorded traces")
+    parser.add_argument("--log", default=os.getenv("TRACE_LOG", "data/traces.jsonl"))
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--name", help="only traces whose name contains this (e.g. news, fetcher)")
+    parser.add_argument("--summary", action="store_true", help="aggregate self time per span name instead")
+    args = parser.parse_args()
+
+    traces = load_traces(args.log, args.name)
+    if not traces:
+        print(f"No traces in {args.log}")
+        return
+    if args.summary:
+        print_summary(traces, args.top)
+        return
+    print(f"{len(traces)} traces, slowest {min(args.top, len(traces))}:\n")
+    for t in sorted(traces, key=lambda t: t["dur_ms"], reverse=True)[:args.top]:
+        print_trace(t)
+        print()
+
+
+if __name__ == "__main__":
+    main()
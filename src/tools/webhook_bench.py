@@ -0,0 +1,205 @@
+"""
+Сравнение задержки доставки апдейтов: webhook vs long polling.
+
+Все запросы к Bot API уходят в StubSession (без сети): getUpdates отдаёт апдейты из очереди,
+webhook получает те же апдейты POST-запросами на локальный aiohttp-сервер.
+Задержка = время от «появления» апдейта до входа в Dispatcher (outer-middleware).
+
+    python -m src.tools.webhook_bench --updates 500
+    python -m src.tools.webhook_bench --payloads updates.jsonl
+    python -m src.tools.webhook_bench --post-to http://127.0.0.1:8080/webhook --secret S --payloads updates.jsonl
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, AsyncGenerator
+
+from aiohttp import ClientSession, web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, GetUpdates, TelegramMethod
+from aiogram.types import Update, User
+
+from src.services.webhook import build_webhook_app
+
+
+def synth_updates(n: int, users: int = 50) -> list[dict]:
+    return [
+        {
+            "update_id": i + 1,
+            "message": {
+                "message_id": i + 1,
+                "date": int(time.time()),
+                "chat": {"id": 1000 + i % users, "type": "private"},
+                "from": {"id": 1000 + i % users, "is_bot": False, "first_name": "Bench"},
+                "text": "📰 News",
+            },
+        }
+        for i in range(n)
+    ]
+
+
+def load_payloads(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class StubSession(BaseSession):
+    """Bot API без сети: getUpdates читает из очереди, остальные методы возвращают True."""
+    def __init__(self):
+        super().__init__()
+        self.queue: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def close(self):
+        pass
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: int | None = None) -> Any:
+        if isinstance(method, GetMe):
+            return User(id=1, is_bot=True, first_name="bench", username="bench_bot")
+        if isinstance(method, GetUpdates):
+            batch = []
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=method.timeout or 1))
+            except asyncio.TimeoutError:
+                return []
+            while not self.queue.empty() and len(batch) < (method.limit or 100):
+                batch.append(self.queue.get_nowait())
+            return [Update.model_validate(u, context={"bot": bot}) for u in batch]
+        return True
+
+    async def stream_content(self, url: str, headers: dict | None = None, timeout: int = 30,
+                             chunk_size: int = 65536, raise_for_status: bool = True) -> AsyncGenerator[bytes, None]:
+        yield b""
+
+
+def make_dispatcher(sent_at: dict[int, float], latencies: list[float], done: asyncio.Event, total: int) -> Dispatcher:
+    dp = Dispatcher()
+    router = Router(name="bench")
+
+    @dp.update.outer_middleware()
+    async def record(handler, event: Update, data):
+        started = sent_at.pop(event.update_id, None)
+        if started is not None:
+            latencies.append((time.perf_counter() - started) * 1000)
+        if len(latencies) >= total:
+            done.set()
+        return await handler(event, data)
+
+    @router.message()
+    async def noop(_message):
+        return None
+
+    dp.include_router(router)
+    return dp
+
+
+def summary(name: str, latencies: list[float]) -> dict:
+    if not latencies:
+        return {"mode": name, "count": 0}
+    s = sorted(latencies)
+
+    def pick(q: float) -> float:
+        return s[min(len(s) - 1, int(q * len(s)))]
+
+    return {
+        "mode": name,
+        "count": len(s),
+        "mean_ms": round(statistics.fmean(s), 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(s[-1], 3),
+    }
+
+
+async def bench_polling(payloads: list[dict], rate: float) -> dict:
+    session = StubSession()
+    bot = Bot(token="42:BENCH", session=session)
+    sent_at: dict[int, float] = {}
+    latencies: list[float] = []
+    done = asyncio.Event()
+    dp = make_dispatcher(sent_at, latencies, done, len(payloads))
+
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+    await asyncio.sleep(0.2)
+    for u in payloads:
+        sent_at[u["update_id"]] = time.perf_counter()
+        session.queue.put_nowait(u)
+        await asyncio.sleep(1 / rate if rate > 0 else 0)
+    try:
+        await asyncio.wait_for(done.wait(), timeout=30)
+    finally:
+        await dp.stop_polling()
+        await polling
+    return summary("polling", latencies)
+
+
+async def bench_webhook(payloads: list[dict], rate: float, secret: str = "bench-secret") -> dict:
+    bot = Bot(token="42:BENCH", session=StubSession())
+    sent_at: dict[int, float] = {}
+    latencies: list[float] = []
+    done = asyncio.Event()
+    dp = make_dispatcher(sent_at, latencies, done, len(payloads))
+
+    app = build_webhook_app(dp, bot, path="/webhook", secret=secret)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f"http://127.0.0.1:{port}/webhook"
+
+    try:
+        async with ClientSession() as http:
+            async with http.post(url, json=payloads[0], headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as resp:
+                rejected = resp.status == 401
+            for u in payloads:
+                sent_at[u["update_id"]] = time.perf_counter()
+                async with http.post(url, json=u, headers={"X-Telegram-Bot-Api-Secret-Token": secret}) as resp:
+                    resp.raise_for_status()
+                await asyncio.sleep(1 / rate if rate > 0 else 0)
+        await asyncio.wait_for(done.wait(), timeout=30)
+    finally:
+        await runner.cleanup()
+    result = summary("webhook", latencies)
+    result["bad_secret_rejected"] = rejected
+    return result
+
+
+async def post_to(url: str, secret: str | None, payloads: list[dict]) -> dict:
+    """Отправить записанные апдейты на уже запущенный бот (BOT_MODE=webhook)."""
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    timings: list[float] = []
+    statuses: dict[int, int] = {}
+    async with ClientSession() as http:
+        for u in payloads:
+            t0 = time.perf_counter()
+            async with http.post(url, json=u, headers=headers) as resp:
+                statuses[resp.status] = statuses.get(resp.status, 0) + 1
+            timings.append((time.perf_counter() - t0) * 1000)
+    result = summary("post", timings)
+    result["statuses"] = statuses
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Webhook vs polling latency harness")
+    parser.add_argument("--updates", type=int, default=200, help="number of synthetic updates")
+    parser.add_argument("--payloads", help="JSONL file with recorded Update payloads")
+    parser.add_argument("--rate", type=float, default=200.0, help="updates per second (0 = as fast as possible)")
+    parser.add_argument("--post-to", help="URL of a running webhook server to replay payloads into")
+    parser.add_argument("--secret", help="secret token for --post-to")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.payloads) if args.payloads else synth_updates(args.updates)
+    if args.post_to:
+        print(json.dumps(await post_to(args.post_to, args.secret, payloads), indent=2))
+        return
+    results = [await bench_polling(payloads, args.rate), await bench_webhook(payloads, args.rate)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded LRU cache with per-entry TTL and hit/miss counters.
+    Not thread-safe: meant to be used from a single asyncio loop.
+    """
+    def __init__(self, maxsize: int = 10_000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Returns the cached value, or `default` (MISSING sentinel if omitted) on miss/expiry."""
+        item = self._data.get(key)
+        if item is not None:
+            expires_at, value = item
+            if expires_at >= time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like get(), but does not touch LRU order or counters."""
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            return default
+        return item[1]
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
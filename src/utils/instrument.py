@@ -0,0 +1,19 @@
+import inspect
+from typing import Any, Awaitable, Callable, Iterable, List
+
+AsyncMethod = Callable[..., Awaitable[Any]]
+
+
+def wrap_async_methods(obj: Any, wrap: Callable[[str, AsyncMethod], AsyncMethod], skip: Iterable[str] = ()) -> List[str]:
+    """
+    Заменяет публичные async-методы экземпляра на wrap(name, bound_method).
+    Класс не трогается; возвращает список обёрнутых имён.
+    """
+    skipped = set(skip)
+    wrapped = []
+    for name, fn in inspect.getmembers(type(obj), inspect.iscoroutinefunction):
+        if name.startswith("_") or name in skipped:
+            continue
+        setattr(obj, name, wrap(name, getattr(obj, name)))
+        wrapped.append(name)
+    return wrapped
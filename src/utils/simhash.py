@@ -0,0 +1,58 @@
+import hashlib
+import re
+from typing import Iterable, List
+
+_URL = re.compile(r"https?://\S+|t\.me/\S+|@\w+")
+_WORD = re.compile(r"\w+", flags=re.UNICODE)
+
+
+def tokens(text: str) -> List[str]:
+    """Слова поста без ссылок, упоминаний и markdown; регистр и пунктуация не важны."""
+    return [w for w in _WORD.findall(_URL.sub(" ", (text or "").lower())) if len(w) > 1 or w.isdigit()]
+
+
+def features(words: List[str]) -> set:
+    # слова + биграммы: биграммы отличают пересказ от перестановки общих слов
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def _h64(feature: str) -> int:
+    # стабильный между процессами хэш (отпечатки хранятся в БД, hash() рандомизирован)
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(feats: Iterable[str]) -> int:
+    """64-битный SimHash: бит = 1, если он выставлен у большинства признаков."""
+    bits = [format(_h64(f), "064b") for f in feats]
+    if not bits:
+        return 0
+    half = len(bits) / 2
+    fp = 0
+    # zip(*…) и str.count — подсчёт по столбцам битов на C-уровне
+    for column in zip(*bits):
+        fp = (fp << 1) | (column.count("1") > half)
+    return fp
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def bands(fp: int, n: int) -> List[int]:
+    """64 бита → n полос; полоса кодируется вместе с номером, чтобы не путать одинаковые значения разных полос."""
+    width = 64 // n
+    out = []
+    for i in range(n):
+        bits = width if i < n - 1 else 64 - width * (n - 1)
+        shift = 64 - width * i - bits
+        out.append((i << 64) | ((fp >> shift) & ((1 << bits) - 1)))
+    return out
+
+
+def to_sqlite(fp: int) -> int:
+    # INTEGER в SQLite — знаковый 64-битный
+    return fp - (1 << 64) if fp >= 1 << 63 else fp
+
+
+def from_sqlite(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
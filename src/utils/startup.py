@@ -0,0 +1,61 @@
+import datetime
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+
+class StartupProfile:
+    """
+    Тайминги фаз запуска бота и time-to-first-update.
+    Каждый запуск дописывается одной JSON-строкой в `log_path`, чтобы сравнивать релизы.
+    """
+    def __init__(self, t0: Optional[float] = None, log_path: Optional[str] = None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.log_path = log_path
+        self.phases: List[Tuple[str, float]] = []
+        self.ready_s: Optional[float] = None
+        self.first_update_s: Optional[float] = None
+
+    def since_start(self) -> float:
+        return time.perf_counter() - self.t0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - started
+            self.phases.append((name, dt))
+            print(f"[startup] {name}: {dt * 1000:.0f} ms")
+
+    def ready(self):
+        self.ready_s = self.since_start()
+        print(f"[startup] ready after {self.ready_s:.2f}s")
+
+    def first_update(self):
+        if self.first_update_s is not None:
+            return
+        self.first_update_s = self.since_start()
+        print(f"[startup] first update handled after {self.first_update_s:.2f}s")
+        self.save()
+
+    def as_dict(self) -> dict:
+        return {
+            "at": datetime.datetime.utcnow().isoformat(),
+            "phases_ms": {name: round(dt * 1000, 1) for name, dt in self.phases},
+            "ready_s": round(self.ready_s, 3) if self.ready_s is not None else None,
+            "first_update_s": round(self.first_update_s, 3) if self.first_update_s is not None else None,
+        }
+
+    def save(self):
+        if not self.log_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.as_dict(), ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"[startup] Failed to write {self.log_path}: {e}")
@@ -0,0 +1,18 @@
+import math
+from typing import Dict, Iterable, Optional, Sequence
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank перцентиль по уже отсортированной последовательности (q в 0..1)."""
+    if not sorted_values:
+        return None
+    idx = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[min(idx, len(sorted_values) - 1)]
+
+
+def summarize(values: Iterable[Optional[float]], qs: Sequence[float] = (0.5, 0.95, 0.99)) -> Dict[str, Optional[float]]:
+    data = sorted(v for v in values if v is not None)
+    out: Dict[str, Optional[float]] = {"n": len(data)}
+    for q in qs:
+        out[f"p{int(q * 100)}"] = percentile(data, q)
+    return out
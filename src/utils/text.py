@@ -36,4 +36,11 @@ def md_to_html(text: str) -> str:
 def clip_for_caption(s: str, max_len: int = 1024) -> str:
     if len(s) <= max_len:
         return s
-    return s[: max_len - 1].rstrip() + "…"
\ No newline at end of file
+    return s[: max_len - 1].rstrip() + "…"
+
+def make_title_and_text(text: str, max_title_len: int = 120) -> tuple[str, str]:
+    if not text:
+        return "Post", ""
+    first = text.strip().splitlines()[0].strip()
+    title = (first[: max_title_len] + "…") if len(first) > max_title_len else first
+    return title, text
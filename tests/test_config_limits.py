@@ -0,0 +1,13 @@
+from src.config import _parse_limits
+
+
+def test_parse_limits_skips_invalid_groups(capsys):
+    limits = _parse_limits("news=2/0,filters=0.5/10,profile=x/10,default=12/10,bad")
+    assert limits == {"default": (12.0, 10.0)}
+    out = capsys.readouterr().out
+    assert "news=2/0" in out and "filters=0.5/10" in out
+
+
+def test_parse_limits_all_invalid():
+    assert _parse_limits("news=2/-1") is None
+    assert _parse_limits("") is None
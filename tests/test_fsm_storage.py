@@ -0,0 +1,35 @@
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from src.services.fsm_storage import SQLiteFSMStorage
+
+
+def _key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def test_flush_skips_unserializable_key(tmp_path, capsys):
+    db_path = str(tmp_path / "bot.db")
+
+    async def scenario():
+        storage = SQLiteFSMStorage(db_path, flush_interval=3600)
+        await storage.init()
+        await storage.set_state(_key(1), "Form:bad")
+        await storage.set_data(_key(1), {"obj": object()})
+        await storage.set_state(_key(2), "Form:good")
+        await storage.set_data(_key(2), {"step": 2})
+        await storage.flush()
+        assert not storage._dirty
+        # чужой ключ не мешает следующим flush
+        await storage.set_data(_key(3), {"step": 3})
+        await storage.close()
+
+        fresh = SQLiteFSMStorage(db_path, flush_interval=0)
+        assert await fresh.get_state(_key(2)) == "Form:good"
+        assert await fresh.get_data(_key(2)) == {"step": 2}
+        assert await fresh.get_data(_key(3)) == {"step": 3}
+        assert await fresh.get_state(_key(1)) is None
+
+    asyncio.run(scenario())
+    assert "not JSON-serializable" in capsys.readouterr().out
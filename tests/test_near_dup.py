@@ -0,0 +1,51 @@
+import asyncio
+
+from src.services.near_dup import NearDuplicateDetector, store_news
+from src.storage import Storage
+
+POST = ("Университет объявляет конкурс студенческих грантов на исследования в области "
+        "машинного обучения, заявки принимаются до конца месяца в деканате")
+
+
+async def _ingest(storage: Storage, det: NearDuplicateDetector, source: str, external_id: str):
+    return await store_news(storage, det, "Гранты", POST, source, external_id)
+
+
+def test_backfill_does_not_match_itself(tmp_path):
+    storage = Storage(str(tmp_path / "bot.db"))
+
+    async def scenario():
+        await storage.init()
+        det = NearDuplicateDetector()
+        first, original = await _ingest(storage, det, "ch", "ch:1")
+        assert first and original is None
+
+        # рестарт: окно прогрето из БД, backfill повторяет тот же пост
+        det = NearDuplicateDetector()
+        await det.load(storage)
+        again, original = await _ingest(storage, det, "ch", "ch:1")
+        assert again is None and original is None
+        assert det.matches == 0 and not det.recent
+
+        # репост в другом канале — настоящий почти-дубликат
+        repost, original = await _ingest(storage, det, "other", "other:7")
+        assert repost and original.news_id == first
+        assert det.matches == 1 and det.recent[-1]["original_id"] == first
+
+    asyncio.run(scenario())
+
+
+def test_same_channel_posts_are_not_duplicates(tmp_path):
+    storage = Storage(str(tmp_path / "bot.db"))
+
+    async def scenario():
+        await storage.init()
+        det = NearDuplicateDetector()
+        first, original = await _ingest(storage, det, "ch", "ch:1")
+        # исправленная перевыкладка того же анонса
+        second, original2 = await _ingest(storage, det, "ch", "ch:2")
+        assert first and second and original is None and original2 is None
+        assert det.matches == 0
+        assert {n.id for n in await storage.get_latest_news(5)} == {first, second}
+
+    asyncio.run(scenario())
@@ -0,0 +1,40 @@
+import asyncio
+import random
+import sqlite3
+
+from src.services.notifier import Notifier
+from src.storage import Storage
+
+
+def test_digest_enqueue_matches_user_allows(tmp_path):
+    db_path = str(tmp_path / "bot.db")
+    storage = Storage(db_path, user_cache_size=0)
+    rnd = random.Random(7)
+
+    async def scenario():
+        await storage.init()
+        with sqlite3.connect(db_path) as conn:
+            conn.executemany("INSERT INTO users (user_id, is_admin, subscribed_news) VALUES (?, 0, 1)",
+                             [(uid,) for uid in range(1, 201)])
+            conn.execute("UPDATE users SET delivery = 'hourly' WHERE user_id % 3 != 0")
+            conn.execute("UPDATE users SET subscribed_news = 0 WHERE user_id % 7 = 0")
+            conn.executemany("INSERT INTO user_keywords VALUES (?, ?, '')",
+                             [(uid, rnd.choice(["exam", "grant", "lab"])) for uid in range(1, 201) if rnd.random() < 0.3])
+            conn.executemany("INSERT INTO user_muted_sources VALUES (?, 'ch', '')",
+                             [(uid,) for uid in range(1, 201) if rnd.random() < 0.2])
+            digest_users = [r[0] for r in conn.execute(
+                "SELECT user_id FROM users WHERE delivery != 'instant' AND subscribed_news = 1")]
+
+        notifier = Notifier(bot=None, storage=storage, admin_ids={4}, chunk=64)
+        news_id = await storage.add_news_if_new("Exam schedule", "The lab exam moves to Friday", "ch", "ch:1")
+        assert await notifier._enqueue_digests([("Exam schedule", "The lab exam moves to Friday", "ch",
+                                                 None, None, None, news_id)], "ch") is True
+
+        expected = {uid for uid in digest_users
+                    if await notifier.user_allows(uid, "ch", "Exam schedule", "The lab exam moves to Friday")}
+        with sqlite3.connect(db_path) as conn:
+            queued = {r[0] for r in conn.execute("SELECT user_id FROM digest_queue WHERE news_id = ?", (news_id,))}
+        assert queued == expected
+        assert 4 in queued or 4 not in digest_users
+
+    asyncio.run(scenario())
@@ -0,0 +1,24 @@
+import asyncio
+
+from src.rows import NewsItem, UserProfile
+from src.services.query_profiler import QueryProfiler
+from src.storage import Storage
+
+
+def test_slow_log_with_row_factories(tmp_path):
+    profiler = QueryProfiler(slow_ms=0)
+    storage = Storage(str(tmp_path / "bot.db"), profiler=profiler)
+    profiler.instrument(storage)
+
+    async def scenario():
+        await storage.init()
+        await storage.add_or_update_user(1, is_admin=False)
+        await storage.add_news_if_new("T", "text", "ch", "ch:1")
+        storage.user_cache.clear()
+        assert isinstance(await storage.get_profile(1), UserProfile)
+        latest = await storage.get_latest_news(5)
+        assert len(latest) == 1 and isinstance(latest[0], NewsItem)
+
+    asyncio.run(scenario())
+    plans = [e["plan"] for e in profiler.slow_log if "FROM news" in e["sql"] or "FROM users" in e["sql"]]
+    assert plans and all(p and not p[0].startswith("(explain failed") for p in plans)
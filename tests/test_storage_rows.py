@@ -0,0 +1,98 @@
+import asyncio
+
+from src.rows import NO_PROFILE, NewsItem, UserProfile
+from src.storage import Storage
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def _storage(tmp_path) -> Storage:
+    storage = Storage(str(tmp_path / "bot.db"))
+    _run(storage.init())
+    return storage
+
+
+def test_user_profile_cache_roundtrip(tmp_path):
+    storage = _storage(tmp_path)
+
+    async def scenario():
+        assert await storage.get_profile(1) is NO_PROFILE
+        await storage.add_or_update_user(1, is_admin=False)
+        profile = await storage.get_profile(1)
+        assert isinstance(profile, UserProfile)
+        assert profile.subscribed and not profile.is_admin
+
+        await storage.add_or_update_user(1, is_admin=True)
+        await storage.set_subscription(1, False)
+        await storage.set_student_profile(1, "P1234567", "Ann Lee", profile_photo=None)
+        assert not await storage.is_subscribed(1)
+        assert await storage.get_profile(1) == UserProfile(False, True, "P1234567", "Ann Lee", None)
+
+        # мимо кэша — то же самое из БД
+        storage.user_cache.clear()
+        assert await storage.get_profile(1) == UserProfile(False, True, "P1234567", "Ann Lee", None)
+
+    _run(scenario())
+
+
+def test_reminders_flag(tmp_path):
+    storage = _storage(tmp_path)
+
+    async def scenario():
+        await storage.add_or_update_user(2, is_admin=False)
+        assert await storage.get_reminders(2) is False
+        await storage.set_reminders(2, True)
+        assert await storage.get_reminders(2) is True
+        await storage.set_reminders(2, False)
+        assert await storage.get_reminders(2) is False
+        assert await storage.get_reminders(404) is False
+
+    _run(scenario())
+
+
+def test_latest_news_and_digest_items_are_news_items(tmp_path):
+    storage = _storage(tmp_path)
+
+    async def scenario():
+        await storage.add_or_update_user(3, is_admin=False)
+        ids = []
+        for i in range(3):
+            ids.append(await storage.add_news_if_new(
+                f"T{i}", f"Привет **мир** 🎉 {i}", "ch", f"ch:{i}", post_url=f"https://t.me/ch/{i}", source_title="Канал"
+            ))
+        latest = await storage.get_latest_news(2)
+        assert [n.id for n in latest] == ids[:0:-1]
+        item = latest[0]
+        assert isinstance(item, NewsItem)
+        assert item.text == "Привет **мир** 🎉 2"
+        assert item.html == "Привет <b>мир</b> 🎉 2"
+        assert item.url == "https://t.me/ch/2"
+
+        await storage.enqueue_digest(ids[0], [3])
+        await storage.enqueue_digest(ids[1], [3])
+        total, max_id, rows = await storage.get_digest_items(3)
+        assert (total, max_id) == (2, ids[1])
+        assert [n.id for n in rows] == [ids[1], ids[0]]
+        assert rows[0].title == "T1" and rows[0].text == ""
+
+    _run(scenario())
+
+
+def test_delivery_only_for_live_posts_and_first_send_kept(tmp_path):
+    storage = _storage(tmp_path)
+
+    async def scenario():
+        backfilled = await storage.add_news_if_new("Old", "old post", "ch", "ch:1", posted_at=None)
+        live = await storage.add_news_if_new("New", "new post", "ch", "ch:2", posted_at=1000.0, ingested_at=1000.5)
+        await storage.record_delivery(backfilled, 1001.0, 1002.0, 3)
+        await storage.record_delivery(live, 1001.0, 1002.0, 3)
+        # продолжение после рестарта: первая отправка остаётся прежней
+        await storage.record_delivery(live, 2000.0, 2001.0, 5)
+        async with storage._connect() as db:
+            async with db.execute("SELECT news_id, first_send_ms, last_send_ms, sent_count FROM news_delivery") as cur:
+                rows = await cur.fetchall()
+        assert [tuple(r) for r in rows] == [(live, 1000, 1001000, 5)]
+
+    _run(scenario())